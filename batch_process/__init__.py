@@ -1,9 +1,26 @@
-import time 
+from .buffer import TaskBuffer
 
 # global limit for the bucket
 GLOBAL_LIMIT  = 500 
-bucket_ = []
+# hard cap on what one worker keeps in memory, above it POST /tasks gets 503
+BUCKET_CAPACITY = GLOBAL_LIMIT * 10
+bucket_ = TaskBuffer(BUCKET_CAPACITY, flush_at=GLOBAL_LIMIT)
 MAX_PENDING_LIMIT = 55
-last_time_flush = time.time() 
-total_request = 0
 total_commit = 0
+
+# redis list shared by the web workers (producer) and the batch consumer
+TASK_QUEUE = "task_queue"
+DEAD_LETTER_QUEUE = "task_queue:dead"
+# alternative transport (BATCH_TRANSPORT=stream), acked by a consumer group
+TASK_STREAM = "task_stream"
+STREAM_GROUP = "task_batchers"
+# per-user hash request_id -> task_id, written by the consumer after commit. every
+# field carries its own TTL (HEXPIRE, redis >= 7.4), the hash itself never expires
+# while the user keeps creating tasks
+TASK_REQUESTS_KEY = "task_requests:{user_id}"
+
+# redis publisher (manager side)
+PUBLISH_CHUNK = 100  # values per LPUSH inside the pipeline
+PUBLISH_RETRIES = 2
+BREAKER_FAILURES = 3  # failed flushes before we stop trying redis
+BREAKER_RESET = 10  # seconds before one flush probes redis again
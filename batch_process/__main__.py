@@ -0,0 +1,4 @@
+from batch_process.consumer import main
+
+# python -m batch_process  -> runs the in-process task_queue consumer
+main()
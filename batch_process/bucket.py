@@ -1,5 +1,4 @@
 # from . import bucket_,  total_request
-import threading
 import batch_process
 import logging
 logger = logging.getLogger(__name__)
@@ -8,10 +7,27 @@ def bucket_insertion(data,user_id):
     # for the /api/v1/tasks POST 
     data["user_id"] = user_id
 
-    lock = threading.Lock()
-    with lock:
-        batch_process.total_request += 1
-        batch_process.bucket_.append(data)
+    # False means the bucket is full and the task was NOT accepted
+    accepted = batch_process.bucket_.put(data)
+    if not accepted:
+        logger.warning(
+            f"Bucket full ({batch_process.BUCKET_CAPACITY}), "
+            f"rejecting task for user_id={user_id}"
+        )
 
-    # logging.info(f"total_request->{total_request}")
+    return accepted
 
+
+def bucket_insertion_many(tasks, user_id):
+    # for the /api/v1/tasks:batch POST, every task goes in or none does
+    for data in tasks:
+        data["user_id"] = user_id
+
+    accepted = batch_process.bucket_.put_many(tasks)
+    if not accepted:
+        logger.warning(
+            f"Bucket full ({batch_process.BUCKET_CAPACITY}), rejecting batch of "
+            f"{len(tasks)} tasks for user_id={user_id}"
+        )
+
+    return accepted
@@ -0,0 +1,83 @@
+import time
+import threading
+from collections import deque
+
+
+class TaskBuffer:
+    # bounded FIFO shared by the request threads (producers) and the manager
+    # thread (consumer), one real lock and swap-on-flush so a drain never
+    # copies or clears the list while someone is appending to it
+
+    def __init__(self, capacity, flush_at=None):
+        self.capacity = capacity
+        self.flush_at = flush_at or capacity
+        self._items = deque()
+        self._cond = threading.Condition(threading.Lock())
+        self._first_put_at = None
+        self.accepted = 0
+        self.rejected = 0
+
+    def put(self, item):
+        # returns False when the buffer is full (caller has to apply backpressure)
+        with self._cond:
+            size = len(self._items)
+            if size >= self.capacity:
+                self.rejected += 1
+                return False
+            self._items.append(item)
+            self.accepted += 1
+
+            # only two moments are worth waking the flusher for: the first item
+            # (arms the deadline) and the batch becoming full
+            if size == 0:
+                self._first_put_at = time.monotonic()
+                self._cond.notify()
+            elif size + 1 == self.flush_at:
+                self._cond.notify()
+            return True
+
+    def put_many(self, items):
+        # all or nothing (one lock round for a whole POST /tasks:batch), False
+        # when they do not all fit
+        with self._cond:
+            size = len(self._items)
+            if size + len(items) > self.capacity:
+                self.rejected += len(items)
+                return False
+            self._items.extend(items)
+            self.accepted += len(items)
+
+            if size == 0:
+                self._first_put_at = time.monotonic()
+                self._cond.notify()
+            elif size < self.flush_at <= size + len(items):
+                self._cond.notify()
+            return True
+
+    def drain(self):
+        with self._cond:
+            return self._swap()
+
+    def wait_for_batch(self, max_wait):
+        # blocks until flush_at items are pending or the oldest pending item is
+        # max_wait seconds old, with an empty buffer it sleeps without a timeout
+        with self._cond:
+            while not self._items:
+                self._cond.wait()
+
+            deadline = self._first_put_at + max_wait
+            while len(self._items) < self.flush_at:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            return self._swap()
+
+    def _swap(self):
+        items, self._items = self._items, deque()
+        self._first_put_at = None
+        return list(items)
+
+    def __len__(self):
+        return len(self._items)
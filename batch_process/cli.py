@@ -0,0 +1,64 @@
+import os
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from redis import Redis
+from redis.exceptions import RedisError
+
+from .spool import Spool, replay_all, replay_file
+from .publisher import CircuitBreaker, make_publisher
+
+spool_cli = AppGroup("spool", help="Inspect and replay the emergency task spool.")
+
+
+def _publisher():
+    from task_manager_api.extensions import redis_client as redis_ext
+
+    return make_publisher(
+        Redis(connection_pool=redis_ext.pool),
+        current_app.config["BATCH_TRANSPORT"],
+        CircuitBreaker(1, 0),
+        stream_maxlen=current_app.config["TASK_STREAM_MAXLEN"],
+    )
+
+
+@spool_cli.command("status")
+def status():
+    """Show the sealed segments waiting for replay."""
+    directory = current_app.config["SPOOL_DIR"]
+    if not os.path.isdir(directory):
+        click.echo(f"No spool directory at {directory}")
+        return
+
+    for name in sorted(os.listdir(directory)):
+        size = os.path.getsize(os.path.join(directory, name))
+        click.echo(f"{name}\t{size} bytes")
+
+
+@spool_cli.command("replay")
+@click.argument("files", nargs=-1, type=click.Path(exists=True, dir_okay=False))
+def replay(files):
+    """Push spooled tasks back into task_queue (or task_stream).
+
+    Without FILES every sealed (and orphaned) segment in SPOOL_DIR is replayed,
+    FILES can point at any jsonl file, e.g. the old emergency_fallback.jsonl.
+    How far a file got is kept in <file>.offset, running it again only pushes
+    what was not pushed yet.
+    """
+    publisher = _publisher()
+    try:
+        if files:
+            for path in files:
+                pushed = replay_file(publisher, path)
+                click.echo(f"{path}: {pushed} tasks pushed")
+            return
+
+        spool = Spool(
+            current_app.config["SPOOL_DIR"], current_app.config["SPOOL_SEGMENT_BYTES"]
+        )
+        spool.recover()
+        click.echo(f"{replay_all(publisher, spool)} tasks pushed")
+    except RedisError as e:
+        raise click.ClickException(
+            f"Redis unavailable, nothing lost, retry later: {e}"
+        ) from e
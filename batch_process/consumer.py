@@ -0,0 +1,430 @@
+import os
+import time
+import socket
+import logging
+import argparse
+import orjson
+from dateutil import parser as date_parser
+from redis import Redis
+from redis.exceptions import RedisError, ResponseError
+from collections import Counter as Tally
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+from prometheus_client import Counter, Histogram, start_http_server
+
+from . import (
+    TASK_QUEUE,
+    TASK_STREAM,
+    STREAM_GROUP,
+    DEAD_LETTER_QUEUE,
+    TASK_REQUESTS_KEY,
+)
+
+logger = logging.getLogger(__name__)
+
+# the pool has socket_timeout=1, so a blocking pop must return before that
+BLOCK_TIMEOUT = 0.5
+DB_RETRY_BACKOFF = 2
+
+TASKS_CONSUMED = Counter(
+    "batch_consumer_tasks_total",
+    "Tasks drained from the redis queue, by outcome",
+    ["outcome"],  # inserted | invalid | requeued
+)
+BATCH_SIZE = Histogram(
+    "batch_consumer_batch_size",
+    "Number of tasks written per multi-row INSERT",
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500),
+)
+FLUSH_SECONDS = Histogram(
+    "batch_consumer_flush_seconds",
+    "Time spent writing one batch to postgres",
+)
+
+
+def fetch_batch(redis_client, batch_size, linger):
+    # first pop blocks (short) until something shows up, after that we keep
+    # collecting until the batch is full or the linger time runs out
+    batch = []
+    deadline = None
+    while len(batch) < batch_size:
+        wait = BLOCK_TIMEOUT
+        if deadline is not None:
+            wait = min(wait, deadline - time.monotonic())
+            if wait <= 0:
+                break
+
+        popped = redis_client.blmpop(
+            wait, 1, TASK_QUEUE, direction="RIGHT", count=batch_size - len(batch)
+        )
+        if popped:
+            batch.extend(popped[1])
+            if deadline is None:
+                deadline = time.monotonic() + linger
+        elif deadline is None:
+            # nothing in the queue at all, let the caller loop again
+            break
+
+    return batch
+
+
+class ListSource:
+    # task_queue (LPUSH/BLMPOP), a popped task is gone from redis, so a failed
+    # insert has to push it back itself
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+
+    def fetch(self, batch_size, linger):
+        batch = fetch_batch(self.redis_client, batch_size, linger)
+        return [(None, payload) for payload in batch]
+
+    def ack(self, ids):
+        pass
+
+    def requeue(self, entries):
+        # back on the consuming (right) end so they are picked up first
+        self.redis_client.rpush(TASK_QUEUE, *reversed([p for _, p in entries]))
+
+
+class StreamSource:
+    # task_stream read through a consumer group, entries stay pending until XACK
+    # (after the DB commit), entries of a crashed consumer are taken over with
+    # XAUTOCLAIM once they were idle for `reclaim_idle` ms
+
+    def __init__(self, redis_client, consumer_name, reclaim_idle):
+        self.redis_client = redis_client
+        self.consumer_name = consumer_name
+        self.reclaim_idle = reclaim_idle
+        self._next_reclaim = 0.0
+        try:
+            redis_client.xgroup_create(TASK_STREAM, STREAM_GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def fetch(self, batch_size, linger):
+        batch = []
+        now = time.monotonic()
+        if now >= self._next_reclaim:
+            self._next_reclaim = now + self.reclaim_idle / 1000
+            _, claimed, _ = self.redis_client.xautoclaim(
+                TASK_STREAM,
+                STREAM_GROUP,
+                self.consumer_name,
+                min_idle_time=self.reclaim_idle,
+                start_id="0-0",
+                count=batch_size,
+            )
+            batch.extend(self._entries(claimed))
+            if claimed:
+                logger.warning(f"Reclaimed {len(claimed)} pending stream entries")
+
+        deadline = None
+        while len(batch) < batch_size:
+            wait = BLOCK_TIMEOUT
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    break
+
+            response = self.redis_client.xreadgroup(
+                STREAM_GROUP,
+                self.consumer_name,
+                {TASK_STREAM: ">"},
+                count=batch_size - len(batch),
+                block=max(int(wait * 1000), 1),
+            )
+            entries = response[0][1] if response else []
+            if entries:
+                batch.extend(self._entries(entries))
+                if deadline is None:
+                    deadline = time.monotonic() + linger
+            elif deadline is None:
+                break
+
+        return batch
+
+    def ack(self, ids):
+        if ids:
+            self.redis_client.xack(TASK_STREAM, STREAM_GROUP, *ids)
+
+    def requeue(self, entries):
+        # nothing to do, un-acked entries stay in the PEL and get reclaimed
+        pass
+
+    @staticmethod
+    def _entries(entries):
+        # deleted (trimmed) entries come back with no fields
+        return [(entry_id, fields[b"task"]) for entry_id, fields in entries if fields]
+
+
+def validate_task(payload, task_model, priority_enum):
+    # same rules the Task model enforces, checked here so that one bad payload
+    # does not fail the whole multi-row INSERT
+    task = orjson.loads(payload)
+
+    title = task.get("title")
+    description = task.get("description")
+    user_id = task.get("user_id")
+    if not title or description is None or not user_id:
+        raise ValueError("title, description and user_id are required")
+    if len(title) > task_model.title.type.length:
+        raise ValueError("title is too long")
+
+    due_date = task.get("due_date")
+    if due_date:
+        due_date = date_parser.isoparse(due_date)
+
+    # every row must carry the same keys for the executemany INSERT
+    return {
+        "title": title,
+        "description": description,
+        "completion": bool(task.get("completion", False)),
+        "priority": priority_enum(task.get("priority") or priority_enum.MEDIUM.value),
+        "due_date": due_date,
+        "user_id": int(user_id),
+        "idempotency_key": task.get("idempotency_key"),
+        "request_id": task.get("request_id"),
+    }
+
+
+def write_batch(db, task_model, rows):
+    # single multi-row INSERT for the whole batch (insertmanyvalues on psycopg2),
+    # a row whose (user_id, idempotency_key) or request_id already exists is
+    # skipped, not an error. the request_id one makes a reclaimed stream entry
+    # (consumer died between commit and XACK) a no-op
+    table = task_model.__table__
+    if db.engine.dialect.name == "postgresql":
+        # no conflict target, covers both unique indexes
+        stmt = pg_insert(table).on_conflict_do_nothing()
+    elif db.engine.dialect.name == "sqlite":
+        stmt = sqlite_insert(table).on_conflict_do_nothing()
+    else:
+        stmt = insert(table)
+
+    # RETURNING gives us the ids for the request-status hash, skipped rows are absent
+    stmt = stmt.returning(table.c.id, table.c.user_id, table.c.request_id)
+    with FLUSH_SECONDS.time():
+        inserted = db.session.execute(stmt, rows).all()
+        db.session.commit()
+    return inserted
+
+
+def record_task_requests(redis_client, inserted, ttl):
+    # request_id -> task_id in one small hash per user, answered by
+    # GET /api/v1/tasks/requests/<request_id>. the TTL is per field, an EXPIRE on
+    # the hash would be pushed back by every new task and never run out
+    fields = {}
+    for task_id, user_id, request_id in inserted:
+        if request_id:
+            key = TASK_REQUESTS_KEY.format(user_id=user_id)
+            fields.setdefault(key, {})[request_id] = task_id
+    if not fields:
+        return
+
+    pipe = redis_client.pipeline(transaction=False)
+    for key, mapping in fields.items():
+        pipe.hset(key, mapping=mapping)
+        pipe.hexpire(key, ttl, *mapping)
+    pipe.execute()
+
+
+def payload_user(payload):
+    # user of a payload that did not validate, None when there is none
+    try:
+        return int(orjson.loads(payload)["user_id"])
+    except Exception:
+        return None
+
+
+def stored_before(db, task_model, request_ids):
+    # request ids skipped by the INSERT that are already in the table, i.e. a
+    # redelivered stream entry and not a duplicate Idempotency-Key
+    if not request_ids:
+        return set()
+    return set(
+        db.session.execute(
+            select(task_model.request_id).where(
+                task_model.request_id.in_(request_ids)
+            )
+        ).scalars()
+    )
+
+
+def settle(settled, dropped):
+    # quota: the tasks left the queue, the ones that were not stored give their
+    # slot back
+    from task_manager_api.extensions.task_counter import settle_queued_tasks
+
+    try:
+        settle_queued_tasks(settled, dropped)
+    except RedisError as e:
+        logger.error(f"Could not settle task quota counters: {e}")
+
+
+def handle_batch(db, redis_client, source, batch, request_ttl):
+    # one fetched batch: park the invalid payloads, one INSERT for the rest, ack,
+    # then the redis side effects. number of inserted rows, None when the
+    # INSERT failed and the batch went back to the source
+    from task_manager_api.models import Task, Priority
+    from task_manager_api.extensions.task_cache import invalidate_user_pages
+
+    rows, accepted, invalid = [], [], []
+    for entry_id, payload in batch:
+        try:
+            rows.append(validate_task(payload, Task, Priority))
+            accepted.append((entry_id, payload))
+        except Exception as e:
+            logger.warning(f"Invalid task payload sent to dead letter queue: {e}")
+            invalid.append((entry_id, payload))
+
+    if invalid:
+        TASKS_CONSUMED.labels("invalid").inc(len(invalid))
+        try:
+            redis_client.lpush(DEAD_LETTER_QUEUE, *[p for _, p in invalid])
+            source.ack([i for i, _ in invalid])
+        except RedisError as e:
+            logger.critical(f"Could not park invalid payloads: {e}")
+        users = Tally(payload_user(p) for _, p in invalid)
+        users.pop(None, None)
+        settle(users, users)
+
+    if not rows:
+        return 0
+
+    started = time.perf_counter()
+    try:
+        inserted = write_batch(db, Task, rows)
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Batch insert failed, requeueing {len(rows)} tasks, error={e}")
+        try:
+            source.requeue(accepted)
+            TASKS_CONSUMED.labels("requeued").inc(len(accepted))
+        except RedisError as re:
+            logger.critical(f"Could not requeue batch, tasks lost: {re}")
+            users = Tally(row["user_id"] for row in rows)
+            settle(users, users)
+        return None
+
+    try:
+        # acked only after the commit, a crash before this line replays the batch
+        source.ack([i for i, _ in accepted])
+    except RedisError as e:
+        logger.error(
+            f"XACK failed, batch will be reclaimed and inserted again: {e}"
+        )
+
+    # rows skipped by ON CONFLICT: a duplicate Idempotency-Key gives its slot
+    # back, a redelivered entry (request_id stored before) was counted already
+    queued = Tally(row["user_id"] for row in rows)
+    dropped = queued - Tally(user_id for _, user_id, _ in inserted)
+    if dropped:
+        stored = {request_id for _, _, request_id in inserted}
+        skipped = [
+            row["request_id"]
+            for row in rows
+            if row["request_id"] and row["request_id"] not in stored
+        ]
+        try:
+            redelivered = stored_before(db, Task, skipped)
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error(f"Could not look up skipped tasks: {e}")
+            redelivered = set()
+        dropped -= Tally(
+            row["user_id"] for row in rows if row["request_id"] in redelivered
+        )
+    settle(queued, dropped)
+
+    try:
+        record_task_requests(redis_client, inserted, request_ttl)
+        # new rows -> cached GET /tasks pages of these users are stale
+        invalidate_user_pages(redis_client, [row["user_id"] for row in rows])
+    except RedisError as e:
+        logger.error(f"Could not record task request statuses: {e}")
+
+    elapsed = time.perf_counter() - started
+    TASKS_CONSUMED.labels("inserted").inc(len(inserted))
+    BATCH_SIZE.observe(len(rows))
+    logger.info(
+        f"Inserted batch of {len(inserted)} tasks in {elapsed * 1000:.1f} ms "
+        f"({len(inserted) / max(elapsed, 1e-6):.0f} tasks/s)"
+    )
+    return len(inserted)
+
+
+def consume(app, batch_size, linger, transport="list"):
+    from task_manager_api import db
+    from task_manager_api.extensions import redis_client as redis_ext
+
+    redis_client = Redis(connection_pool=redis_ext.pool)
+    if transport == "stream":
+        source = StreamSource(
+            redis_client,
+            f"{socket.gethostname()}-{os.getpid()}",
+            app.config["BATCH_CONSUMER_RECLAIM_IDLE"],
+        )
+    else:
+        source = ListSource(redis_client)
+    logger.info(
+        f"Batch consumer started ({transport}) batch_size={batch_size}, "
+        f"linger={linger}s"
+    )
+
+    with app.app_context():
+        while True:
+            try:
+                batch = source.fetch(batch_size, linger)
+            except RedisError as e:
+                logger.error(f"Redis pop failed, retrying..., error={e}")
+                time.sleep(DB_RETRY_BACKOFF)
+                continue
+
+            if not batch:
+                continue
+
+            written = handle_batch(
+                db, redis_client, source, batch, app.config["TASK_REQUEST_TTL"]
+            )
+            if written is None:
+                time.sleep(DB_RETRY_BACKOFF)
+
+
+def main(argv=None):
+    from task_manager_api import create_app
+
+    app = create_app(start_batcher=False, start_web_threads=False)
+
+    arg_parser = argparse.ArgumentParser(
+        prog="python -m batch_process",
+        description=(
+            "Drain the redis task_queue/task_stream and bulk insert tasks into "
+            "postgres"
+        ),
+    )
+    arg_parser.add_argument(
+        "--batch-size", type=int, default=app.config["BATCH_CONSUMER_SIZE"]
+    )
+    arg_parser.add_argument(
+        "--linger",
+        type=float,
+        default=app.config["BATCH_CONSUMER_LINGER"],
+        help="seconds to wait for a batch to fill after the first task arrives",
+    )
+    arg_parser.add_argument(
+        "--metrics-port", type=int, default=app.config["BATCH_CONSUMER_METRICS_PORT"]
+    )
+    arg_parser.add_argument(
+        "--transport",
+        choices=["list", "stream"],
+        default=app.config["BATCH_TRANSPORT"],
+        help="list: task_queue (BLMPOP), stream: task_stream consumer group (XACK)",
+    )
+    args = arg_parser.parse_args(argv)
+
+    start_http_server(args.metrics_port)
+    consume(app, args.batch_size, args.linger, args.transport)
@@ -1,62 +1,124 @@
 import time
 from redis.exceptions import RedisError,ConnectionError
-from . import bucket_,MAX_PENDING_LIMIT, GLOBAL_LIMIT, total_commit 
-import batch_process
+from . import (
+    bucket_,
+    MAX_PENDING_LIMIT,
+    total_commit,
+    PUBLISH_CHUNK,
+    PUBLISH_RETRIES,
+    BREAKER_FAILURES,
+    BREAKER_RESET,
+)
 import logging
-import threading
 import os 
 import orjson
 from task_manager_api.extensions.redis_client import pool
+from task_manager_api.extensions.idempotency import dedupe_batch
 from redis import Redis
+from prometheus_client import Histogram
+from .spool import Spool, replaying as replay_spool
+from .publisher import CircuitBreaker, make_publisher
 
 logger = logging.getLogger(__name__)
 
-lock = threading.Lock()
-
 redis_client = Redis(connection_pool=pool,decode_responses=True)
 
+breaker = CircuitBreaker(BREAKER_FAILURES, BREAKER_RESET)
+publisher = None
+
+FLUSH_SECONDS = Histogram(
+    "batch_flush_seconds",
+    "Time taken by one bucket flush, by destination",
+    ["destination"],  # redis | spool
+)
+
+
+spool = None
 
-def emergency_fallback(payload_bytes ):
+
+def init_publisher(app):
+    # BATCH_TRANSPORT picks the LPUSH list or the XADD stream
+    global publisher
+    publisher = make_publisher(
+        redis_client,
+        app.config["BATCH_TRANSPORT"],
+        breaker,
+        stream_maxlen=app.config["TASK_STREAM_MAXLEN"],
+        chunk_size=PUBLISH_CHUNK,
+        retries=PUBLISH_RETRIES,
+    )
+    return publisher
+
+
+def init_spool(app):
+    # one spool per worker process, files are named after the pid
+    global spool
     try:
-        with open("/task_app/emergency_fallback.jsonl","ab") as f:
-            f.write(payload_bytes)
-            f.write(b"\n")
-        logger.info("Batch saved to local disk sucessfully")
+        spool = Spool(app.config["SPOOL_DIR"], app.config["SPOOL_SEGMENT_BYTES"])
+        spool.recover()
+    except OSError as e:
+        logger.critical(f"Spool directory {app.config['SPOOL_DIR']} unusable: {e}")
+    return spool
+
+
+def emergency_fallback(payload_batch):
+    try:
+        spool.append(payload_batch)
+        logger.info(
+            f"Batch of {len(payload_batch)} saved to the local spool sucessfully"
+        )
 
     except Exception as e: 
         logger.critical(f"TOTAL SYSTEM FAILURE: could not saved to disk : {e}")
 
 
+def replaying(app):
+    # started next to managing(), pushes the spool back once redis is healthy
+    if spool is None:
+        return
+    replay_spool(spool, publisher, app.config["SPOOL_REPLAY_INTERVAL"])
+
+
 def managing(app):
     with app.app_context():
-        global bucket_, total_commit, go_session
-        last_time_flush = time.time()
+        global total_commit, go_session
         while True:
-            processing_data = []
-
-            with lock:
-                
-                if  len(bucket_)>= GLOBAL_LIMIT or (bucket_   and ((time.time() - last_time_flush) >= MAX_PENDING_LIMIT)) : 
-                    processing_data = bucket_[:]
-                    bucket_.clear()
+            # sleeps on the bucket's condition, wakes only when GLOBAL_LIMIT tasks are
+            # pending or the oldest one waited MAX_PENDING_LIMIT seconds (no busy-poll)
+            processing_data = bucket_.wait_for_batch(MAX_PENDING_LIMIT)
             if processing_data:
                 try:
 
 
+                    # same Idempotency-Key twice in one flush (e.g. redis
+                    # fallback was local)
+                    processing_data = dedupe_batch(processing_data)
                     payload_batch =  [orjson.dumps(task) for task in processing_data]
 
+                    started = time.perf_counter()
+                    destination = "redis"
                     try:
-                        redis_client.lpush("task_queue", *payload_batch)
+                        # chunked + pipelined, retried with jitter, skipped while
+                        # the breaker is open
+                        publisher.publish(payload_batch)
                     except (ConnectionError,RedisError) as e:
                         logger.error(f"REDIS IS DOWN!, saving data to emergency file ..., error {e}")
-                        emergency_fallback(*payload_batch)
+                        destination = "spool"
+                        emergency_fallback(payload_batch)
+                    FLUSH_SECONDS.labels(destination).observe(
+                        time.perf_counter() - started
+                    )
 
 
                     total_commit += 1 # updating the total_commit parameter (only for debugging)
-                    last_time_flush = time.time()
                     logger.info(f"Batch commited of {len(processing_data)} request")
                     #
-                    logger.info(f"worker PID : {os.getpid()}, total_request: {batch_process.total_request}, total_batch_commited: {total_commit}")
+                    logger.info(
+                        f"worker PID : {os.getpid()}, "
+                        f"total_request: {bucket_.accepted}, "
+                        f"rejected: {bucket_.rejected}, "
+                        f"total_batch_commited: {total_commit}"
+                    )
                     #there is one thing like  bucket_id : cause earlier we were duing rebind (-ing ) which was literally a new object creation
                     # and referencing to that,  and in the threading , that is the worse thing to  stop your  function to run or work  
                     # now we chose the mutation. 
@@ -64,8 +126,4 @@ def managing(app):
                 except Exception as e:
 
                         logger.error(f"Batch redis push to queue failed , error={e}")
-             
-
-            time.sleep(0.01)
-
 
@@ -0,0 +1,141 @@
+import time
+import random
+import logging
+import threading
+from redis.exceptions import RedisError
+
+from . import TASK_QUEUE, TASK_STREAM
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RedisError):
+    # raised instead of talking to redis while the breaker is open
+    pass
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        # after reset_timeout exactly one caller gets through to probe redis
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and (
+                time.monotonic() - self._opened_at >= self.reset_timeout
+            ):
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Redis circuit breaker closed again")
+            self.state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.error(
+                        f"Redis circuit breaker OPEN after {self._failures} failures"
+                    )
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class RedisPublisher:
+    # pushes a flush to the queue in chunks of `chunk_size` inside one MULTI/EXEC
+    # pipeline, so a retry never duplicates half a batch
+
+    def __init__(
+        self,
+        redis_client,
+        queue,
+        breaker,
+        chunk_size=100,
+        retries=3,
+        base_delay=0.05,
+        max_delay=0.5,
+    ):
+        self.redis_client = redis_client
+        self.queue = queue
+        self.breaker = breaker
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def push(self, payloads):
+        # one round-trip, no retry and no breaker (the spool replayer uses this)
+        pipe = self.redis_client.pipeline(transaction=True)
+        for i in range(0, len(payloads), self.chunk_size):
+            self._enqueue(pipe, payloads[i : i + self.chunk_size])
+        pipe.execute()
+
+    def _enqueue(self, pipe, chunk):
+        pipe.lpush(self.queue, *chunk)
+
+    def publish(self, payloads):
+        if not self.breaker.allow():
+            raise CircuitOpenError("circuit open, redis skipped")
+
+        for attempt in range(self.retries + 1):
+            try:
+                self.push(payloads)
+                self.breaker.record_success()
+                return
+            except RedisError as e:
+                if attempt == self.retries:
+                    self.breaker.record_failure()
+                    raise
+                # full jitter backoff
+                delay = random.uniform(
+                    0, min(self.max_delay, self.base_delay * 2**attempt)
+                )
+                logger.warning(
+                    f"Redis push failed (attempt {attempt + 1}), "
+                    f"retrying in {delay:.3f}s: {e}"
+                )
+                time.sleep(delay)
+
+
+class StreamPublisher(RedisPublisher):
+    # XADD transport, entries stay pending in the consumer group until the
+    # consumer XACKs them after its DB commit (at-least-once)
+
+    def __init__(self, redis_client, stream, breaker, maxlen, **kwargs):
+        super().__init__(redis_client, stream, breaker, **kwargs)
+        self.maxlen = maxlen
+
+    def _enqueue(self, pipe, chunk):
+        for payload in chunk:
+            pipe.xadd(
+                self.queue, {"task": payload}, maxlen=self.maxlen, approximate=True
+            )
+
+
+def make_publisher(redis_client, transport, breaker, stream_maxlen=None, **kwargs):
+    if transport == "stream":
+        return StreamPublisher(
+            redis_client, TASK_STREAM, breaker, maxlen=stream_maxlen, **kwargs
+        )
+    if transport != "list":
+        raise ValueError(
+            f"Unknown batch transport {transport!r}, use 'list' or 'stream'"
+        )
+    return RedisPublisher(redis_client, TASK_QUEUE, breaker, **kwargs)
@@ -0,0 +1,251 @@
+import os
+import glob
+import time
+import fcntl
+import logging
+import threading
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+# tasks per pipeline round-trip while replaying
+REPLAY_CHUNK = 500
+
+# file life cycle:  <pid>-<seq>.open  (active, flock-ed by its worker)
+#               ->  <pid>-<seq>.seg   (sealed, waiting for replay)
+#               ->  <pid>-<seq>.seg.replaying  (claimed by one replayer, flock-ed)
+ACTIVE_SUFFIX = ".open"
+SEALED_SUFFIX = ".seg"
+CLAIMED_SUFFIX = ".replaying"
+# next to a file replayed with replay_file, byte offset pushed so far
+OFFSET_SUFFIX = ".offset"
+
+
+class Spool:
+    # append-only segment files, one writer per worker process. used when redis
+    # is unreachable so the tasks we already answered 202 for are not lost
+
+    def __init__(self, directory, segment_bytes):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.pending = threading.Event()
+        self._lock = threading.Lock()
+        self._file = None
+        self._path = None
+        self._seq = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def append(self, payloads):
+        # one write + one fsync per batch (not per task)
+        data = b"\n".join(payloads) + b"\n"
+        with self._lock:
+            f = self._active()
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            if f.tell() >= self.segment_bytes:
+                self._seal()
+            self.pending.set()
+
+    def seal(self):
+        with self._lock:
+            self._seal()
+
+    def write_sealed(self, payloads):
+        # used by the replayer to put back what it could not push
+        with self._lock:
+            path = self._next_path(SEALED_SUFFIX)
+            with open(path + ".tmp", "wb") as f:
+                f.write(b"\n".join(payloads) + b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + ".tmp", path)
+            self.pending.set()
+
+    def sealed_segments(self):
+        return sorted(glob.glob(os.path.join(self.directory, f"*{SEALED_SUFFIX}")))
+
+    def settle(self):
+        # clears `pending` only if there is really nothing left, under the lock so
+        # a concurrent append can not be missed
+        with self._lock:
+            if self._file is None and not self.sealed_segments():
+                self.pending.clear()
+                return True
+            return False
+
+    def recover(self):
+        # segments left behind by dead workers (or a crashed replayer) are sealed
+        # so they get replayed, a live owner still holds its flock so we skip it
+        stale = glob.glob(os.path.join(self.directory, f"*{ACTIVE_SUFFIX}"))
+        stale += glob.glob(os.path.join(self.directory, f"*{CLAIMED_SUFFIX}"))
+        for path in stale:
+            try:
+                with open(path, "rb") as f:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    target = path.removesuffix(ACTIVE_SUFFIX).removesuffix(
+                        CLAIMED_SUFFIX
+                    )
+                    if not target.endswith(SEALED_SUFFIX):
+                        target += SEALED_SUFFIX
+                    os.replace(path, target)
+                    logger.warning(f"Recovered orphaned spool segment {target}")
+            except BlockingIOError:
+                continue
+            except FileNotFoundError:
+                continue
+
+        if self.sealed_segments():
+            self.pending.set()
+
+    def _active(self):
+        if self._file is None:
+            self._path = self._next_path(ACTIVE_SUFFIX)
+            self._file = open(self._path, "ab")
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return self._file
+
+    def _seal(self):
+        if self._file is None:
+            return
+        path = self._path
+        os.replace(path, path.removesuffix(ACTIVE_SUFFIX) + SEALED_SUFFIX)
+        self._file.close()
+        self._file = None
+        self._path = None
+
+    def _next_path(self, suffix):
+        self._seq += 1
+        name = f"{os.getpid()}-{time.time_ns()}-{self._seq:06d}{suffix}"
+        return os.path.join(self.directory, name)
+
+
+def iter_lines(f):
+    for line in f:
+        line = line.rstrip(b"\n")
+        if line:
+            yield line
+
+
+def replay_segment(publisher, path, spool=None):
+    # streams one sealed segment back through the publisher (list or stream),
+    # returns how many tasks went through. on a redis error the rest is written
+    # back as a new segment
+    claimed = path + CLAIMED_SUFFIX
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return 0  # another worker got it first
+
+    pushed = 0
+    with f:
+        # locked before the rename: recover() never sees the claimed file
+        # unlocked, so it can not hand it back as a .seg while we push it
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return 0  # another replayer holds it
+        try:
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            return 0  # replayed and removed by another worker before our flock
+        lines = iter_lines(f)
+        chunk = []
+        try:
+            for line in lines:
+                chunk.append(line)
+                if len(chunk) >= REPLAY_CHUNK:
+                    publisher.push(chunk)
+                    pushed += len(chunk)
+                    chunk = []
+            if chunk:
+                publisher.push(chunk)
+                pushed += len(chunk)
+                chunk = []
+        except RedisError as e:
+            rest = chunk + list(lines)
+            logger.error(
+                f"Replay of {path} stopped after {pushed} tasks, "
+                f"{len(rest)} kept, error={e}"
+            )
+            if spool is not None:
+                spool.write_sealed(rest)
+            else:
+                with open(path + ".tmp", "wb") as out:
+                    out.write(b"\n".join(rest) + b"\n")
+                os.replace(path + ".tmp", path)
+            os.remove(claimed)
+            raise
+        # still under the flock, recover() must not find it unlocked in between
+        os.remove(claimed)
+    return pushed
+
+
+def _read_offset(path):
+    try:
+        with open(path) as f:
+            return int(f.read() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def _write_offset(path, offset):
+    with open(path + ".tmp", "w") as f:
+        f.write(str(offset))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+
+def replay_file(publisher, path):
+    # for files outside the spool life cycle (e.g. the old emergency_fallback.jsonl)
+    # the file is not ours to rename, so progress goes to <path>.offset after
+    # every pushed chunk. a retry after a redis error (or a second run) starts
+    # there instead of pushing the same tasks again
+    progress = path + OFFSET_SUFFIX
+    pushed = 0
+    with open(path, "rb") as f:
+        f.seek(_read_offset(progress))
+        chunk = []
+        for line in iter_lines(f):
+            chunk.append(line)
+            if len(chunk) >= REPLAY_CHUNK:
+                publisher.push(chunk)
+                pushed += len(chunk)
+                chunk = []
+                _write_offset(progress, f.tell())
+        if chunk:
+            publisher.push(chunk)
+            pushed += len(chunk)
+        _write_offset(progress, f.tell())
+    return pushed
+
+
+def replay_all(publisher, spool):
+    pushed = 0
+    for path in spool.sealed_segments():
+        pushed += replay_segment(publisher, path, spool)
+    return pushed
+
+
+def replaying(spool, publisher, interval):
+    # background re-ingest: idle until something was spooled, then retries every
+    # `interval` seconds until redis answers and the spool is empty again
+    while True:
+        spool.pending.wait()
+        try:
+            publisher.redis_client.ping()
+            spool.seal()
+            pushed = replay_all(publisher, spool)
+            if pushed:
+                logger.info(
+                    f"Replayed {pushed} spooled tasks back into {publisher.queue}"
+                )
+            if spool.settle():
+                continue
+        except RedisError as e:
+            logger.warning(f"Redis still unavailable, spool replay postponed: {e}")
+        except Exception as e:
+            logger.error(f"Spool replay failed: {e}")
+
+        time.sleep(interval)
@@ -0,0 +1,5 @@
+from task_manager_api import create_app
+
+# for the flask CLI (flask --app manage.py spool replay): no batcher, spool
+# replayer, rate limit sync or bloom rebuild threads next to the command
+app = create_app(start_batcher=False, start_web_threads=False)
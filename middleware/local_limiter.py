@@ -0,0 +1,140 @@
+import time
+import math
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# per worker token buckets in front of the redis GCRA state (rate_limiter.py).
+# requests are decided here without any network, the hits are pushed to redis in
+# one batch every `interval` seconds and each bucket gets the global remaining
+# budget (all workers) back. between two syncs the workers together can go over
+# the limit by at most what they let through in one interval, up to workers x
+# limit for a burst, so limits under `min_limit` are left to redis (handles())
+
+
+class RateLimiterUnavailable(Exception):
+    # redis is unreachable and the limiter runs fail-closed
+    pass
+
+
+class _Bucket:
+    __slots__ = ("limit", "window", "remaining", "pending", "synced_at", "seen_at")
+
+    def __init__(self, limit, window, remaining, now):
+        self.limit = limit
+        self.window = window
+        self.remaining = remaining  # global budget at the last sync
+        self.pending = 0  # let through here since then, not in redis yet
+        self.synced_at = now
+        self.seen_at = now
+
+
+class LocalLimiter:
+    def __init__(
+        self, sync, interval, fail_closed=False, min_limit=0, clock=time.monotonic
+    ):
+        # sync([(key, limit, window, hits), ...]) -> [remaining, ...], raises when
+        # redis is not reachable (an empty batch is a health probe)
+        self._sync = sync
+        self.interval = interval
+        self.fail_closed = fail_closed
+        self.min_limit = min_limit
+        self._clock = clock
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.healthy = True
+
+    def handles(self, limit):
+        # small limits: the per worker overshoot would be a multiple of the limit
+        return limit >= self.min_limit
+
+    def acquire(self, key, limit, window):
+        # (allowed, remaining, retry_after_ms, reset_ms)
+        with self._lock:
+            bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._first_sight(key, limit, window)
+
+        if self.fail_closed and not self.healthy:
+            raise RateLimiterUnavailable("rate limiter state unreachable")
+
+        emission = window * 1000 / limit
+        with self._lock:
+            now = self._clock()
+            bucket.seen_at = now
+            # refill since the last sync, never above a full burst
+            refilled = (now - bucket.synced_at) * 1000 / emission
+            available = min(limit, bucket.remaining + refilled) - bucket.pending
+            if available < 1:
+                return False, 0, math.ceil((1 - available) * emission), math.ceil(
+                    (limit - available) * emission
+                )
+            bucket.pending += 1
+            available -= 1
+            return True, int(available), 0, math.ceil((limit - available) * emission)
+
+    def _first_sight(self, key, limit, window):
+        # one blocking round-trip per key and worker, skipped while redis is down
+        remaining = limit
+        if self.healthy:
+            try:
+                remaining = self._sync([(key, limit, window, 0)])[0]
+            except Exception as e:
+                self._mark_down(e)
+        with self._lock:
+            # another thread may have been faster
+            return self._buckets.setdefault(
+                key, _Bucket(limit, window, remaining, self._clock())
+            )
+
+    def sync_once(self):
+        now = self._clock()
+        with self._lock:
+            # idle for a whole window means full again, redis knows the rest
+            for key in [
+                key
+                for key, bucket in self._buckets.items()
+                if not bucket.pending and now - bucket.seen_at > bucket.window
+            ]:
+                del self._buckets[key]
+            batch = [
+                (key, bucket.limit, bucket.window, bucket.pending)
+                for key, bucket in self._buckets.items()
+            ]
+        if not batch and self.healthy:
+            return
+
+        try:
+            results = self._sync(batch)
+        except Exception as e:
+            # the hits stay pending and go with the next sync
+            self._mark_down(e)
+            return
+
+        with self._lock:
+            for (key, _, _, hits), remaining in zip(batch, results, strict=True):
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    continue
+                bucket.pending -= hits
+                bucket.remaining = remaining
+                bucket.synced_at = now
+        if not self.healthy:
+            logger.info("Rate limiter synced with redis again")
+        self.healthy = True
+
+    def _mark_down(self, e):
+        if self.healthy:
+            mode = "rejecting requests" if self.fail_closed else "deciding locally"
+            logger.error(f"Rate limiter sync failed, {mode} until redis is back: {e}")
+        self.healthy = False
+
+    def run(self, stop=None):
+        # background thread, started once per worker by init_rate_limiter()
+        stop = stop or threading.Event()
+        while not stop.wait(self.interval):
+            try:
+                self.sync_once()
+            except Exception as e:
+                logger.exception(f"Rate limiter sync loop error: {e}")
@@ -1,11 +1,14 @@
 import time
+import math
+import threading
 from functools import wraps
-from flask import request, current_app
+from flask import make_response, current_app
+from redis.exceptions import RedisError
+from prometheus_client import Counter
 from task_manager_api import logging
-from task_manager_api.utils import decode_access_token
-from task_manager_api.extensions.redis_client import pool
-from task_manager_api.error_handler import too_many_requests
-from redis import Redis
+from task_manager_api.extensions.redis_client import get_redis, get_script
+from task_manager_api.error_handler import too_many_requests, service_unavailable
+from middleware.local_limiter import LocalLimiter, RateLimiterUnavailable
 # from collections import defaultdict, deque
 
 # This is the biggest culprit in the game , it cause the new connection for each get_redis_client, which cause the TCP connection to be exhausted becasue OS  just ran off the ephemeral ports ,  and under Heavy load this thing only come to know . 
@@ -31,23 +34,69 @@ from redis import Redis
 
 logger = logging.getLogger(__name__)
 
-
-
-rate_limit_script = """
+RATE_LIMIT = Counter(
+    "rate_limit_requests_total",
+    "Per user rate limit decisions",
+    ["result"],  # allowed | limited | error | unavailable
+)
+
+RATE_LIMIT_SYNC = Counter(
+    "rate_limit_sync_total",
+    "Batched syncs of the per worker buckets with redis",
+    ["result"],  # ok | error
+)
+
+
+# GCRA (generic cell rate algorithm): `limit` requests per `window` seconds,
+# spaced one emission interval (window / limit) apart, bursts up to `limit`.
+# the whole state is one number per user, the theoretical arrival time (TAT)
+# of the next request, instead of a ZSET member per request.
+# the clock is redis' own, so every worker agrees on "now"
+gcra_script = """
 local key = KEYS[1]
-local window = tonumber(ARGV[1])
-local max_request = tonumber(ARGV[2])
-local now = tonumber(ARGV[3])
-
-redis.call('ZREMRANGEBYSCORE',key,0,now-window)
-local count =  redis.call('ZCARD',key)
-
-if count >= max_request then return 0  end
-
-redis.call('ZADD',key,now,now)
-redis.call('EXPIRE', key,window+10)
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2]) * 1000
+local emission = window / limit
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+local tat = tonumber(redis.call('GET', key) or now)
+if tat < now then tat = now end
+local new_tat = tat + emission
+local allow_at = new_tat - window
+
+if now < allow_at then
+    -- {allowed, remaining, retry after ms, reset ms}
+    return {0, 0, math.ceil(allow_at - now), math.ceil(tat - now)}
+end
+
+local ttl = math.ceil(new_tat - now)
+redis.call('SET', key, string.format('%d', math.ceil(new_tat)), 'PX', ttl)
+return {1, math.floor((now - allow_at) / emission), 0, ttl}
+"""
 
-return 1 -- return True when we can accept the request
+# the local tier's batch: push `hits` requests a worker already let through into
+# the same TAT, return what is left for everybody. hits over the limit (workers
+# racing between two syncs) only empty the bucket, they do not push it into debt
+gcra_sync_script = """
+local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2]) * 1000
+local hits = tonumber(ARGV[3])
+local emission = window / limit
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+local tat = tonumber(redis.call('GET', key) or now)
+if tat < now then tat = now end
+if hits > 0 then
+    tat = math.min(tat + hits * emission, now + window)
+    local ttl = math.ceil(tat - now)
+    redis.call('SET', key, string.format('%d', math.ceil(tat)), 'PX', ttl)
+end
+return math.floor((now + window - tat) / emission)
 """
 
 user_record_failed_attempt_script = """
@@ -63,57 +112,126 @@ redis.call('EXPIRE', key,window+10)
 """
 
 
-# PER-IP related
-def is_rate_limited(key_prefix, limit, window_size):
-    redis_client = Redis(connection_pool=pool,decode_responses=True)
-    script = redis_client.register_script(rate_limit_script)
-    now = int(time.time())
-    return script(keys=[key_prefix], args=[window_size, limit, now])
-
-
 # PER-USER related
-def record_failed_attempt(key_prefix, limit, window_size): 
-
-    redis_client = Redis(connection_pool=pool,decode_responses=True)
-    script = redis_client.register_script(user_record_failed_attempt_script)
+def check_rate_limit(key, limit, window_size):
+    # (allowed, remaining, retry_after_ms, reset_ms), one EVALSHA
+    allowed, remaining, retry_after, reset = get_script(gcra_script)(
+        keys=[key], args=[limit, window_size]
+    )
+    return bool(allowed), remaining, retry_after, reset
+
+
+def sync_buckets(batch):
+    # one pipeline for every active bucket of this worker
+    redis_client = get_redis()
+    if not batch:
+        redis_client.ping()
+        return []
+    script = get_script(gcra_sync_script)
+    pipe = redis_client.pipeline(transaction=False)
+    for key, limit, window_size, hits in batch:
+        script(keys=[key], args=[limit, window_size, hits], client=pipe)
+    try:
+        results = pipe.execute()
+    except RedisError:
+        RATE_LIMIT_SYNC.labels("error").inc()
+        raise
+    RATE_LIMIT_SYNC.labels("ok").inc()
+    return results
+
+
+# set by init_rate_limiter(), None = every request asks redis itself
+local_limiter = None
+
+
+def init_rate_limiter(app):
+    # web workers only, RATE_LIMIT_SYNC_INTERVAL=0 turns the local tier off
+    global local_limiter
+    interval = app.config["RATE_LIMIT_SYNC_INTERVAL"]
+    if interval <= 0:
+        local_limiter = None
+        return None
+    local_limiter = LocalLimiter(
+        sync_buckets,
+        interval,
+        fail_closed=app.config["RATE_LIMIT_FAIL_MODE"] == "closed",
+        min_limit=app.config["RATE_LIMIT_LOCAL_MIN_LIMIT"],
+    )
+    threading.Thread(target=local_limiter.run, daemon=True).start()
+    return local_limiter
+
+
+def rate_limit_headers(limit, remaining, reset_ms):
+    return {
+        "X-RateLimit-Limit": str(limit),
+        "X-RateLimit-Remaining": str(remaining),
+        # seconds until the user is back to a full burst
+        "X-RateLimit-Reset": str(math.ceil(reset_ms / 1000)),
+    }
+
+
+# login failures (auth routes), at most a handful of members per identifier
+def record_failed_attempt(key_prefix, limit, window_size):
     now = int(time.time())
-    return script(keys=[key_prefix], args=[window_size, limit, now])
+    return get_script(user_record_failed_attempt_script)(
+        keys=[key_prefix], args=[window_size, limit, now]
+    )
 
 
 def is_user_blocked(key_prefix, user_max_request):
-
-    redis_client = Redis(connection_pool=pool,decode_responses=True)
-    count = redis_client.zcard(key_prefix)
+    count = get_redis().zcard(key_prefix)
     return count >= user_max_request
 
 
-###############
-
-
 ######################################
 # Decorator for the user-id rate limit
 # ###################################
 
+# goes under token_required, which hands the verified user_id to the view
 def rate_limit(identifier, limit, window_size):
     def decorator(f):
         @wraps(f)
-        def wrapper(*args, **kwargs):
-            # token is used cause they are already verified 
-            token = request.headers.get("Authorization").split(" ")[1]
-            user_id = decode_access_token(token)
-
-            key_prefix_user_id = f"{identifier}:user_id:{user_id}"
-
-            logger.info(f"User-Id=> {key_prefix_user_id}")
-
-            # if sliding_window(window_queue, window_size, limit, key_ip):
-            #     return f(*args, **kwargs)
-
-            if not is_rate_limited(key_prefix_user_id, limit, window_size):
-                logger.error(f" Blocked user_id : {user_id} for too many request ")
-                return too_many_requests(msg="Rate Limit Exceeded ::) ")
-
-            return f(*args, **kwargs)
+        def wrapper(user_id, *args, **kwargs):
+            key = f"ratelimit:{identifier}:{limit}:{window_size}:{user_id}"
+            try:
+                if local_limiter is not None and local_limiter.handles(limit):
+                    decision = local_limiter.acquire(key, limit, window_size)
+                else:
+                    decision = check_rate_limit(key, limit, window_size)
+                allowed, remaining, retry_after, reset = decision
+            except (RedisError, RateLimiterUnavailable) as e:
+                if current_app.config.get("RATE_LIMIT_FAIL_MODE", "open") == "closed":
+                    RATE_LIMIT.labels("unavailable").inc()
+                    logger.error(
+                        f"Rate limiter unavailable, rejecting user_id={user_id}: {e}"
+                    )
+                    return service_unavailable(msg="Rate limiter unavailable")
+                # fail open, an unreachable redis should not take the API down
+                RATE_LIMIT.labels("error").inc()
+                logger.error(
+                    f"Rate limiter unavailable, letting user_id={user_id} through: {e}"
+                )
+                return f(user_id, *args, **kwargs)
+
+            headers = rate_limit_headers(limit, remaining, reset)
+            if not allowed:
+                RATE_LIMIT.labels("limited").inc()
+                logger.warning(
+                    f"Blocked user_id={user_id} on {identifier}, too many requests"
+                )
+                response = make_response(
+                    too_many_requests(
+                        msg="Rate Limit Exceeded ::) ",
+                        retry_after=math.ceil(retry_after / 1000),
+                    )
+                )
+                response.headers.update(headers)
+                return response
+
+            RATE_LIMIT.labels("allowed").inc()
+            response = make_response(f(user_id, *args, **kwargs))
+            response.headers.update(headers)
+            return response
 
         return wrapper
 
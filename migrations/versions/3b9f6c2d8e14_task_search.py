@@ -0,0 +1,65 @@
+"""task search (tsvector + GIN, pg_trgm)
+
+Revision ID: 3b9f6c2d8e14
+Revises: e7b41f0c9d36
+Create Date: 2026-10-18 18:31:07.204518
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9f6c2d8e14'
+down_revision = 'e7b41f0c9d36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # postgres only, sqlite gets its FTS5 table from create_all (models.py)
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # 'simple' config: no stemming / stop words, tasks are not all english,
+    # prefix queries (word:*) do the rest. adding a STORED column rewrites the table
+    op.execute(
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('simple', "
+        "coalesce(title, '') || ' ' || coalesce(description, ''))) STORED"
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_tasks_search_vector',
+            'tasks',
+            ['search_vector'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'ix_tasks_title_trgm',
+            'tasks',
+            ['title'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={'title': 'gin_trgm_ops'},
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    with op.get_context().autocommit_block():
+        for name in ('ix_tasks_title_trgm', 'ix_tasks_search_vector'):
+            op.drop_index(
+                name,
+                table_name='tasks',
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+    op.execute('ALTER TABLE tasks DROP COLUMN IF EXISTS search_vector')
@@ -0,0 +1,44 @@
+"""task request id unique
+
+Revision ID: 6d2a8f1e9c47
+Revises: 3b9f6c2d8e14
+Create Date: 2026-10-18 19:12:44.310962
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '6d2a8f1e9c47'
+down_revision = '3b9f6c2d8e14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # a stream entry reclaimed (XAUTOCLAIM) after a consumer died between its
+    # commit and its XACK was inserted twice, keep the first row of each request
+    op.execute(
+        'DELETE FROM tasks WHERE request_id IS NOT NULL AND id NOT IN '
+        '(SELECT min(id) FROM tasks WHERE request_id IS NOT NULL GROUP BY request_id)'
+    )
+    # from here on the consumer's ON CONFLICT DO NOTHING skips the redelivery
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'uq_tasks_request_id',
+            'tasks',
+            ['request_id'],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'uq_tasks_request_id',
+            table_name='tasks',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,49 @@
+"""task query indexes
+
+Revision ID: c5d8e2f47a91
+Revises: 9a6e3d5c1f20
+Create Date: 2026-10-18 11:48:02.904117
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d8e2f47a91'
+down_revision = '9a6e3d5c1f20'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_tasks_user_id_id', ['user_id', 'id']),
+    ('ix_tasks_user_id_completion_id', ['user_id', 'completion', 'id']),
+    ('ix_tasks_user_id_created_at', ['user_id', 'created_at']),
+    ('ix_tasks_user_id_title', ['user_id', 'title']),
+]
+
+
+def upgrade():
+    # CONCURRENTLY so a big tasks table keeps taking writes while the indexes build,
+    # it can not run inside the migration transaction
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(
+                name,
+                'tasks',
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name='tasks',
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
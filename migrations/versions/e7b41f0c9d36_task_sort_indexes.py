@@ -0,0 +1,62 @@
+"""task sort indexes
+
+Revision ID: e7b41f0c9d36
+Revises: c5d8e2f47a91
+Create Date: 2026-10-18 18:25:41.512330
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b41f0c9d36'
+down_revision = 'c5d8e2f47a91'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_tasks_user_id_created_at_id', ['user_id', 'created_at', 'id']),
+    ('ix_tasks_user_id_due_date_id', ['user_id', 'due_date', 'id']),
+    ('ix_tasks_user_id_priority_id', ['user_id', 'priority', 'id']),
+]
+
+
+def upgrade():
+    # (user_id, created_at, id) also serves the created_at range filter, so the
+    # two column index from c5d8e2f47a91 goes once its replacement exists
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(
+                name,
+                'tasks',
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+        op.drop_index(
+            'ix_tasks_user_id_created_at',
+            table_name='tasks',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_tasks_user_id_created_at',
+            'tasks',
+            ['user_id', 'created_at'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        for name, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name='tasks',
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
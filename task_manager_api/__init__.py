@@ -2,9 +2,9 @@ from flask_sqlalchemy import SQLAlchemy
 import threading
 from task_manager_api.config import get_config
 from flask import Flask, jsonify
-from flask_bcrypt import Bcrypt
 import logging.config
 from .logging_config import setup_logging
+from .extensions.password_hasher import PasswordHasher
 from flask_mail import Mail
 from flask_migrate import Migrate
 from prometheus_flask_exporter import PrometheusMetrics
@@ -12,12 +12,22 @@ import time
 
 
 db = SQLAlchemy()
-bcrypt = Bcrypt()
+password_hasher = PasswordHasher()
 mail = Mail()
 migrate = Migrate()
 
-def create_app(config_class=None, verbose=False, quiet=False, log_to_file=True):
+def create_app(
+    config_class=None,
+    verbose=False,
+    quiet=False,
+    log_to_file=True,
+    start_batcher=True,
+    start_web_threads=True,
+):
     app = Flask(__name__)
+    # orjson for every jsonify() (routes, error_handler, root)
+    from .json_provider import OrjsonProvider
+    app.json = OrjsonProvider(app)
     # here we are creating dynamic attribute
     app.config.from_object(get_config())
 
@@ -34,7 +44,7 @@ def create_app(config_class=None, verbose=False, quiet=False, log_to_file=True):
     db.init_app(
         app
     )  # this will create the instance to use the flask app outside the main run
-    bcrypt.init_app(app)
+    password_hasher.init_app(app)
     mail.init_app(app)
     migrate.init_app(app, db)
 
@@ -53,11 +63,33 @@ def create_app(config_class=None, verbose=False, quiet=False, log_to_file=True):
 
 
     ## thread register 
-    #
-    from batch_process.manager import managing
-    worker_thread = threading.Thread(target=managing,args=(app,), daemon=True)
-    worker_thread.start()
-    logger.info(f"Thread started {time.time()}")
+    # (the standalone consumer `python -m batch_process` does not need the
+    # web-side batcher)
+    if start_batcher:
+        from batch_process.manager import (
+            managing,
+            init_publisher,
+            init_spool,
+            replaying,
+        )
+        init_publisher(app)
+        init_spool(app)
+        worker_thread = threading.Thread(target=managing,args=(app,), daemon=True)
+        worker_thread.start()
+        replay_thread = threading.Thread(target=replaying, args=(app,), daemon=True)
+        replay_thread.start()
+        logger.info(f"Thread started {time.time()}")
+
+    # threads only the request serving workers need (the consumer and the CLI
+    # serve no requests)
+    if start_web_threads:
+        # per worker rate limit buckets, synced with redis in the background
+        from middleware.rate_limiter import init_rate_limiter
+        init_rate_limiter(app)
+
+        # bloom filter of registered users, one worker rebuilds it
+        from task_manager_api.extensions.user_cache import rebuild_bloom
+        threading.Thread(target=rebuild_bloom, args=(app,), daemon=True).start()
 
 
 
@@ -97,10 +129,14 @@ def create_app(config_class=None, verbose=False, quiet=False, log_to_file=True):
 
     # Max_content_request_length (MEaning a request throught wont be greater than 2MB , cause for the safety)
     
-    app.config["Max_Content_Length"] = 2 * 1024 * 1024
+    app.config["MAX_CONTENT_LENGTH"] = 2 * 1024 * 1024
 
     from .error_handler import register_payload_error_handler
 
     register_payload_error_handler(app)
 
+    # flask --app manage.py spool (replay|status)
+    from batch_process.cli import spool_cli
+    app.cli.add_command(spool_cli)
+
     return app
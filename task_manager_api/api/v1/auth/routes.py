@@ -2,7 +2,13 @@ from flask import Blueprint, jsonify, request
 from task_manager_api import db
 from task_manager_api.models import User, PasswordReset
 from flask import current_app
-from task_manager_api import bcrypt
+from task_manager_api import password_hasher
+from task_manager_api.extensions.password_hasher import HasherBusy
+from task_manager_api.extensions.user_cache import (
+    find_user,
+    user_registered,
+    invalidate_user,
+)
 from task_manager_api.utils import (
     generate_token,
     generate_token_otp,
@@ -20,6 +26,7 @@ from task_manager_api.error_handler import (
     forbidden_access,
     bad_request,
     too_many_requests,
+    service_unavailable,
 )
 from task_manager_api.schemas import (
     RegisterSchema,
@@ -29,7 +36,7 @@ from task_manager_api.schemas import (
     ResetPassword,
     VerifyOtp,
 )
-from sqlalchemy import delete
+from sqlalchemy import delete, update
 import sqlalchemy
 import logging
 import datetime
@@ -64,23 +71,28 @@ def signup():
     email = data["email"]
 
     # ### CHECK FOR ALREADY EXISTING USER-ESSENTIALS ####
-    if User.query.filter_by(username=user_name).first():
+    # (bloom filter + lookup cache, new names mostly never reach the DB)
+    if find_user("username", user_name):
         logger.warning(f"Signup attempt using existing username {user_name}")
         return user_already_exists("username already exist")
 
-    if User.query.filter_by(email=email).first():
+    if find_user("email", email):
         logger.warning(f"Signup attempt using existing email {email}")
         return user_already_exists("email already in use")
 
     # #### Hashing Password ####
     try:
-        hashed_password = bcrypt.generate_password_hash(data["password"]).decode(
-            "utf-8"
-        )
+        hashed_password = password_hasher.generate_password_hash(data["password"])
+    except HasherBusy as e:
+        logger.warning(f"Signup refused for username={user_name}: {e}")
+        return service_unavailable(msg="Too many password operations, retry later")
+
+    try:
         new_user = User(username=user_name, email=email,
                         password_hash=hashed_password)
         db.session.add(new_user)
         db.session.commit()
+        user_registered(email, user_name)
         logger.info(f"User Created:  username={user_name}, user_id={new_user.id}")
         return jsonify({"message": f"{user_name} user created Sucessfully"}), 201
 
@@ -115,14 +127,14 @@ def login():
     # FLexibility [User can use username or email to login]
     if data.get("email"):
         email_log_flag = True
-        user = User.query.filter_by(email=data["email"]).first()
+        user = find_user("email", data["email"])
         if not user:
             logger.error(f"User not found with email = {data['email']}")
             return not_found(msg="User Not Found",reason="user is not registered")
 
         logger.info(f"User used email={data['email']} as the login")
     else:
-        user = User.query.filter_by(username=data["username"]).first()
+        user = find_user("username", data["username"])
         if not user:
             logger.error(f"User not found with email = {data['username']}")
             return not_found()
@@ -142,7 +154,15 @@ def login():
         return too_many_requests(msg="Rate limit Exceeded")
 
     # ### Password Authentication####
-    if not user or not bcrypt.check_password_hash(user.password_hash, data["password"]):
+    try:
+        password_ok = password_hasher.check_password_hash(
+            user.password_hash, data["password"]
+        )
+    except HasherBusy as e:
+        logger.warning(f"Login refused for identifier={identifier}: {e}")
+        return service_unavailable(msg="Too many password operations, retry later")
+
+    if not password_ok:
         logger.warning(
             f"Failed login attempt: for identifier={identifier} from IP={
                 request.remote_addr
@@ -151,6 +171,28 @@ def login():
         record_failed_attempt(key_prefix, limit=5, window_size=15 * 60)
         return unauthorized_error(msg="Invalid Credentials")
 
+    # hash made under an older BCRYPT_LOG_ROUNDS, the plain password is only
+    # around now so this is the moment to upgrade it
+    if password_hasher.needs_rehash(user.password_hash):
+        try:
+            db.session.execute(
+                update(User)
+                .where(User.id == user.id)
+                .values(
+                    password_hash=password_hasher.generate_password_hash(
+                        data["password"]
+                    )
+                )
+            )
+            db.session.commit()
+            invalidate_user(user.email, user.username)
+            logger.info(f"Password hash upgraded for user_id={user.id}")
+        except HasherBusy:
+            pass  # next login then
+        except sqlalchemy.exc.SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error(f"Password hash upgrade failed for user_id={user.id}: {e}")
+
     # ###Token Generation ####
     try:
         token = generate_token(user.id)
@@ -295,7 +337,9 @@ def reset_password(user_id, email):
         return handle_marshmallow_error(err)
 
     try:
-        if bcrypt.check_password_hash(user.password_hash, data["new_password"]):
+        if password_hasher.check_password_hash(
+            user.password_hash, data["new_password"]
+        ):
             if password_reset:
                 password_reset.attempts += 1
                 db.session.commit()
@@ -304,16 +348,21 @@ def reset_password(user_id, email):
                 error_type="PasswordReuseNotAllowed",
                 msg="New password must be different from the old one",
             )
-        new_password = bcrypt.generate_password_hash(
-            data["new_password"]).decode()
+        new_password = password_hasher.generate_password_hash(data["new_password"])
 
         user.password_hash = new_password
         if password_reset:
             password_reset.used = True
         db.session.commit()
+        # the lookup cache holds the old hash
+        invalidate_user(user.email, user.username)
         logger.info(f"Password reset Sucessfull for user_id = {user_id}")
         return jsonify({"message": "Password created Sucessfully"}), 200
 
+    except HasherBusy as e:
+        logger.warning(f"Password reset refused for user_id={user_id}: {e}")
+        return service_unavailable(msg="Too many password operations, retry later")
+
     except sqlalchemy.exc.SQLAlchemyError as e:
         logger.error(f"Error ocurred in updating password: {e}")
         return internal_server_error(msg="ORM Error")
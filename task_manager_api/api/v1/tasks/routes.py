@@ -1,16 +1,32 @@
-from flask import Blueprint, jsonify, request, abort
+from flask import (
+    Blueprint,
+    jsonify,
+    request,
+    abort,
+    current_app,
+    url_for,
+    stream_with_context,
+)
+import time
+from werkzeug.exceptions import HTTPException
 from task_manager_api import db
-from task_manager_api.models import Task
+from task_manager_api.models import Task, Priority
+from sqlalchemy import update, delete as sql_delete
+from sqlalchemy.exc import SQLAlchemyError
 from task_manager_api.utils import (
     token_required,
     cursor_encoder,
     cursor_decoder,
+    generate_request_id,
+    request_id_timestamp,
 )
 from task_manager_api.error_handler import (
     handle_marshmallow_error,
     not_found,
     internal_server_error,
     forbidden_access,
+    service_unavailable,
+    bad_request,
 )
 from task_manager_api.schemas import (
     AddTask,
@@ -18,13 +34,56 @@ from task_manager_api.schemas import (
     ValidationError,
 )
 from datetime import timezone
-from .tasks_utils import filter_manager
+from .tasks_utils import (
+    filter_manager,
+    list_query,
+    rows_to_dicts,
+    LIST_FIELDS,
+    RANKED_FIELDS,
+    keyset_page,
+    sort_value,
+    SORT_COLUMNS,
+    DIRECTIONS,
+    bulk_scope,
+    search,
+    export_partitions,
+    csv_lines,
+)
+from task_manager_api.json_provider import dumps_lines
+from .tasks_import import (
+    TaskImport,
+    ndjson_records,
+    csv_records,
+    load_rows,
+)
 import logging
 from middleware.rate_limiter import rate_limit
-from batch_process.bucket import bucket_insertion
+from batch_process.bucket import bucket_insertion, bucket_insertion_many
+from batch_process import TASK_REQUESTS_KEY
 from task_manager_api.extensions import redis_client
+from task_manager_api.extensions.redis_client import get_redis
+from task_manager_api.extensions.task_counter import (
+    reserve_task_slots,
+    release_task_slots,
+)
+from task_manager_api.extensions.task_cache import (
+    get_cached_page,
+    cache_page,
+    invalidate_user,
+    get_cached_task,
+    cache_task,
+    invalidate_tasks,
+)
+from redis.exceptions import RedisError
+from task_manager_api.extensions.idempotency import (
+    MAX_KEY_LENGTH,
+    claim_idempotency_key,
+    release_idempotency_key,
+)
 DEFAULT_LIMIT = 10
 MAX_LIMIT = 100
+# clock skew allowed between the worker that made a request id and the one asked
+REQUEST_ID_MAX_SKEW = 60
 
 tasks = Blueprint("tasks", __name__, url_prefix="/api/v1")
 
@@ -39,9 +98,15 @@ TASK_REQUEST = []
 @rate_limit("/tasks", limit = 100, window_size=60)
 def get_tasks_all(user_id: int):
     try:
-        query = Task.query.filter_by(user_id=user_id).order_by(Task.id.asc())
         logger.info("GET /api/v1/tasks requested for get_tasks_all ...")
 
+        # page cache (per user + filter combination), bumped by every write path
+        cache_version, cached = get_cached_page(user_id, request.args)
+        if cached is not None:
+            return current_app.response_class(cached, mimetype="application/json")
+
+        query = list_query(user_id)
+
         ###################################
         # Custom arguments for 'filter-ing'
         # #################################
@@ -58,20 +123,55 @@ def get_tasks_all(user_id: int):
             logger.error(f"No query is returned from  the filter_manager function {e}")
             return internal_server_error(msg=f"{e}")
 
+        ###################################
+        # ?q= search (ranked, best match first by default)
+        ###################################
+        q = request.args.get("q", "").strip()
+        rank = None
+        if q:
+            query, rank = search(query, q)
+            query = query.add_columns(rank.label("rank"))
+
         #####################################
-        # Cursor Pagination control area ....
+        # Sort (keyset) arguments ....
+        #####################################
+        sort = request.args.get("sort", "rank" if q else "id")
+        direction = request.args.get("direction", "desc" if sort == "rank" else "asc")
+        sorts = [*SORT_COLUMNS, "rank"] if q else list(SORT_COLUMNS)
+        if sort not in sorts or direction not in DIRECTIONS:
+            return bad_request(
+                error_type="InvalidSort",
+                msg=f"sort must be one of {', '.join(sorts)}, direction asc or desc",
+            )
+
+        after = None
+        cursor = request.args.get("cursor")
+        if cursor:
+            try:
+                cursor_sort, cursor_direction, value, after_id = cursor_decoder(cursor)
+                if (cursor_sort, cursor_direction) != (sort, direction):
+                    raise ValueError("cursor belongs to a different sort")
+                after = (sort_value(sort, value), after_id)
+            except (ValueError, TypeError) as e:
+                logger.warning(f"Rejected cursor user_id={user_id}: {e}")
+                return bad_request(error_type="InvalidCursor", msg="Invalid cursor")
+
+        #####################################
+        # Cursor (keyset) Pagination control area ....
         #####################################
         try:
-            cursor = request.args.get("cursor")
             limit = int(request.args.get("limit", DEFAULT_LIMIT))
             page_size = min(limit, MAX_LIMIT)
 
-            if cursor:
-                cursor_decoded_id = cursor_decoder(cursor)
-                query = query.filter(Task.id > cursor_decoded_id)
-
             # +1 for has_more  check
-            results = query.limit(page_size + 1).all()
+            results = keyset_page(
+                query,
+                sort,
+                direction == "desc",
+                after,
+                page_size,
+                column=rank if sort == "rank" else None,
+            )
 
             # debugging logger
             # logger.info(f"results  of he tasks : {results}")
@@ -87,26 +187,17 @@ def get_tasks_all(user_id: int):
             # bit more  clearity i would sayy
             next_cursor = None
             if has_more and len(tasks) > 0:
-                next_id = tasks[-1].id
-                next_cursor = cursor_encoder(next_id)
+                last = tasks[-1]
+                next_cursor = cursor_encoder(
+                    sort, direction, getattr(last, sort), last.id
+                )
 
 
-            return jsonify(
+            response = jsonify(
                 {
-                    "data": [
-                        {
-                            "id": t.id,
-                            "title": t.title,
-                            "description": t.description,
-                            "completion": t.completion,
-                            "created_at": t.created_at.astimezone(
-                                timezone.utc
-                            ).strftime("%Y-%m-%dT%H:%M:%SZ"),
-                            "priority": str(t.priority.value),
-                            "due_date": t.due_date,
-                        }
-                        for t in tasks
-                    ],
+                    "data": rows_to_dicts(
+                        tasks, RANKED_FIELDS if q else LIST_FIELDS
+                    ),
                     "pagination": {
                         "next_cursor": next_cursor,
                         "has_more": has_more,
@@ -116,6 +207,8 @@ def get_tasks_all(user_id: int):
                     "meta": {"version": "1.0"},
                 }
             )
+            cache_page(user_id, request.args, cache_version, response.get_data())
+            return response
 
         except Exception as e:
             logger.error(f"No cursor : {e}")
@@ -126,17 +219,73 @@ def get_tasks_all(user_id: int):
         return internal_server_error()
 
 
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "tasks.ndjson"),
+    "csv": ("text/csv", "tasks.csv"),
+}
+
+
+@tasks.route("/tasks/export", methods=["GET"])
+@token_required
+@rate_limit("tasks", limit=5, window_size=60)
+def export_tasks(user_id: int):
+    # every matching task in one streamed response instead of paging through
+    # GET /tasks, rows are read EXPORT_CHUNK at a time from a server side cursor
+    logger.info("GET /api/v1/tasks/export requested for export_tasks ...")
+    export_format = request.args.get("format", "ndjson")
+    if export_format not in EXPORT_FORMATS:
+        return bad_request(
+            error_type="InvalidFormat", msg="format must be ndjson or csv"
+        )
+
+    try:
+        query = filter_manager(
+            request.args.get("completion"),
+            request.args.get("title"),
+            request.args.get("after"),
+            request.args.get("before"),
+            list_query(user_id),
+        )
+    except Exception as e:
+        logger.error(f"No query is returned from  the filter_manager function {e}")
+        return internal_server_error(msg=f"{e}")
+
+    def generate():
+        exported = 0
+        for i, partition in enumerate(export_partitions(query)):
+            exported += len(partition)
+            if export_format == "csv":
+                yield csv_lines(partition, header=i == 0)
+            else:
+                yield dumps_lines(rows_to_dicts(partition))
+        logger.info(
+            f"Exported {exported} tasks of user_id={user_id} as {export_format}"
+        )
+
+    mimetype, filename = EXPORT_FORMATS[export_format]
+    return current_app.response_class(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
 @tasks.route("/tasks/<int:task_id>", methods=["GET"])
 @token_required
 @rate_limit("tasks", limit=100, window_size=60)
 def get_task(user_id: int, task_id: int):
-    task = Task.query.filter_by(id=task_id, user_id=user_id).first()
     logger.info("GET /api/v1/tasks requested for get_task...")
 
+    # hot tasks (dashboards polling) come straight from the worker LRU / redis
+    generation, cached = get_cached_task(user_id, task_id)
+    if cached is not None:
+        return current_app.response_class(cached, mimetype="application/json")
+
+    task = Task.query.filter_by(id=task_id, user_id=user_id).first()
     if not task:
         logger.error(f"No Task found with task_id = {task_id}, user_id={user_id}")
         return not_found("No Task found")
-    return jsonify(
+    response = jsonify(
         {
             "id": task.id,
             "title": task.title,
@@ -145,10 +294,12 @@ def get_task(user_id: int, task_id: int):
             "created_at": task.created_at.astimezone(timezone.utc).strftime(
                 "%Y-%m-%dT%H:%M:%SZ"
             ),
-            "priority": task.priority,
+            "priority": str(task.priority.value),
             "due_date": task.due_date,
         }
     )
+    cache_task(user_id, task_id, generation, response.get_data())
+    return response
 
 
 @tasks.route("/tasks/<int:task_id>", methods=["PUT"])
@@ -185,8 +336,10 @@ def update_task(user_id: int, task_id: int):
         if "priority" in data:
             task.priority = data["priority"]
         if "due_date" in data:
-            task.completion = data["due_date"]
+            task.due_date = data["due_date"]
         db.session.commit()
+        invalidate_tasks(user_id, [task_id])
+        invalidate_user(user_id)
         return jsonify({"message": "Task Updated Sucessfully"}), 200
 
     except Exception as e:
@@ -197,6 +350,57 @@ def update_task(user_id: int, task_id: int):
         internal_server_error()
 
 
+def task_accepted(request_id):
+    status_url = url_for("tasks.get_task_request", request_id=request_id)
+    return (
+        jsonify(
+            {
+                "message": "Task request Accepted , Processing is not completed",
+                "request_id": request_id,
+                "status_url": status_url,
+            }
+        ),
+        202,
+        {"Location": status_url},
+    )
+
+
+@tasks.route("/tasks/requests/<string:request_id>", methods=["GET"])
+@token_required
+@rate_limit("tasks", limit=100, window_size=60)
+def get_task_request(user_id: int, request_id: str):
+    logger.info("GET /api/v1/tasks/requests requested for get_task_request...")
+    accepted_at = request_id_timestamp(request_id)
+    if accepted_at is None:
+        return bad_request(error_type="InvalidRequestId", msg="Malformed request id")
+    # not one we handed out (a made-up id would otherwise stay "pending" until
+    # its timestamp plus TASK_REQUEST_TTL, however far in the future that is)
+    if accepted_at > time.time() + REQUEST_ID_MAX_SKEW:
+        return not_found("No Task request found", reason="request id from the future")
+
+    try:
+        task_id = get_redis().hget(
+            TASK_REQUESTS_KEY.format(user_id=user_id), request_id
+        )
+    except RedisError as e:
+        logger.error(f"Task request lookup failed: {e}")
+        return internal_server_error()
+
+    if task_id is not None:
+        return jsonify(
+            {"request_id": request_id, "status": "completed", "task_id": int(task_id)}
+        )
+
+    # not committed yet, as long as the id is younger than the status TTL it can
+    # still land
+    if time.time() - accepted_at < current_app.config["TASK_REQUEST_TTL"]:
+        return jsonify(
+            {"request_id": request_id, "status": "pending", "task_id": None}
+        )
+
+    return not_found("No Task request found", reason="unknown or expired request id")
+
+
 @tasks.route("/tasks", methods=["POST"])
 @token_required
 @rate_limit("tasks", limit=100, window_size=60)
@@ -211,13 +415,6 @@ def add_task(user_id):
 
         return handle_marshmallow_error(err)
     #
-    # ################
-    # TASK-QUOTA Check
-    # ################
-    tasks_count = Task.query.filter_by(user_id=user_id).count()
-    if tasks_count >= 1000:
-        return forbidden_access(msg="Task limit reached (1000), Contact Support :)")
-
     if data.get("user_id"):
         # no user_id is required  while adding task , mostly JWT token will get that
         logger.warning(
@@ -225,19 +422,205 @@ def add_task(user_id):
         )
         return forbidden_access("Forbidden")
 
+    # ################
+    # Idempotency-Key (client retries must not create the task twice)
+    # ################
+    # handle for GET /tasks/requests/<request_id>, travels with the task to the consumer
+    request_id = generate_request_id()
+
+    idempotency_key = request.headers.get("Idempotency-Key")
+    if idempotency_key:
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            return bad_request(
+                error_type="InvalidIdempotencyKey",
+                msg=f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters",
+            )
+        original_request_id = claim_idempotency_key(
+            user_id, idempotency_key, request_id
+        )
+        if original_request_id:
+            logger.info(
+                f"Duplicate Idempotency-Key={idempotency_key} user_id={user_id}"
+            )
+            return task_accepted(original_request_id)
+        data["idempotency_key"] = idempotency_key
+    data["request_id"] = request_id
+
+    #
+    # ################
+    # TASK-QUOTA Check (redis counter, tasks still in the bucket are already counted)
+    # ################
+    if not reserve_task_slots(user_id, queued=True):
+        if idempotency_key:
+            release_idempotency_key(user_id, idempotency_key)
+        quota = current_app.config["TASK_QUOTA"]
+        return forbidden_access(msg=f"Task limit reached ({quota}), Contact Support :)")
+
     try:
 
-        bucket_insertion(data,user_id)
-   
+        if not bucket_insertion(data,user_id):
+            release_task_slots(user_id, queued=True)
+            if idempotency_key:
+                release_idempotency_key(user_id, idempotency_key)
+            # bucket is full, tell the client to retry instead of silently
+            # dropping the task
+            return service_unavailable(
+                msg="Too many pending tasks, retry shortly", reason="bucket full"
+            )
 
         logger.info(f"Task added: title = {data['title']}, user_id = {user_id}")
-        return jsonify({"message": "Task request Accepted , Processing is not completed"}),202
+        return task_accepted(request_id)
 
     except Exception as e:
         logger.error(f"Task creation failed error={e}")
         return internal_server_error()
 
 
+def read_task_batch():
+    # JSON array, or NDJSON (one task per line), a line that is not JSON becomes
+    # None so marshmallow reports it for that index only
+    if request.mimetype == "application/x-ndjson":
+        items = []
+        for line in request.get_data().splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(current_app.json.loads(line))
+            except ValueError:
+                items.append(None)
+        return items
+    return request.get_json(silent=True)
+
+
+@tasks.route("/tasks:batch", methods=["POST"])
+@token_required
+@rate_limit("tasks", limit=20, window_size=60)
+def add_tasks_batch(user_id):
+    logger.info("POST /api/v1/tasks:batch requested for add_tasks_batch...")
+    items = read_task_batch()
+    max_items = current_app.config["TASK_BATCH_MAX_ITEMS"]
+    if not isinstance(items, list) or not items:
+        return bad_request(
+            error_type="InvalidBatch",
+            msg="Body must be a non-empty JSON array or NDJSON",
+        )
+    if len(items) > max_items:
+        return bad_request(
+            error_type="BatchTooLarge", msg=f"At most {max_items} tasks per batch"
+        )
+
+    # one validation pass for the whole array, bad items are reported by index
+    # and do not stop the good ones
+    errors = {}
+    try:
+        loaded = AddTask(many=True).load(items)
+    except ValidationError as err:
+        errors = err.messages
+        loaded = err.valid_data
+    valid = [(i, data) for i, data in enumerate(loaded) if i not in errors]
+    if not valid:
+        logger.error(f"Batch input error {errors}")
+        return bad_request(msg="No valid task in batch", details=errors)
+
+    # one quota check and one bucket operation for the whole batch
+    if not reserve_task_slots(user_id, len(valid), queued=True):
+        quota = current_app.config["TASK_QUOTA"]
+        return forbidden_access(msg=f"Task limit reached ({quota}), Contact Support :)")
+
+    results = [None] * len(items)
+    for i, data in valid:
+        data["request_id"] = generate_request_id()
+        results[i] = {
+            "index": i,
+            "status": "accepted",
+            "request_id": data["request_id"],
+            "status_url": url_for(
+                "tasks.get_task_request", request_id=data["request_id"]
+            ),
+        }
+    for i, messages in errors.items():
+        results[i] = {"index": i, "status": "rejected", "errors": messages}
+
+    try:
+        if not bucket_insertion_many([data for _, data in valid], user_id):
+            release_task_slots(user_id, len(valid), queued=True)
+            return service_unavailable(
+                msg="Too many pending tasks, retry shortly", reason="bucket full"
+            )
+    except Exception as e:
+        logger.error(f"Batch task creation failed error={e}")
+        return internal_server_error()
+
+    logger.info(
+        f"Batch added: {len(valid)} accepted, {len(errors)} rejected, "
+        f"user_id = {user_id}"
+    )
+    return (
+        jsonify(
+            {
+                "message": "Tasks accepted , Processing is not completed",
+                "accepted": len(valid),
+                "rejected": len(errors),
+                "results": results,
+            }
+        ),
+        202,
+    )
+
+
+@tasks.route("/tasks/import", methods=["POST"])
+@token_required
+@rate_limit("tasks", limit=2, window_size=60)
+def import_tasks(user_id):
+    # large NDJSON / CSV upload straight into postgres (COPY), stored before we answer
+    logger.info("POST /api/v1/tasks/import requested for import_tasks...")
+    request.max_content_length = current_app.config["TASK_IMPORT_MAX_BYTES"]
+    if request.mimetype == "text/csv":
+        records = csv_records(request.stream)
+    else:
+        records = ndjson_records(request.stream)
+
+    importer = TaskImport(user_id)
+    try:
+        load_rows(importer.chunks(records))
+        db.session.commit()
+    except Exception as e:
+        # one transaction: nothing of this upload is kept
+        db.session.rollback()
+        release_task_slots(user_id, importer.reserved)
+        if isinstance(e, HTTPException):
+            # 413 from a chunked upload going over TASK_IMPORT_MAX_BYTES midway
+            raise
+        if importer.quota_exceeded:
+            quota = current_app.config["TASK_QUOTA"]
+            return forbidden_access(
+                msg=(
+                    f"Task limit reached ({quota}), nothing imported, "
+                    "Contact Support :)"
+                )
+            )
+        logger.error(f"Task import failed user_id={user_id} error={e}")
+        return internal_server_error()
+
+    if importer.imported:
+        invalidate_user(user_id)
+    logger.info(
+        f"Imported {importer.imported} tasks ({importer.rejected} rejected) "
+        f"user_id={user_id}"
+    )
+    return (
+        jsonify(
+            {
+                "message": f"{importer.imported} tasks imported",
+                "imported": importer.imported,
+                "rejected": importer.rejected,
+                "errors": importer.errors,
+            }
+        ),
+        201 if importer.imported else 400,
+    )
+
+
 @tasks.route("/tasks/<int:task_id>", methods=["DELETE"])
 @token_required
 @rate_limit("tasks", limit=60, window_size=60)
@@ -252,26 +635,110 @@ def delete(user_id: int, task_id: int):
         return forbidden_access("Forbidden,Not authorized to access other Data")
     db.session.delete(task)
     db.session.commit()
+    release_task_slots(user_id)
+    invalidate_tasks(user_id, [task_id])
+    invalidate_user(user_id)
     logger.info(f"Deleted Task: task with task_id={task_id}and user_id={user_id}")
 
     return jsonify({"message": f"Task with id {task_id} deleted"}), 200
 
 
+@tasks.route("/tasks", methods=["PATCH"])
+@token_required
+@rate_limit("tasks", limit=20, window_size=60)
+def update_tasks_bulk(user_id: int):
+    # one UPDATE ... WHERE user_id=... RETURNING id for every matching task
+    schema = UpdateTask()
+    try:
+        data = schema.load(request.get_json())
+        logger.info("PATCH /api/v1/tasks requested for update_tasks_bulk")
+
+    except ValidationError as err:
+        logger.error(f"Input error {err.messages}")
+        return handle_marshmallow_error(err)
+
+    if not data:
+        return bad_request(msg="Nothing to update")
+    if "priority" in data:
+        data["priority"] = Priority(data["priority"])
+
+    try:
+        # a PATCH without ids / filters must say all=true, an empty query
+        # string is too easy to send by mistake
+        stmt = bulk_scope(update(Task), user_id, request.args, require_scope=True)
+    except ValueError as e:
+        return bad_request(error_type="InvalidScope", msg=f"{e}")
+
+    try:
+        updated = (
+            db.session.execute(
+                stmt.values(**data)
+                .returning(Task.id)
+                .execution_options(synchronize_session=False)
+            )
+            .scalars()
+            .all()
+        )
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Bulk update failed user_id={user_id} error={e}")
+        return internal_server_error()
+
+    if not updated:
+        logger.error(f"No Task matched the bulk update, user_id = {user_id}")
+        return not_found("No Task Found")
+
+    invalidate_tasks(user_id, updated)
+    invalidate_user(user_id)
+    logger.info(f"Bulk updated {len(updated)} tasks of user_id={user_id}")
+    return jsonify(
+        {
+            "message": f"{len(updated)} tasks updated",
+            "updated": len(updated),
+            "ids": updated,
+        }
+    ), 200
+
+
 @tasks.route("/tasks", methods=["DELETE"])
 @token_required
 @rate_limit("tasks", limit=20, window_size=60)
 def delete_all(user_id: int):
-    tasks = Task.query.filter_by(user_id=user_id).all()
+    # one DELETE ... WHERE user_id=... RETURNING id, optionally narrowed with
+    # ?ids= and the GET /tasks filters (no ORM instances loaded)
     logger.info("DELETE /task requested...")
+    try:
+        stmt = bulk_scope(sql_delete(Task), user_id, request.args)
+    except ValueError as e:
+        return bad_request(error_type="InvalidScope", msg=f"{e}")
 
-    if not tasks:
+    try:
+        deleted = (
+            db.session.execute(
+                stmt.returning(Task.id).execution_options(synchronize_session=False)
+            )
+            .scalars()
+            .all()
+        )
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Bulk delete failed user_id={user_id} error={e}")
+        return internal_server_error()
+
+    if not deleted:
         logger.error(f"No Task found out with user_id = {user_id}")
         return not_found("No Task Found")
 
-    for t in tasks:
-        db.session.delete(t)
-
-    db.session.commit()
-
-    return jsonify({"message": f"All task of user_id {user_id} deleted "}), 200
+    release_task_slots(user_id, len(deleted))
+    invalidate_tasks(user_id, deleted)
+    invalidate_user(user_id)
 
+    return jsonify(
+        {
+            "message": f"{len(deleted)} task of user_id {user_id} deleted ",
+            "deleted": len(deleted),
+            "ids": deleted,
+        }
+    ), 200
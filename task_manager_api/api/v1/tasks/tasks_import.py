@@ -0,0 +1,196 @@
+import io
+import csv
+import logging
+from datetime import datetime, timezone
+from flask import current_app
+from sqlalchemy import insert
+from task_manager_api import db
+from task_manager_api.models import Task, Priority
+from task_manager_api.schemas import AddTask, ValidationError
+from task_manager_api.extensions.task_counter import reserve_task_slots
+
+logger = logging.getLogger(__name__)
+
+# POST /tasks/import: the upload is parsed as a stream, validated IMPORT_CHUNK
+# records at a time and fed into one COPY FROM STDIN (one transaction), so
+# nothing bigger than a chunk is ever held in memory
+
+IMPORT_CHUNK = 1000
+MAX_REPORTED_ERRORS = 100
+
+# COPY does not run the model's python side defaults, every column is sent
+COPY_COLUMNS = (
+    "title",
+    "description",
+    "completion",
+    "priority",
+    "due_date",
+    "created_at",
+    "updated_at",
+    "user_id",
+)
+REQUIRED_FIELDS = ("title", "description")
+# AddTask has no length limit, the column does (COPY would fail the whole upload)
+TITLE_MAX_LENGTH = Task.title.type.length
+
+
+class ImportQuotaExceeded(Exception):
+    pass
+
+
+def ndjson_records(stream):
+    # (line number, task), a line that is not JSON becomes None so marshmallow
+    # reports it as an invalid row
+    for line_no, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, current_app.json.loads(line)
+        except ValueError:
+            yield line_no, None
+
+
+def csv_records(stream):
+    # header row with the AddTask field names, empty optional cells = not given
+    reader = csv.DictReader(
+        io.TextIOWrapper(io.BufferedReader(stream), encoding="utf-8", newline="")
+    )
+    for record in reader:
+        yield reader.line_num, {
+            key: value
+            for key, value in record.items()
+            if value != "" or key in REQUIRED_FIELDS
+        }
+
+
+class TaskImport:
+    # validation + quota per chunk, keeps the counters for the response
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.schema = AddTask(many=True)
+        self.now = datetime.now(timezone.utc)
+        self.imported = 0
+        self.rejected = 0
+        self.reserved = 0
+        self.quota_exceeded = False
+        self.errors = []
+
+    def chunks(self, records):
+        chunk = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= IMPORT_CHUNK:
+                yield self._rows(chunk)
+                chunk = []
+        if chunk:
+            yield self._rows(chunk)
+
+    def _rows(self, chunk):
+        errors = {}
+        try:
+            loaded = self.schema.load([record for _, record in chunk])
+        except ValidationError as err:
+            errors, loaded = err.messages, err.valid_data
+
+        for i, data in enumerate(loaded):
+            title = data.get("title")
+            if i not in errors and title and len(title) > TITLE_MAX_LENGTH:
+                errors[i] = {
+                    "title": [f"Longer than maximum length {TITLE_MAX_LENGTH}."]
+                }
+
+        rows = []
+        for i, data in enumerate(loaded):
+            if i in errors:
+                self.rejected += 1
+                if len(self.errors) < MAX_REPORTED_ERRORS:
+                    self.errors.append({"line": chunk[i][0], "errors": errors[i]})
+                continue
+            rows.append(
+                {
+                    "title": data["title"],
+                    "description": data["description"],
+                    "completion": data.get("completion", False),
+                    "priority": Priority(data.get("priority", Priority.MEDIUM.value)),
+                    "due_date": data.get("due_date"),
+                    "created_at": self.now,
+                    "updated_at": self.now,
+                    "user_id": self.user_id,
+                }
+            )
+
+        # the quota is reserved as we go, the caller releases it on rollback
+        if rows and not reserve_task_slots(self.user_id, len(rows)):
+            self.quota_exceeded = True
+            raise ImportQuotaExceeded(f"task quota exceeded for user_id={self.user_id}")
+        self.reserved += len(rows)
+        self.imported += len(rows)
+        return rows
+
+
+def _copy_value(value):
+    # COPY text format: \N is NULL, backslash / tab / newlines escaped
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, Priority):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str):
+        return (
+            value.replace("\\", "\\\\")
+            .replace("\t", "\\t")
+            .replace("\n", "\\n")
+            .replace("\r", "\\r")
+        )
+    return str(value)
+
+
+def copy_lines(rows):
+    return "".join(
+        "\t".join(_copy_value(row[column]) for column in COPY_COLUMNS) + "\n"
+        for row in rows
+    ).encode()
+
+
+class ChunkReader(io.RawIOBase):
+    # file object over a generator of bytes, what copy_expert() reads from
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buffer:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+def load_rows(chunks):
+    # inside the session's transaction, the caller commits or rolls back
+    connection = db.session.connection()
+    if connection.dialect.name != "postgresql":
+        # sqlite (dev), plain executemany per chunk
+        for rows in chunks:
+            if rows:
+                connection.execute(insert(Task.__table__), rows)
+        return
+
+    cursor = connection.connection.cursor()
+    cursor.copy_expert(
+        f"COPY {Task.__tablename__} ({', '.join(COPY_COLUMNS)}) FROM STDIN",
+        ChunkReader(copy_lines(rows) for rows in chunks),
+        size=64 * 1024,
+    )
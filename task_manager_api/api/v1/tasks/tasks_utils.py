@@ -1,13 +1,178 @@
-from task_manager_api.models import Task
+import io
+import csv
+from task_manager_api.models import Task, Priority
 from datetime import timezone, datetime
 from dateutil import parser
 import logging
-from sqlalchemy import and_
+import re
+from sqlalchemy import (
+    and_,
+    or_,
+    select,
+    tuple_,
+    literal,
+    literal_column,
+    func,
+    table,
+    column as sql_column,
+    cast,
+    Double,
+)
+from task_manager_api import db
 from task_manager_api.error_handler import internal_server_error, bad_request
 
 
 logger = logging.getLogger(__name__)
 
+# GET /tasks only needs these, selected as plain rows (no ORM instances, no
+# identity map), datetimes and the priority enum are left to the orjson provider
+LIST_COLUMNS = (
+    Task.id,
+    Task.title,
+    Task.description,
+    Task.completion,
+    Task.created_at,
+    Task.priority,
+    Task.due_date,
+)
+LIST_FIELDS = tuple(column.key for column in LIST_COLUMNS)
+# ?q= adds the rank as the last column
+RANKED_FIELDS = (*LIST_FIELDS, "rank")
+
+
+def list_query(user_id):
+    # ordering is added by keyset_page
+    return select(*LIST_COLUMNS).where(Task.user_id == user_id)
+
+
+def rows_to_dicts(rows, fields=LIST_FIELDS):
+    # one pass, nothing formatted per row
+    return [dict(zip(fields, row, strict=True)) for row in rows]
+
+
+#################################
+# GET /tasks/export (streamed, flat memory)
+#################################
+EXPORT_CHUNK = 1000
+
+
+def export_partitions(query):
+    # server side cursor (stream_results on postgres), EXPORT_CHUNK rows at a time
+    result = db.session.execute(
+        query.order_by(Task.id.asc()).execution_options(yield_per=EXPORT_CHUNK)
+    )
+    yield from result.partitions()
+
+
+def _csv_value(value):
+    # same shapes as the JSON responses (naive datetimes are UTC, like OPT_NAIVE_UTC)
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+    if isinstance(value, Priority):
+        return value.value
+    return value
+
+
+def csv_lines(partition, header=False):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    if header:
+        writer.writerow(LIST_FIELDS)
+    writer.writerows([_csv_value(value) for value in row] for row in partition)
+    return out.getvalue()
+
+
+#################################
+# Keyset pagination (?sort=&direction=)
+#################################
+# every sort is (key, id) so the order is total, each one has a
+# (user_id, key, id) index. priority follows the enum order in postgres
+# (low < medium < high), sqlite stores it as text and sorts alphabetically
+SORT_COLUMNS = {
+    "id": Task.id,
+    "created_at": Task.created_at,
+    "due_date": Task.due_date,
+    "priority": Task.priority,
+}
+DIRECTIONS = ("asc", "desc")
+
+
+def sort_value(sort, value):
+    # cursor json -> python value for the WHERE clause
+    if value is None or sort in ("id", "rank"):
+        return value
+    if sort == "priority":
+        return Priority(value)
+    return parser.isoparse(value)
+
+
+def _seek(query, column, descending, after):
+    # after = (value, id) of the last row already sent, None on the first page
+    if after is not None:
+        # typed binds, so the enum / datetime go through the column's type
+        after = (literal(after[0], column.type), literal(after[1], Task.id.type))
+    if descending:
+        query = query.order_by(column.desc(), Task.id.desc())
+        if after is not None:
+            query = query.filter(tuple_(column, Task.id) < tuple_(*after))
+    else:
+        query = query.order_by(column.asc(), Task.id.asc())
+        if after is not None:
+            query = query.filter(tuple_(column, Task.id) > tuple_(*after))
+    return query
+
+
+def _by_id(query, descending, after_id):
+    if descending:
+        query = query.order_by(Task.id.desc())
+        if after_id is not None:
+            query = query.filter(Task.id < after_id)
+    else:
+        query = query.order_by(Task.id.asc())
+        if after_id is not None:
+            query = query.filter(Task.id > after_id)
+    return query
+
+
+def keyset_page(query, sort, descending, after, size, column=None):
+    # up to size + 1 rows (the extra one only answers has_more), never OFFSET.
+    # `column` overrides SORT_COLUMNS (the ?q= rank expression)
+    limit = size + 1
+    if sort == "id":
+        after_id = after[1] if after is not None else None
+        query = _by_id(query, descending, after_id)
+        return db.session.execute(query.limit(limit)).all()
+
+    column = column if column is not None else SORT_COLUMNS[sort]
+    if not getattr(column, "nullable", False):
+        query = _seek(query, column, descending, after)
+        return db.session.execute(query.limit(limit)).all()
+
+    # due_date can be NULL: NULLs come last ascending and first descending (the
+    # postgres default, so the index is usable both ways). a row value compare
+    # never matches NULL, so the NULL rows are their own segment ordered by id
+    in_nulls = after is not None and after[0] is None
+    values = query.filter(column.isnot(None))
+    nulls = query.filter(column.is_(None))
+    after_id = after[1] if in_nulls else None
+    segments = []
+    if descending:
+        if after is None or in_nulls:
+            segments.append(_by_id(nulls, True, after_id))
+        segments.append(_seek(values, column, True, None if in_nulls else after))
+    else:
+        if not in_nulls:
+            segments.append(_seek(values, column, False, after))
+        segments.append(_by_id(nulls, False, after_id))
+
+    rows = []
+    for segment in segments:
+        rows += db.session.execute(segment.limit(limit - len(rows))).all()
+        if len(rows) >= limit:
+            break
+    return rows
 
 
 def parse_query_date(value: str, end_of_day: bool = False):
@@ -87,3 +252,113 @@ def filter_manager(completion, title: str, after_str: str, before_str: str, quer
         query = query.filter(Task.created_at <= before)
 
     return query
+
+
+#################################
+# ?q= search (title + description)
+#################################
+# every word is a prefix match (plan -> planning), the whole string is also a
+# substring match on the title, results come ranked (sort=rank, best first)
+MAX_SEARCH_WORDS = 8
+
+# not mapped on Task, see models.SEARCH_DB_ONLY
+search_vector = literal_column("tasks.search_vector")
+tasks_fts = table("tasks_fts", sql_column("rowid"))
+
+
+def _like_pattern(q):
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def search(query, q):
+    # -> (query narrowed to the matches, rank expression, higher is better).
+    # the rank is CAST to double precision in SQL: ts_rank / similarity are
+    # float4, a float4 sent in the cursor comes back as a float8 bind that no
+    # longer equals the row's rank, the seek would repeat or skip rows
+    words = re.findall(r"\w+", q.lower())[:MAX_SEARCH_WORDS]
+    substring = Task.title.ilike(_like_pattern(q), escape="\\")
+
+    if db.session.get_bind().dialect.name == "postgresql":
+        # GIN on search_vector for the words, pg_trgm GIN on title for the substring
+        similarity = func.similarity(Task.title, q)
+        if not words:
+            return query.filter(substring), cast(similarity, Double)
+        tsquery = func.to_tsquery("simple", " & ".join(f"{w}:*" for w in words))
+        rank = func.ts_rank(search_vector, tsquery) + similarity
+        return (
+            query.filter(or_(search_vector.op("@@")(tsquery), substring)),
+            cast(rank, Double),
+        )
+
+    # sqlite FTS5 fallback, bm25() is "lower is better"
+    if not words:
+        return query.filter(substring), cast(literal(0.0), Double)
+    hits = (
+        select(
+            tasks_fts.c.rowid.label("task_id"),
+            (-func.bm25(literal_column("tasks_fts"))).label("score"),
+        )
+        .where(
+            literal_column("tasks_fts").op("MATCH")(
+                " ".join(f'"{w}"*' for w in words)
+            )
+        )
+        .subquery()
+    )
+    query = query.outerjoin(hits, hits.c.task_id == Task.id).filter(
+        or_(hits.c.task_id.isnot(None), substring)
+    )
+    return query, cast(func.coalesce(hits.c.score, 0.0), Double)
+
+
+#################################
+# Bulk PATCH / DELETE /tasks scope
+#################################
+MAX_BULK_IDS = 1000
+
+
+def parse_ids(value):
+    # "?ids=1,2,3" -> [1, 2, 3]
+    ids = [int(part) for part in value.split(",") if part.strip()]
+    if not ids or len(ids) > MAX_BULK_IDS:
+        raise ValueError(f"ids must list 1 to {MAX_BULK_IDS} task ids")
+    return ids
+
+
+COMPLETION_VALUES = ("true", "1", "yes", "false", "0", "no")
+
+
+def _bulk_date(value, end_of_day):
+    # parse_query_date answers an error response instead of raising
+    parsed = parse_query_date(value, end_of_day=end_of_day)
+    if not isinstance(parsed, datetime):
+        raise ValueError(f"invalid date {value!r}, use YYYY-MM-DD or ISO 8601")
+    return parsed
+
+
+def bulk_scope(stmt, user_id, args, require_scope=False):
+    # WHERE of a set based UPDATE/DELETE: always the token's user, then ?ids= and
+    # the same filters GET /tasks takes (nothing else -> every task of the user).
+    # ValueError for a bad id / date, and with require_scope when nothing narrows
+    # it down and ?all=true is missing
+    for name in ("after", "before"):
+        if args.get(name):
+            _bulk_date(args[name], end_of_day=name == "before")
+
+    scoped = bool(args.get("ids") or args.get("title"))
+    scoped = scoped or bool(args.get("after") or args.get("before"))
+    scoped = scoped or (args.get("completion") or "").lower() in COMPLETION_VALUES
+    if require_scope and not scoped and args.get("all", "").lower() != "true":
+        raise ValueError("no ids or filter given, pass all=true to touch every task")
+
+    stmt = stmt.where(Task.user_id == user_id)
+    if args.get("ids"):
+        stmt = stmt.where(Task.id.in_(parse_ids(args["ids"])))
+    return filter_manager(
+        args.get("completion"),
+        args.get("title"),
+        args.get("after"),
+        args.get("before"),
+        stmt,
+    )
@@ -21,6 +21,125 @@ class Config:
     # REDIS_USER = os.environ.get("REDIS_USER")
     REDIS_PASSWORD = os.environ.get("REDIS_PASSWORD")
 
+    ##################################
+    # Task quota (per user), counted in redis and reseeded from the DB after the TTL
+    ##################################
+    TASK_QUOTA = int(os.environ.get("TASK_QUOTA", 1000))
+    TASK_COUNTER_TTL = int(os.environ.get("TASK_COUNTER_TTL", 900))
+    # tasks accepted but not stored by the consumer yet, refreshed on every POST.
+    # only the python consumer (python -m batch_process) settles them, leave it
+    # off while the go-batcher drains the queue or every reseed counts the
+    # stored tasks twice. with it off a reseed is the DB count alone
+    TASK_IN_FLIGHT_TRACKING = os.environ.get("TASK_IN_FLIGHT_TRACKING", "0") == "1"
+    # must outlast the longest consumer backlog, a drifted value heals once the
+    # user is quiet this long
+    TASK_IN_FLIGHT_TTL = int(os.environ.get("TASK_IN_FLIGHT_TTL", 3600))
+
+    # POST /tasks:batch, max tasks per request (JSON array or NDJSON lines)
+    TASK_BATCH_MAX_ITEMS = int(os.environ.get("TASK_BATCH_MAX_ITEMS", 500))
+
+    # POST /tasks/import, upload size cap (the rest of the API keeps
+    # MAX_CONTENT_LENGTH)
+    TASK_IMPORT_MAX_BYTES = int(
+        os.environ.get("TASK_IMPORT_MAX_BYTES", 64 * 1024 * 1024)
+    )
+
+    ##################################
+    # GET /tasks page cache (redis, invalidated by a per-user version bump)
+    ##################################
+    TASK_PAGE_CACHE_ENABLED = os.environ.get("TASK_PAGE_CACHE_ENABLED", "1") == "1"
+    TASK_PAGE_CACHE_TTL = int(os.environ.get("TASK_PAGE_CACHE_TTL", 60))
+    TASK_PAGE_CACHE_MAX_BYTES = int(
+        os.environ.get("TASK_PAGE_CACHE_MAX_BYTES", 256 * 1024)
+    )
+
+    ##################################
+    # GET /tasks/<id> cache, per worker LRU (seconds) in front of redis
+    ##################################
+    TASK_ITEM_CACHE_ENABLED = os.environ.get("TASK_ITEM_CACHE_ENABLED", "1") == "1"
+    TASK_ITEM_CACHE_TTL = int(os.environ.get("TASK_ITEM_CACHE_TTL", 300))
+    TASK_ITEM_LOCAL_TTL = float(os.environ.get("TASK_ITEM_LOCAL_TTL", 2))
+
+    ##################################
+    # Per user rate limit: per worker token buckets, synced with redis in the
+    # background every RATE_LIMIT_SYNC_INTERVAL seconds (0 = ask redis on every
+    # request). RATE_LIMIT_FAIL_MODE: "open" keeps deciding locally while redis
+    # is unreachable, "closed" answers 503
+    ##################################
+    RATE_LIMIT_SYNC_INTERVAL = float(os.environ.get("RATE_LIMIT_SYNC_INTERVAL", 0.25))
+    RATE_LIMIT_FAIL_MODE = os.environ.get("RATE_LIMIT_FAIL_MODE", "open")
+    # every worker starts from the whole remaining budget, a burst spread over
+    # N workers can get up to N x limit before the next sync. limits below this
+    # (import, export, ...) always ask redis, default 8 gunicorn workers x 4
+    RATE_LIMIT_LOCAL_MIN_LIMIT = int(os.environ.get("RATE_LIMIT_LOCAL_MIN_LIMIT", 32))
+
+    ##################################
+    # Password hashing (signup / login / reset-password): bcrypt cost, existing
+    # hashes are upgraded on the next successful login. runs on a per worker
+    # process pool (0 = in the request thread), more than PASSWORD_HASH_MAX_QUEUE
+    # waiting or running hashes get a 503. the queue is a few hashes deep per
+    # pool process: the last one in line waits MAX_QUEUE / WORKERS hash times
+    # (~1 s at cost 12, well under PASSWORD_HASH_TIMEOUT), so a burst that clears
+    # in a second is served instead of refused. gunicorn's --threads also caps it,
+    # raise --threads above it to keep threads free for the task endpoints
+    ##################################
+    BCRYPT_LOG_ROUNDS = int(os.environ.get("BCRYPT_LOG_ROUNDS", 12))
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_MAX_QUEUE = int(
+        os.environ.get("PASSWORD_HASH_MAX_QUEUE", max(PASSWORD_HASH_WORKERS, 1) * 4)
+    )
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get("PASSWORD_HASH_TIMEOUT", 5))
+
+    ##################################
+    # login / signup user lookups: redis cache (email / username -> id + hash,
+    # "not registered" for USER_CACHE_NEGATIVE_TTL) behind a bloom filter of every
+    # registered email and username, rebuilt at startup. USER_BLOOM_CAPACITY
+    # counts entries, two per user
+    ##################################
+    USER_CACHE_ENABLED = os.environ.get("USER_CACHE_ENABLED", "1") == "1"
+    USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL", 300))
+    USER_CACHE_NEGATIVE_TTL = int(os.environ.get("USER_CACHE_NEGATIVE_TTL", 30))
+    USER_BLOOM_CAPACITY = int(os.environ.get("USER_BLOOM_CAPACITY", 2_000_000))
+    USER_BLOOM_ERROR_RATE = float(os.environ.get("USER_BLOOM_ERROR_RATE", 0.01))
+
+    ##################################
+    # Idempotency-Key (POST /tasks): "redis" or "local" (per worker LRU)
+    ##################################
+    IDEMPOTENCY_BACKEND = os.environ.get("IDEMPOTENCY_BACKEND", "redis")
+    IDEMPOTENCY_TTL = int(os.environ.get("IDEMPOTENCY_TTL", 600))
+    # how long GET /tasks/requests/<id> can answer for an accepted task
+    TASK_REQUEST_TTL = int(os.environ.get("TASK_REQUEST_TTL", 3600))
+
+    ##################################
+    # Batch transport: "list" (task_queue, LPUSH) or "stream" (task_stream, XADD)
+    ##################################
+    BATCH_TRANSPORT = os.environ.get("BATCH_TRANSPORT", "list")
+    # XADD MAXLEN ~ trims the oldest entries, delivered or not. a consumer outage
+    # longer than MAXLEN tasks loses the oldest undelivered ones, keep it well
+    # above the backlog you expect to ride out (tasks/s x outage seconds), the
+    # spool only covers redis being down, not the stream overflowing
+    TASK_STREAM_MAXLEN = int(os.environ.get("TASK_STREAM_MAXLEN", 1_000_000))
+
+    ##################################
+    # Batch consumer (python -m batch_process)
+    ##################################
+    BATCH_CONSUMER_SIZE = int(os.environ.get("BATCH_CONSUMER_SIZE", 500))
+    BATCH_CONSUMER_LINGER = float(os.environ.get("BATCH_CONSUMER_LINGER", 0.5))
+    BATCH_CONSUMER_METRICS_PORT = int(
+        os.environ.get("BATCH_CONSUMER_METRICS_PORT", 9105)
+    )
+    # stream entries pending longer than this (ms) are reclaimed from dead consumers
+    BATCH_CONSUMER_RECLAIM_IDLE = int(
+        os.environ.get("BATCH_CONSUMER_RECLAIM_IDLE", 60_000)
+    )
+
+    ##################################
+    # Emergency spool (redis outage)
+    ##################################
+    SPOOL_DIR = os.environ.get("SPOOL_DIR", "/task_app/spool")
+    SPOOL_SEGMENT_BYTES = int(os.environ.get("SPOOL_SEGMENT_BYTES", 16 * 1024 * 1024))
+    SPOOL_REPLAY_INTERVAL = float(os.environ.get("SPOOL_REPLAY_INTERVAL", 5))
+
 
 class DevConfig(Config):
     ###################################
@@ -8,6 +8,7 @@ central_registry = {
     "INVALID_INPUT": "Invalid input data",
     "NOT_FOUND": "Resource not found",
     "INTERNAL_ERROR": "Internal server error",
+    "SERVICE_UNAVAILABLE": "Service temporarily unavailable, retry later",
 }
 
 
@@ -80,17 +81,30 @@ def internal_server_error(msg=None):
     return error_response(code="INTERNAL_ERROR", status=500, message=msg)
 
 
-def too_many_requests(msg=None, reason=None):
-    return error_response(
+def too_many_requests(msg=None, reason=None, retry_after=None):
+    response, status = error_response(
         code="TOO_MANY_REQUEST", status=429, message=msg, reason=reason
     )
+    if retry_after is None:
+        return response, status
+    return response, status, {"Retry-After": str(retry_after)}
+
+
+def service_unavailable(msg=None, reason=None, retry_after=1):
+    # backpressure response, Retry-After tells well behaved clients when to come back
+    response, status = error_response(
+        code="SERVICE_UNAVAILABLE", status=503, message=msg, reason=reason
+    )
+    return response, status, {"Retry-After": str(retry_after)}
 
 
 # Using lib error registering parameterized-decorater "errorhandler" RequestEntityTooLarge
 def register_payload_error_handler(app):
     @app.errorhandler(RequestEntityTooLarge)
-    def handle_payload_too_large():
+    def handle_payload_too_large(e):
+        # POST /tasks/import has its own, bigger limit
+        limit_mb = (request.max_content_length or 0) / (1024 * 1024)
         return bad_request(
             error_type="PayloadTooLarge",
-            msg="Request payload exceeds maximum allowed size (2 MB)",
+            msg=f"Request payload exceeds maximum allowed size ({limit_mb:g} MB)",
         )
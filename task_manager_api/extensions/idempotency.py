@@ -0,0 +1,88 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from flask import current_app
+from redis.exceptions import RedisError
+from task_manager_api.extensions.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Idempotency-Key support for POST /tasks, a retried request with the same key
+# (per user) inside IDEMPOTENCY_TTL is answered without enqueueing the task again
+
+MAX_KEY_LENGTH = 64
+
+
+class LocalKeyStore:
+    # in-process LRU with per-key expiry, used for IDEMPOTENCY_BACKEND=local and
+    # as the fallback when redis does not answer
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def claim(self, key, ttl, value):
+        # None -> claimed now, otherwise the value stored by the first request
+        now = time.monotonic()
+        with self._lock:
+            entry = self._keys.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+            self._keys[key] = (now + ttl, value)
+            self._keys.move_to_end(key)
+            while len(self._keys) > self.capacity:
+                self._keys.popitem(last=False)
+            return None
+
+    def release(self, key):
+        with self._lock:
+            self._keys.pop(key, None)
+
+
+local_store = LocalKeyStore(capacity=10_000)
+
+
+def _name(user_id, key):
+    return f"idempotency:{user_id}:{key}"
+
+
+def claim_idempotency_key(user_id, key, request_id):
+    # None -> first time we see this key, otherwise the request_id of the request
+    # that claimed it (one SET NX GET round-trip)
+    name = _name(user_id, key)
+    ttl = current_app.config["IDEMPOTENCY_TTL"]
+    if current_app.config["IDEMPOTENCY_BACKEND"] == "redis":
+        try:
+            original = get_redis().set(name, request_id, nx=True, ex=ttl, get=True)
+            return original.decode() if original is not None else None
+        except RedisError as e:
+            logger.warning(f"Idempotency check fell back to local store: {e}")
+    return local_store.claim(name, ttl, request_id)
+
+
+def release_idempotency_key(user_id, key):
+    # the task was not accepted after all (e.g. bucket full), let the retry through
+    name = _name(user_id, key)
+    local_store.release(name)
+    if current_app.config["IDEMPOTENCY_BACKEND"] == "redis":
+        try:
+            get_redis().delete(name)
+        except RedisError as e:
+            logger.warning(f"Could not release idempotency key {name}: {e}")
+
+
+def dedupe_batch(tasks):
+    # last line of defence inside one flush, keeps the first task per (user, key)
+    seen = set()
+    unique = []
+    for task in tasks:
+        key = task.get("idempotency_key")
+        if key:
+            marker = (task.get("user_id"), key)
+            if marker in seen:
+                continue
+            seen.add(marker)
+        unique.append(task)
+    return unique
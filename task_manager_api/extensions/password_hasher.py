@@ -0,0 +1,160 @@
+import os
+import time
+import hmac
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+# bcrypt is ~250 ms of pure CPU at cost 12, run inline it holds a gunicorn thread
+# (and the GIL) for all of it. the hashes run on a small process pool per worker
+# instead, at most PASSWORD_HASH_MAX_QUEUE of them waiting or running, anything
+# past that is refused (503) instead of piling up behind a login burst
+
+PASSWORD_HASH_SECONDS = Histogram(
+    "password_hash_seconds",
+    "Time a request waited for a password hash or check, queueing included",
+    ["op"],  # hash | check
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+PASSWORD_HASH_QUEUE = Gauge(
+    "password_hash_queue_depth",
+    "Password hashes waiting or running in this worker",
+)
+PASSWORD_HASH_REQUESTS = Counter(
+    "password_hash_requests_total",
+    "Password hash and check requests",
+    ["result"],  # ok | rejected | timeout | broken
+)
+
+
+class HasherBusy(Exception):
+    # queue full (or the pool too slow / broken), the caller answers 503
+    pass
+
+
+# module level so the pool's processes can unpickle them
+def _hash(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+
+
+def _check(pw_hash, password):
+    return hmac.compare_digest(bcrypt.hashpw(password, pw_hash), pw_hash)
+
+
+def hash_cost(pw_hash):
+    # "$2b$12$<salt+hash>" -> 12
+    try:
+        return int(pw_hash.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    def __init__(self, app=None):
+        self.rounds = 12
+        self.workers = 0
+        self.timeout = None
+        self._slots = None
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.rounds = app.config["BCRYPT_LOG_ROUNDS"]
+        # 0 = hash in the request thread (tests, dev server)
+        self.workers = app.config["PASSWORD_HASH_WORKERS"]
+        self.timeout = app.config["PASSWORD_HASH_TIMEOUT"]
+        self._slots = threading.BoundedSemaphore(app.config["PASSWORD_HASH_MAX_QUEUE"])
+
+    def _executor(self):
+        # created in the process that uses it, a pool made before gunicorn forks
+        # would belong to the master
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    # no fork, the request threads may hold locks
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _discard(self, pool):
+        # a pool process died (OOM kill, crash): the executor refuses every job
+        # from then on, the next call builds a new one
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, future=None):
+        PASSWORD_HASH_QUEUE.dec()
+        self._slots.release()
+
+    def _run(self, op, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            PASSWORD_HASH_REQUESTS.labels("rejected").inc()
+            raise HasherBusy("password hash queue is full")
+        PASSWORD_HASH_QUEUE.inc()
+        started = time.perf_counter()
+        if not self.workers:
+            try:
+                result = fn(*args)
+            finally:
+                self._release()
+        else:
+            pool = self._executor()
+            try:
+                future = pool.submit(fn, *args)
+            except BrokenProcessPool:
+                self._release()
+                self._broken(pool, op)
+            except Exception:
+                self._release()
+                raise
+            # the slot goes back when the job is over, not when we stop waiting:
+            # cancel() can not stop a running job, it keeps a pool process busy
+            future.add_done_callback(self._release)
+            try:
+                result = future.result(timeout=self.timeout)
+            except TimeoutError:
+                future.cancel()
+                PASSWORD_HASH_REQUESTS.labels("timeout").inc()
+                raise HasherBusy(
+                    f"password {op} took over {self.timeout}s"
+                ) from None
+            except BrokenProcessPool:
+                self._broken(pool, op)
+        PASSWORD_HASH_SECONDS.labels(op).observe(time.perf_counter() - started)
+        PASSWORD_HASH_REQUESTS.labels("ok").inc()
+        return result
+
+    def _broken(self, pool, op):
+        self._discard(pool)
+        PASSWORD_HASH_REQUESTS.labels("broken").inc()
+        logger.error(f"Password hash pool broken during {op}, rebuilding it")
+        raise HasherBusy(f"password {op} lost its pool process") from None
+
+    def generate_password_hash(self, password):
+        return self._run("hash", _hash, password.encode(), self.rounds).decode()
+
+    def check_password_hash(self, pw_hash, password):
+        return self._run("check", _check, pw_hash.encode(), password.encode())
+
+    def needs_rehash(self, pw_hash):
+        # made under another BCRYPT_LOG_ROUNDS, upgraded on the next good login
+        return hash_cost(pw_hash) != self.rounds
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
@@ -1,9 +1,12 @@
-from redis import ConnectionPool
+from redis import ConnectionPool, Redis
 
 pool = None 
+client = None
+scripts = {}
 
 def init_redis(app):
-    global pool
+    global pool, client
+    client = None
     pool =  ConnectionPool(
             host=app.config.get("REDIS_HOST"),
             port=app.config.get("REDIS_PORT"),
@@ -13,3 +16,22 @@ def init_redis(app):
             socket_connect_timeout=1,
         )
 
+
+def get_redis():
+    # one client per process on top of the shared pool (building a Redis() per
+    # request is cheap but not free, and easy to get wrong)
+    global client
+    if client is None:
+        client = Redis(connection_pool=pool)
+    return client
+
+
+def get_script(source):
+    # registered once per client, Script objects call EVALSHA and only send the
+    # source again (EVAL) when redis does not know the sha yet
+    redis_client = get_redis()
+    script = scripts.get(source)
+    if script is None or script.registered_client is not redis_client:
+        script = redis_client.register_script(source)
+        scripts[source] = script
+    return script
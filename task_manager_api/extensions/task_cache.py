@@ -0,0 +1,176 @@
+import hashlib
+import logging
+from flask import current_app
+from redis.exceptions import RedisError
+from prometheus_client import Counter
+from task_manager_api.extensions.redis_client import get_redis, get_script
+from task_manager_api.extensions.local_cache import LocalCache
+
+logger = logging.getLogger(__name__)
+
+# read-through cache for GET /tasks pages. every page key embeds the user's
+# version number, a write only has to INCR the version to make all cached pages
+# of that user unreachable (they simply expire), no key scanning needed
+
+VERSION_KEY = "tasks:ver:{user_id}"
+PAGE_KEY = "tasks:page:{user_id}:{version}:{digest}"
+# the version must outlive every page written under it
+VERSION_TTL = 24 * 60 * 60
+
+PAGE_CACHE = Counter(
+    "task_page_cache_total",
+    "GET /tasks page cache lookups",
+    ["result"],  # hit | miss | skip | error
+)
+
+# one round-trip: read the version, then the page stored under it
+lookup_script = """
+local version = redis.call('GET', KEYS[1]) or '0'
+return {version, redis.call('GET', ARGV[1] .. version .. ARGV[2])}
+"""
+
+def _digest(args):
+    # same filters in any order -> same key
+    canonical = "&".join(f"{k}={v}" for k, v in sorted(args.items(multi=True)))
+    return hashlib.blake2b(canonical.encode(), digest_size=12).hexdigest()
+
+
+def get_cached_page(user_id, args):
+    # (version, body) -> body is None on a miss, version is None when the cache is off
+    if not current_app.config["TASK_PAGE_CACHE_ENABLED"]:
+        return None, None
+    try:
+        version, body = get_script(lookup_script)(
+            keys=[VERSION_KEY.format(user_id=user_id)],
+            args=[f"tasks:page:{user_id}:", f":{_digest(args)}"],
+        )
+    except RedisError as e:
+        PAGE_CACHE.labels("error").inc()
+        logger.warning(f"Task page cache lookup failed: {e}")
+        return None, None
+
+    PAGE_CACHE.labels("hit" if body is not None else "miss").inc()
+    return version.decode(), body
+
+
+def cache_page(user_id, args, version, body):
+    if version is None:
+        return
+    if len(body) > current_app.config["TASK_PAGE_CACHE_MAX_BYTES"]:
+        PAGE_CACHE.labels("skip").inc()
+        return
+    key = PAGE_KEY.format(user_id=user_id, version=version, digest=_digest(args))
+    try:
+        get_redis().set(key, body, ex=current_app.config["TASK_PAGE_CACHE_TTL"])
+    except RedisError as e:
+        logger.warning(f"Task page cache store failed: {e}")
+
+
+def invalidate_user_pages(redis_client, user_ids):
+    # called by every write path (update/delete routes, batch consumer commit)
+    pipe = redis_client.pipeline(transaction=False)
+    for user_id in set(user_ids):
+        key = VERSION_KEY.format(user_id=user_id)
+        pipe.incr(key)
+        pipe.expire(key, VERSION_TTL)
+    pipe.execute()
+
+
+def invalidate_user(user_id):
+    try:
+        invalidate_user_pages(get_redis(), [user_id])
+    except RedisError as e:
+        # stale pages live at most TASK_PAGE_CACHE_TTL seconds
+        logger.error(f"Task page cache invalidation failed for user_id={user_id}: {e}")
+
+
+# ---------------------------------------------------------------------------
+# single task cache (GET /tasks/<id>), two tiers:
+#   1. per worker LRU, very short TTL, no network at all for hot tasks
+#   2. one redis hash per task, the serialized JSON body plus a generation
+#      number. writes bump the generation and drop the body, a GET that missed
+#      only stores its body if the generation is still the one it saw before
+#      reading postgres, so a slow GET can not put back a pre-update body
+# other workers may serve their local copy for at most TASK_ITEM_LOCAL_TTL seconds
+# ---------------------------------------------------------------------------
+
+ITEM_KEY = "task:{user_id}:{task_id}"
+LOCAL_ITEM_CAPACITY = 2048
+
+ITEM_CACHE = Counter(
+    "task_item_cache_total",
+    "GET /tasks/<id> cache lookups",
+    ["result"],  # local_hit | redis_hit | miss | error
+)
+
+# compare-and-set on the generation, 1 when the body was stored
+store_script = """
+local generation = redis.call('HGET', KEYS[1], 'gen') or '0'
+if generation ~= ARGV[1] then return 0 end
+redis.call('HSET', KEYS[1], 'body', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+local_items = LocalCache(capacity=LOCAL_ITEM_CAPACITY)
+
+
+def get_cached_task(user_id, task_id):
+    # (generation, body) -> body is None on a miss, generation is None when the
+    # body must not be cached (cache off, redis error)
+    if not current_app.config["TASK_ITEM_CACHE_ENABLED"]:
+        return None, None
+    key = ITEM_KEY.format(user_id=user_id, task_id=task_id)
+
+    body = local_items.get(key)
+    if body is not None:
+        ITEM_CACHE.labels("local_hit").inc()
+        return None, body
+
+    try:
+        body, generation = get_redis().hmget(key, "body", "gen")
+    except RedisError as e:
+        ITEM_CACHE.labels("error").inc()
+        logger.warning(f"Task cache lookup failed: {e}")
+        return None, None
+
+    if body is None:
+        ITEM_CACHE.labels("miss").inc()
+        return (generation or b"0").decode(), None
+    ITEM_CACHE.labels("redis_hit").inc()
+    local_items.set(key, body, current_app.config["TASK_ITEM_LOCAL_TTL"])
+    return None, body
+
+
+def cache_task(user_id, task_id, generation, body):
+    if generation is None:
+        return
+    key = ITEM_KEY.format(user_id=user_id, task_id=task_id)
+    try:
+        stored = get_script(store_script)(
+            keys=[key],
+            args=[generation, body, current_app.config["TASK_ITEM_CACHE_TTL"]],
+        )
+    except RedisError as e:
+        logger.warning(f"Task cache store failed: {e}")
+        return
+    if stored:
+        local_items.set(key, body, current_app.config["TASK_ITEM_LOCAL_TTL"])
+
+
+def invalidate_tasks(user_id, task_ids):
+    keys = [ITEM_KEY.format(user_id=user_id, task_id=task_id) for task_id in task_ids]
+    if not keys:
+        return
+    local_items.delete(*keys)
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for key in keys:
+            pipe.hincrby(key, "gen", 1)
+            pipe.hdel(key, "body")
+            # the generation must outlive a GET that is reading postgres
+            pipe.expire(key, current_app.config["TASK_ITEM_CACHE_TTL"])
+        pipe.execute()
+    except RedisError as e:
+        # stale entries live at most TASK_ITEM_CACHE_TTL seconds
+        logger.error(f"Task cache invalidation failed for user_id={user_id}: {e}")
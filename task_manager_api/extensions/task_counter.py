@@ -0,0 +1,113 @@
+import logging
+from flask import current_app
+from redis.exceptions import RedisError
+from task_manager_api.extensions.redis_client import get_redis, get_script
+
+logger = logging.getLogger(__name__)
+
+# per-user task counter for the quota check on POST /tasks. it counts tasks the
+# moment they are accepted (so tasks still in the bucket/queue count too) and is
+# reseeded from postgres whenever the key expires (TASK_COUNTER_TTL). with
+# TASK_IN_FLIGHT_TRACKING, tasks that went to the queue are also counted in a
+# second key until the python batch consumer has settled them, so a reseed is
+# postgres + in flight, not just postgres (the go-batcher never settles them)
+
+COUNTER_KEY = "task_count:{user_id}"
+IN_FLIGHT_KEY = "task_count:{user_id}:in_flight"
+
+# -1 -> not seeded yet, 0 -> over quota, otherwise the new count
+reserve_script = """
+local current = redis.call('GET', KEYS[1])
+if not current then return -1 end
+local limit = tonumber(ARGV[1])
+local wanted = tonumber(ARGV[2])
+if tonumber(current) + wanted > limit then return 0 end
+if KEYS[2] then
+    redis.call('INCRBY', KEYS[2], wanted)
+    redis.call('EXPIRE', KEYS[2], ARGV[3])
+end
+return redis.call('INCRBY', KEYS[1], wanted)
+"""
+
+release_script = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+local left = redis.call('DECRBY', KEYS[1], tonumber(ARGV[1]))
+if left < 0 then redis.call('SET', KEYS[1], 0, 'KEEPTTL') end
+return 1
+"""
+
+def _db_count(user_id):
+    from task_manager_api.models import Task
+
+    return Task.query.filter_by(user_id=user_id).count()
+
+
+def _tracks_in_flight(queued):
+    return queued and current_app.config["TASK_IN_FLIGHT_TRACKING"]
+
+
+def _seed(user_id):
+    # in flight is read first: a batch committed in between is counted twice
+    # (too high until the next reseed), never missed
+    if not current_app.config["TASK_IN_FLIGHT_TRACKING"]:
+        return _db_count(user_id)
+    in_flight = get_redis().get(IN_FLIGHT_KEY.format(user_id=user_id))
+    return _db_count(user_id) + int(in_flight or 0)
+
+
+def reserve_task_slots(user_id, count=1, queued=False):
+    # True when `count` more tasks fit in the user's quota (and reserves them),
+    # queued=True for tasks that reach postgres through the batch consumer
+    queued = _tracks_in_flight(queued)
+    limit = current_app.config["TASK_QUOTA"]
+    keys = [COUNTER_KEY.format(user_id=user_id)]
+    args = [limit, count]
+    if queued:
+        keys.append(IN_FLIGHT_KEY.format(user_id=user_id))
+        args.append(current_app.config["TASK_IN_FLIGHT_TTL"])
+    try:
+        result = get_script(reserve_script)(keys=keys, args=args)
+        if result == -1:
+            # one COUNT(*) per user per TTL instead of one per request
+            get_redis().set(
+                keys[0],
+                _seed(user_id),
+                nx=True,
+                ex=current_app.config["TASK_COUNTER_TTL"],
+            )
+            result = get_script(reserve_script)(keys=keys, args=args)
+        return result > 0
+    except RedisError as e:
+        logger.warning(f"Task counter unavailable, counting in postgres: {e}")
+        return _db_count(user_id) + count <= limit
+
+
+def release_task_slots(user_id, count=1, queued=False):
+    # tasks that were deleted, or reserved but never accepted (queued=True when
+    # they were reserved that way)
+    if count <= 0:
+        return
+    keys = [COUNTER_KEY.format(user_id=user_id)]
+    if _tracks_in_flight(queued):
+        keys.append(IN_FLIGHT_KEY.format(user_id=user_id))
+    try:
+        for key in keys:
+            get_script(release_script)(keys=[key], args=[count])
+    except RedisError as e:
+        logger.warning(
+            f"Could not release {count} task slots for user_id={user_id}: {e}"
+        )
+
+
+def settle_queued_tasks(settled, dropped):
+    # batch consumer, after its commit. settled: user_id -> tasks that left the
+    # queue (stored, skipped or dead-lettered), no longer in flight. dropped:
+    # user_id -> those of them that were not stored, their slot is given back
+    pipe = get_redis().pipeline(transaction=False)
+    for key, counts in ((IN_FLIGHT_KEY, settled), (COUNTER_KEY, dropped)):
+        for user_id, count in counts.items():
+            if count > 0:
+                get_script(release_script)(
+                    keys=[key.format(user_id=user_id)], args=[count], client=pipe
+                )
+    pipe.execute()
@@ -0,0 +1,341 @@
+import math
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from collections import namedtuple
+import orjson
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from redis.exceptions import RedisError
+from prometheus_client import Counter
+from task_manager_api import db
+from task_manager_api.models import User
+from task_manager_api.extensions.redis_client import get_redis, get_script
+
+logger = logging.getLogger(__name__)
+
+# login / signup look users up by email or username. two layers in front of the
+# users table, both in redis so every worker sees the same state:
+#   1. a bloom filter over every registered email and username. "definitely
+#      not registered" is answered with one EVALSHA, made-up emails (credential
+#      stuffing) never reach postgres
+#   2. a lookup cache, email / username -> UserRecord, plus short lived
+#      negative entries for the bloom's false positives. one hash per lookup,
+#      the record plus a generation number (same scheme as the task item cache):
+#      invalidations bump the generation, a miss only stores what it read from
+#      postgres if the generation is still the one it saw before the query
+# the bloom is rebuilt at startup (one worker, under a lock) and updated on
+# signup. users are never deleted or renamed, so it never has to forget. a
+# signup that could not reach the filter marks it incomplete: bloom negatives
+# go to the cache / DB until a rebuild that started after the mark swaps in
+
+UserRecord = namedtuple("UserRecord", ["id", "username", "email", "password_hash"])
+
+LOOKUP_KEY = "user:lookup:{field}:{value}"
+# the filter's size is in its name, after a USER_BLOOM_* change lookups find no
+# filter (= maybe) until the rebuild, instead of reading bits laid out differently
+BLOOM_KEY = "users:bloom:{bits}:{hashes}"
+BLOOM_BUILD_TTL = 600
+BLOOM_BUILD_CHUNK = 10_000
+# a signup during the scan may have missed it, the builder goes again
+BLOOM_BUILD_PASSES = 3
+BLOOM_ADD_ATTEMPTS = 3
+NEGATIVE = b"-"
+
+USER_LOOKUP = Counter(
+    "user_lookup_total",
+    "Login / signup user lookups by email or username",
+    ["result"],  # bloom_negative | hit | negative_hit | miss | error
+)
+
+# one round-trip: {0} when the bloom says "not registered", else
+# {1, generation, cached record or nil}. no filter yet, or a filter marked
+# incomplete, counts as "maybe"
+lookup_script = """
+if redis.call('EXISTS', KEYS[1]) == 1 and redis.call('EXISTS', KEYS[2]) == 0 then
+    for _, offset in ipairs(ARGV) do
+        if redis.call('GETBIT', KEYS[1], offset) == 0 then return {0} end
+    end
+end
+local cached = redis.call('HMGET', KEYS[3], 'gen', 'user')
+return {1, cached[1] or '0', cached[2]}
+"""
+
+# compare-and-set on the generation, 1 when the record was stored
+store_script = """
+local generation = redis.call('HGET', KEYS[1], 'gen') or '0'
+if generation ~= ARGV[1] then return 0 end
+redis.call('HSET', KEYS[1], 'user', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+# into the live filter and, while a rebuild runs, into the one being built
+bloom_add_script = """
+for _, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        for _, offset in ipairs(ARGV) do
+            redis.call('SETBIT', key, offset, 1)
+        end
+    end
+end
+"""
+
+# one scan partition into the filter being built, both TTLs pushed back.
+# 0 (nothing written) when the lock is no longer ours or the filter expired
+bloom_batch_script = """
+if redis.call('GET', KEYS[2]) ~= ARGV[1] or redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+for i = 3, #ARGV do
+    redis.call('SETBIT', KEYS[1], ARGV[i], 1)
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+return 1
+"""
+
+# KEYS: building, live, lock, incomplete mark. ARGV: lock token, the mark seen
+# before the scan. 0 = lost the lock / the filter, 1 = swapped in, 2 = swapped
+# in but a signup marked it incomplete during the scan (lock kept, go again)
+bloom_swap_script = """
+if redis.call('GET', KEYS[3]) ~= ARGV[1] or redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('RENAME', KEYS[1], KEYS[2])
+redis.call('PERSIST', KEYS[2])
+if (redis.call('GET', KEYS[4]) or '') ~= ARGV[2] then return 2 end
+redis.call('DEL', KEYS[4], KEYS[3])
+return 1
+"""
+
+release_script = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then redis.call('DEL', KEYS[1]) end
+"""
+
+
+def bloom_params(capacity, error_rate):
+    # (bits, hashes) for `capacity` entries at `error_rate` false positives
+    bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return bits, hashes
+
+
+def bloom_offsets(entry, bits, hashes):
+    # double hashing (Kirsch-Mitzenmacher), one blake2b per entry
+    digest = hashlib.blake2b(entry.encode(), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], "little")
+    h2 = int.from_bytes(digest[8:], "little") | 1
+    return [(h1 + i * h2) % bits for i in range(hashes)]
+
+
+def _entry(field, value):
+    return f"{field}:{value}"
+
+
+def _bloom(config):
+    # (key, bits, hashes) of the configured filter
+    bits, hashes = bloom_params(
+        config["USER_BLOOM_CAPACITY"], config["USER_BLOOM_ERROR_RATE"]
+    )
+    return BLOOM_KEY.format(bits=bits, hashes=hashes), bits, hashes
+
+
+def _incomplete_key(bloom_key):
+    return f"{bloom_key}:incomplete"
+
+
+def _offsets(bits, hashes, *entries):
+    return [
+        offset for entry in entries for offset in bloom_offsets(entry, bits, hashes)
+    ]
+
+
+def _from_db(field, value):
+    row = db.session.execute(
+        select(User.id, User.username, User.email, User.password_hash).where(
+            getattr(User, field) == value
+        )
+    ).first()
+    return UserRecord(*row) if row else None
+
+
+def find_user(field, value):
+    # UserRecord or None, field is "email" or "username"
+    if not current_app.config["USER_CACHE_ENABLED"]:
+        return _from_db(field, value)
+
+    key = LOOKUP_KEY.format(field=field, value=value)
+    bloom_key, bits, hashes = _bloom(current_app.config)
+    try:
+        result = get_script(lookup_script)(
+            keys=[bloom_key, _incomplete_key(bloom_key), key],
+            args=_offsets(bits, hashes, _entry(field, value)),
+        )
+    except RedisError as e:
+        USER_LOOKUP.labels("error").inc()
+        logger.warning(f"User lookup cache unavailable: {e}")
+        return _from_db(field, value)
+
+    if not result[0]:
+        USER_LOOKUP.labels("bloom_negative").inc()
+        return None
+    _, generation, cached = result
+    if cached == NEGATIVE:
+        USER_LOOKUP.labels("negative_hit").inc()
+        return None
+    if cached is not None:
+        USER_LOOKUP.labels("hit").inc()
+        return UserRecord(*orjson.loads(cached))
+
+    USER_LOOKUP.labels("miss").inc()
+    user = _from_db(field, value)
+    if user is None:
+        record, ttl = NEGATIVE, current_app.config["USER_CACHE_NEGATIVE_TTL"]
+    else:
+        record, ttl = orjson.dumps(list(user)), current_app.config["USER_CACHE_TTL"]
+    try:
+        get_script(store_script)(keys=[key], args=[generation, record, ttl])
+    except RedisError as e:
+        logger.warning(f"User lookup cache store failed: {e}")
+    return user
+
+
+def user_registered(email, username):
+    # after the signup commit: into the bloom, and drop negative entries
+    if not current_app.config["USER_CACHE_ENABLED"]:
+        return
+    bloom_key, bits, hashes = _bloom(current_app.config)
+    offsets = _offsets(
+        bits, hashes, _entry("email", email), _entry("username", username)
+    )
+    for attempt in range(1, BLOOM_ADD_ATTEMPTS + 1):
+        try:
+            get_script(bloom_add_script)(
+                keys=[bloom_key, f"{bloom_key}:building"], args=offsets
+            )
+            break
+        except RedisError as e:
+            logger.warning(
+                f"User bloom update failed for username={username} "
+                f"(attempt {attempt}): {e}"
+            )
+            if attempt < BLOOM_ADD_ATTEMPTS:
+                time.sleep(0.05 * attempt)
+    else:
+        _mark_incomplete(bloom_key, username)
+    invalidate_user(email, username)
+
+
+def _mark_incomplete(bloom_key, username):
+    # the filter misses this user: bloom negatives go to the cache / DB until a
+    # rebuild started after this mark has swapped in (it clears the mark)
+    try:
+        get_redis().set(
+            _incomplete_key(bloom_key), uuid.uuid4().hex, ex=BLOOM_BUILD_TTL
+        )
+    except RedisError as e:
+        # logins of this user fail until the next rebuild
+        logger.error(
+            f"User bloom could not be marked incomplete for username={username}: {e}"
+        )
+        return
+    app = current_app._get_current_object()
+    threading.Thread(target=rebuild_bloom, args=(app,), daemon=True).start()
+
+
+def invalidate_user(email, username):
+    # password reset / rehash, signup (negative entries)
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for field, value in (("email", email), ("username", username)):
+            key = LOOKUP_KEY.format(field=field, value=value)
+            pipe.hincrby(key, "gen", 1)
+            pipe.hdel(key, "user")
+            # the generation must outlive a lookup that is reading postgres
+            pipe.expire(key, current_app.config["USER_CACHE_TTL"])
+        pipe.execute()
+    except RedisError as e:
+        # stale entries live at most USER_CACHE_TTL seconds
+        logger.error(
+            f"User lookup cache invalidation failed for username={username}: {e}"
+        )
+
+
+def _build_pass(redis_client, bloom_key, bits, hashes, token):
+    # one scan of the users table into the build filter, then the swap.
+    # -> (bloom_swap_script result, users)
+    build_key, lock_key = f"{bloom_key}:building", f"{bloom_key}:lock"
+    incomplete_key = _incomplete_key(bloom_key)
+    redis_client.delete(build_key)
+    # read before the scan: a mark set after this may be for a user it misses
+    seen = redis_client.get(incomplete_key) or b""
+    # created before the scan, so signups from here on land in it too
+    redis_client.setbit(build_key, 0, 0)
+    redis_client.expire(build_key, BLOOM_BUILD_TTL)
+
+    users = 0
+    batch = get_script(bloom_batch_script)
+    rows = db.session.execute(
+        select(User.email, User.username).execution_options(
+            yield_per=BLOOM_BUILD_CHUNK
+        )
+    )
+    for partition in rows.partitions():
+        entries = [
+            entry
+            for email, username in partition
+            for entry in (_entry("email", email), _entry("username", username))
+        ]
+        offsets = _offsets(bits, hashes, *entries)
+        args = [token, BLOOM_BUILD_TTL, *offsets]
+        if not batch(keys=[build_key, lock_key], args=args):
+            return 0, users
+        users += len(partition)
+
+    swapped = get_script(bloom_swap_script)(
+        keys=[build_key, bloom_key, lock_key, incomplete_key], args=[token, seen]
+    )
+    return swapped, users
+
+
+def rebuild_bloom(app):
+    # startup (and after a signup missed the filter), in a background thread.
+    # one worker builds next to the live filter and swaps it in, signups
+    # meanwhile go into both (bloom_add_script)
+    with app.app_context():
+        if not app.config["USER_CACHE_ENABLED"]:
+            return
+        redis_client = get_redis()
+        bloom_key, bits, hashes = _bloom(app.config)
+        lock_key = f"{bloom_key}:lock"
+        token = uuid.uuid4().hex
+        try:
+            if not redis_client.set(lock_key, token, nx=True, ex=BLOOM_BUILD_TTL):
+                return
+            for _ in range(BLOOM_BUILD_PASSES):
+                swapped, users = _build_pass(
+                    redis_client, bloom_key, bits, hashes, token
+                )
+                if swapped != 2:
+                    break
+            if swapped == 0:
+                # lock or build filter expired mid scan, the live filter is untouched
+                logger.error(f"User bloom filter rebuild aborted after {users} users")
+            else:
+                logger.info(
+                    f"User bloom filter rebuilt: {users} users, {bits} bits, "
+                    f"{hashes} hashes"
+                )
+        except (RedisError, SQLAlchemyError) as e:
+            # lookups treat a missing filter as "maybe", they just go to the cache / DB
+            logger.error(f"User bloom filter rebuild failed: {e}")
+        finally:
+            try:
+                get_script(release_script)(keys=[lock_key], args=[token])
+            except RedisError:
+                pass  # expires with BLOOM_BUILD_TTL
+            db.session.remove()
@@ -1,7 +1,7 @@
 from task_manager_api import db
 from datetime import datetime, timezone
 from enum import Enum
-from sqlalchemy import Enum as SqlEnum
+from sqlalchemy import Enum as SqlEnum, DDL, event
 
 
 class User(db.Model):
@@ -48,6 +48,58 @@ class Task(db.Model):
         db.DateTime, default=db.func.now(), onupdate=db.func.now(), nullable=False
     )
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    # client supplied Idempotency-Key (POST /tasks), NULLs never collide
+    idempotency_key = db.Column(db.String(64))
+    # ULID handed out by POST /tasks (202), lets the consumer report the task id
+    # back. unique, a redelivered stream entry is skipped like a duplicate key
+    request_id = db.Column(db.String(26))
+
+    __table_args__ = (
+        db.UniqueConstraint(
+            "user_id", "idempotency_key", name="uq_tasks_user_idempotency_key"
+        ),
+        db.Index("uq_tasks_request_id", "request_id", unique=True),
+        # hot query shapes of GET /tasks (user scoped, keyset on id, filter_manager)
+        db.Index("ix_tasks_user_id_id", "user_id", "id"),
+        db.Index("ix_tasks_user_id_completion_id", "user_id", "completion", "id"),
+        db.Index("ix_tasks_user_id_title", "user_id", "title"),
+        # keyset pagination for ?sort=..., (sort key, id) scanned forward or backward
+        db.Index("ix_tasks_user_id_created_at_id", "user_id", "created_at", "id"),
+        db.Index("ix_tasks_user_id_due_date_id", "user_id", "due_date", "id"),
+        db.Index("ix_tasks_user_id_priority_id", "user_id", "priority", "id"),
+    )
+
+
+# ?q= search. postgres: generated tsvector column + GIN / pg_trgm indexes, created
+# by migration 3b9f6c2d8e14 only (not mapped, sqlite could not build them).
+# sqlite (dev / tests): an FTS5 table kept in sync by triggers, made with create_all
+SEARCH_DB_ONLY = {
+    "search_vector",
+    "ix_tasks_search_vector",
+    "ix_tasks_title_trgm",
+}
+
+for ddl in (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5("
+    "title, description, content='tasks', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN "
+    "INSERT INTO tasks_fts(rowid, title, description) "
+    "VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN "
+    "INSERT INTO tasks_fts(tasks_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_au AFTER UPDATE ON tasks BEGIN "
+    "INSERT INTO tasks_fts(tasks_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO tasks_fts(rowid, title, description) "
+    "VALUES (new.id, new.title, new.description); END",
+):
+    event.listen(Task.__table__, "after_create", DDL(ddl).execute_if(dialect="sqlite"))
+event.listen(
+    Task.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS tasks_fts").execute_if(dialect="sqlite"),
+)
 
 
 class PasswordReset(db.Model):
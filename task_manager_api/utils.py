@@ -1,9 +1,15 @@
 import datetime
+import time
 import base64
+import hmac
+import hashlib
+import orjson
 from functools import wraps
 from flask import current_app
 import jwt
-from flask import request
+from flask import request, g
+from prometheus_client import Counter
+from task_manager_api.extensions.local_cache import LocalCache
 from .error_handler import unauthorized_error, bad_request
 import secrets
 from .models import PasswordReset
@@ -53,19 +59,58 @@ def generate_password_token(user_id, email):
 # ----------------
 
 
+# verified access tokens, until their own exp. keyed by a hash of the token so
+# the tokens themselves are not kept around
+token_cache = LocalCache(capacity=10_000)
+
+TOKEN_CACHE = Counter(
+    "auth_token_cache_total",
+    "Access token verifications, answered from the cache or by jwt.decode",
+    ["result"],  # hit | miss
+)
+
+
+def _token_key(token):
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
 # for POST_AUTH Usage
 def decode_access_token(token):
-    try:
-        payload = jwt.decode(
-            token, current_app.config["SECRET_KEY"], algorithms="HS256"
-        )
-        if "user_id" in payload:
-            return ("ok", payload["user_id"])
+    key = _token_key(token)
+    payload = token_cache.get(key)
+    if payload is not None:
+        TOKEN_CACHE.labels("hit").inc()
+    else:
+        TOKEN_CACHE.labels("miss").inc()
+        try:
+            payload = jwt.decode(
+                token, current_app.config["SECRET_KEY"], algorithms="HS256"
+            )
+        except jwt.ExpiredSignatureError:
+            return ("token expired", None)  # token_expired
+        except jwt.InvalidTokenError:
+            return ("token invalid", None)  # invalid
 
-    except jwt.ExpiredSignatureError:
-        return ("token expired", None)  # token_expired
-    except jwt.InvalidTokenError:
-        return ("token invalid", None)  # invalid
+        # only what verified fine, and never past its exp
+        ttl = payload.get("exp", 0) - time.time()
+        if ttl > 0:
+            token_cache.set(key, payload, ttl)
+
+    if "user_id" in payload:
+        return ("ok", payload["user_id"])
+    return ("token invalid", None)
+
+
+def authenticate_request():
+    # (status, user_id) of this request's Bearer token, decoded once and shared
+    # through flask.g by token_required and rate_limit
+    if "auth" not in g:
+        auth_header = request.headers.get("Authorization")
+        if not auth_header or not auth_header.startswith("Bearer "):
+            g.auth = ("token is missing", None)
+        else:
+            g.auth = decode_access_token(auth_header.split(" ")[1])
+    return g.auth
 
 
 # For decoding the reset token 
@@ -106,18 +151,14 @@ def decode_password_reset_token(token):
 def token_required(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
-        auth_header = request.headers.get("Authorization")
-        if not auth_header or not auth_header.startswith("Bearer "):
-            logger.warning("Token Error: Token is missing")
-            return unauthorized_error(msg="token error", reason="token is missing")
-
-        token = auth_header.split(" ")[1]
-        status, data = decode_access_token(token)
+        status, data = authenticate_request()
         if status == "ok":
             return func(data, *args, **kwargs)
+        elif status == "token is missing":
+            logger.warning("Token Error: Token is missing")
         else:
-            logger.error(f"Token Error: {data}")
-            return unauthorized_error(msg="token error", reason=status)
+            logger.error(f"Token Error: {status}")
+        return unauthorized_error(msg="token error", reason=status)
 
     return wrapper
 
@@ -207,24 +248,70 @@ def reset_token_chk(func):
 # ------------------------
 
 
-# encrypt the id (currently using base64 encoding )
-def cursor_encoder(task_id):
-    purity = str(task_id).encode()
-    encoded_cursor = base64.b64encode(purity)
-    return encoded_cursor.decode("utf-8")
+# keyset cursor: base64url(json [sort, direction, sort value, id]) + "." + HMAC,
+# signed so a client can not hand us arbitrary values for the WHERE clause
+CURSOR_SIG_BYTES = 12
+
+
+def _cursor_signature(payload):
+    key = current_app.config["SECRET_KEY"].encode()
+    digest = hmac.new(key, payload, hashlib.sha256).digest()[:CURSOR_SIG_BYTES]
+    return base64.urlsafe_b64encode(digest).rstrip(b"=")
+
+
+def cursor_encoder(sort, direction, value, task_id):
+    payload = base64.urlsafe_b64encode(
+        orjson.dumps([sort, direction, value, task_id])
+    ).rstrip(b"=")
+    return (payload + b"." + _cursor_signature(payload)).decode()
 
 
 def cursor_decoder(cursor):
-    decoding = base64.b64decode(cursor)
-    decoded_cursor = decoding.decode()
+    # (sort, direction, value, id), ValueError for anything not signed by us
+    try:
+        payload, signature = cursor.encode().split(b".")
+    except ValueError:
+        raise ValueError("malformed cursor") from None
+    if not hmac.compare_digest(signature, _cursor_signature(payload)):
+        raise ValueError("cursor signature mismatch")
+
+    sort, direction, value, task_id = orjson.loads(
+        base64.urlsafe_b64decode(payload + b"=" * (-len(payload) % 4))
+    )
+    return sort, direction, value, int(task_id)
 
-    return decoded_cursor
 
     # --------------
     # OTP helper
     # --------------
 
 
+# ------------------------
+# request id (ULID) for async task creation
+# ------------------------
+
+CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+
+def generate_request_id():
+    # 48 bit ms timestamp + 80 random bits, 26 chars, sortable by creation time
+    value = (int(time.time() * 1000) << 80) | secrets.randbits(80)
+    return "".join(CROCKFORD[(value >> (5 * i)) & 31] for i in reversed(range(26)))
+
+
+def request_id_timestamp(request_id):
+    # creation time in seconds, None when it is not one of our ids
+    if len(request_id) != 26:
+        return None
+    value = 0
+    for char in request_id.upper():
+        index = CROCKFORD.find(char)
+        if index < 0:
+            return None
+        value = (value << 5) | index
+    return (value >> 80) / 1000
+
+
 def otp_generator():
     # zfill is  the padding , which make the result into the required size
     # cause sometime  for  10**6  you get value 68706  which is not even equal to required size
@@ -0,0 +1,63 @@
+"""Auth overhead per request: the old path (token_required and rate_limit both
+run jwt.decode) vs authenticate_request() (one decode per request, shared
+through flask.g, repeated tokens answered by the verified token cache).
+
+No DB / redis needed:
+
+    python tests/load_tests/bench_auth.py --runs 20000
+"""
+
+import timeit
+import argparse
+import jwt
+from flask import Flask, g
+
+from task_manager_api.utils import (
+    generate_token,
+    authenticate_request,
+    token_cache,
+)
+
+
+def old_path(token, secret):
+    # token_required + rate_limit before the cache
+    for _ in range(2):
+        jwt.decode(token, secret, algorithms="HS256")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20_000)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "bench-secret"
+    with app.app_context():
+        token = generate_token(42)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    with app.test_request_context(headers=headers):
+
+        def cached_path():
+            g.pop("auth", None)  # a new request, same (hot) token
+            authenticate_request()
+            authenticate_request()
+
+        def cold_path():
+            token_cache.delete(*list(token_cache._entries))
+            cached_path()
+
+        results = {
+            "2x jwt.decode (old)": timeit.timeit(
+                lambda: old_path(token, app.config["SECRET_KEY"]), number=args.runs
+            ),
+            "first sight (1 decode)": timeit.timeit(cold_path, number=args.runs),
+            "hot token (cache hit)": timeit.timeit(cached_path, number=args.runs),
+        }
+
+    for name, seconds in results.items():
+        print(f"{name:<24} {seconds / args.runs * 1e6:>8.2f} us/request")
+
+
+if __name__ == "__main__":
+    main()
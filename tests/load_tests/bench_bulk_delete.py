@@ -0,0 +1,100 @@
+"""DELETE /tasks for one user: the old ORM loop (load every Task, session.delete
+each) vs the set based DELETE ... WHERE user_id=... RETURNING id.
+
+Seeds a throw-away sqlite file, no postgres / redis needed:
+
+    python tests/load_tests/bench_bulk_delete.py --tasks 1000
+"""
+
+import os
+import time
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timezone
+from flask import Flask
+from sqlalchemy import delete
+
+from task_manager_api import db
+from task_manager_api.models import Task, User
+
+
+def orm_delete(user_id):
+    tasks = Task.query.filter_by(user_id=user_id).all()
+    for t in tasks:
+        db.session.delete(t)
+    db.session.commit()
+    return len(tasks)
+
+
+def set_delete(user_id):
+    deleted = (
+        db.session.execute(
+            delete(Task)
+            .where(Task.user_id == user_id)
+            .returning(Task.id)
+            .execution_options(synchronize_session=False)
+        )
+        .scalars()
+        .all()
+    )
+    db.session.commit()
+    return len(deleted)
+
+
+def seed(tasks):
+    now = datetime.now(timezone.utc)
+    db.session.execute(
+        Task.__table__.insert(),
+        [
+            {
+                "title": f"task {i}",
+                "description": "benchmark row",
+                "completion": False,
+                "created_at": now,
+                "updated_at": now,
+                "user_id": 1,
+            }
+            for i in range(tasks)
+        ],
+    )
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_bulk_delete.db")
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{path}"
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(
+            User(id=1, username="bench", email="bench@x.com", password_hash="x")
+        )
+        db.session.commit()
+
+        results = {}
+        for name, fn in (("orm loop", orm_delete), ("set based", set_delete)):
+            timings = []
+            for _ in range(args.runs):
+                seed(args.tasks)
+                db.session.remove()
+                started = time.perf_counter()
+                assert fn(1) == args.tasks
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = statistics.median(timings)
+            print(f"{name:<10} {results[name]:>8.2f} ms for {args.tasks} tasks")
+
+        print(f"speedup    x{results['orm loop'] / results['set based']:.1f}")
+
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Encoding time of one GET /tasks?limit=100 page, flask's default (stdlib json)
+provider vs the orjson provider (task_manager_api.json_provider).
+
+No DB / redis needed:
+
+    python tests/load_tests/bench_json_provider.py --runs 2000
+"""
+
+import timeit
+import argparse
+import functools
+from datetime import datetime, timedelta, timezone
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from task_manager_api.json_provider import OrjsonProvider
+from task_manager_api.models import Priority
+
+
+def make_page(size):
+    now = datetime.now(timezone.utc)
+    priorities = list(Priority)
+    return {
+        "data": [
+            {
+                "id": i,
+                "title": f"task {i}",
+                "description": "benchmark row " * 8,
+                "completion": i % 3 == 0,
+                "created_at": now - timedelta(days=i),
+                "priority": priorities[i % 3],
+                "due_date": now + timedelta(days=i) if i % 2 else None,
+            }
+            for i in range(size)
+        ],
+        "pagination": {
+            "next_cursor": "MTAw",
+            "has_more": True,
+            "limit": size,
+            "total_returned": size,
+        },
+        "meta": {"version": "1.0"},
+    }
+
+
+def stdlib_page(page):
+    # what the routes had to do for the stdlib encoder: pre-format every value
+    return {
+        **page,
+        "data": [
+            {
+                **t,
+                "created_at": t["created_at"].strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "priority": t["priority"].value,
+            }
+            for t in page["data"]
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=2000)
+    args = parser.parse_args()
+
+    page = make_page(args.size)
+    app = Flask(__name__)
+    providers = {
+        "stdlib json": (DefaultJSONProvider(app), stdlib_page(page)),
+        "orjson": (OrjsonProvider(app), page),
+    }
+
+    results = {}
+    with app.app_context():
+        for name, (provider, obj) in providers.items():
+            app.json = provider
+            body = provider.response(obj).get_data()
+            # bound now, not looked up when timeit calls it
+            render = functools.partial(provider.response, obj)
+            seconds = min(timeit.repeat(render, number=args.runs, repeat=5))
+            results[name] = seconds / args.runs * 1e6
+            print(f"{name:<12} {results[name]:>8.1f} us/page   {len(body)} bytes")
+
+    print(f"speedup      x{results['stdlib json'] / results['orjson']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Task request latency during a login burst, one gunicorn worker simulated as a
+4 thread pool: bcrypt inline in the request thread vs PasswordHasher (process
+pool, at most --max-queue hashes in flight, the rest refused with 503).
+
+No DB / redis needed:
+
+    python tests/load_tests/bench_password_hasher.py --logins 40 --rounds 12
+"""
+
+import time
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from flask import Flask
+
+from task_manager_api.extensions.password_hasher import PasswordHasher, HasherBusy
+
+REQUEST_THREADS = 4  # gunicorn --threads 4
+
+
+def task_request():
+    # a cheap endpoint, what matters is how long it waits for a thread
+    time.sleep(0.002)
+
+
+def run(login, logins, tasks):
+    latencies, refused = [], 0
+
+    def timed_task(submitted):
+        task_request()
+        latencies.append(time.perf_counter() - submitted)
+
+    with ThreadPoolExecutor(REQUEST_THREADS) as request_threads:
+        futures = [request_threads.submit(login) for _ in range(logins)]
+        for _ in range(tasks):
+            request_threads.submit(timed_task, time.perf_counter())
+            time.sleep(0.005)
+        for f in futures:
+            if f.result() is False:
+                refused += 1
+    latencies.sort()
+    return latencies, refused
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--max-queue", type=int, default=8)
+    args = parser.parse_args()
+
+    pw_hash = bcrypt.hashpw(b"draco1234", bcrypt.gensalt(rounds=args.rounds))
+
+    app = Flask(__name__)
+    app.config.update(
+        BCRYPT_LOG_ROUNDS=args.rounds,
+        PASSWORD_HASH_WORKERS=args.workers,
+        PASSWORD_HASH_MAX_QUEUE=args.max_queue,
+        PASSWORD_HASH_TIMEOUT=30,
+    )
+    hasher = PasswordHasher(app)
+    hasher.check_password_hash(pw_hash.decode(), "warm up the pool")
+
+    def inline_login():
+        return bcrypt.checkpw(b"draco1234", pw_hash)
+
+    def pooled_login():
+        try:
+            return hasher.check_password_hash(pw_hash.decode(), "draco1234")
+        except HasherBusy:
+            return False
+
+    for name, login in (("inline", inline_login), ("process pool", pooled_login)):
+        latencies, refused = run(login, args.logins, args.tasks)
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        print(
+            f"{name:<13} task p50 {statistics.median(latencies) * 1e3:>8.1f} ms"
+            f"  p99 {p99 * 1e3:>8.1f} ms  logins refused {refused}/{args.logins}"
+        )
+    hasher.shutdown()
+
+
+if __name__ == "__main__":
+    main()
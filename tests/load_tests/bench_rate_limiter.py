@@ -0,0 +1,61 @@
+"""Rate limit cost per request: one EVALSHA to redis (RATE_LIMIT_SYNC_INTERVAL=0)
+vs the per worker bucket (local decision, batched sync in the background).
+
+Needs a redis for the first column, the local numbers are printed regardless:
+
+    REDIS_HOST=localhost REDIS_PORT=6379 python tests/load_tests/bench_rate_limiter.py
+"""
+
+import os
+import timeit
+import argparse
+from flask import Flask
+from redis.exceptions import RedisError
+
+from task_manager_api.extensions.redis_client import init_redis
+from middleware.local_limiter import LocalLimiter
+from middleware.rate_limiter import check_rate_limit, sync_buckets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=100)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config["REDIS_HOST"] = os.environ.get("REDIS_HOST", "localhost")
+    app.config["REDIS_PORT"] = int(os.environ.get("REDIS_PORT", 6379))
+    init_redis(app)
+
+    keys = [f"ratelimit:bench:1000000:60:{i}" for i in range(args.users)]
+    calls = iter(range(10**12))
+
+    def next_key():
+        return keys[next(calls) % len(keys)]
+
+    limiter = LocalLimiter(sync_buckets, 0.25)
+    results = {}
+    try:
+        results["redis EVALSHA"] = timeit.timeit(
+            lambda: check_rate_limit(next_key(), 1_000_000, 60), number=args.runs
+        )
+    except RedisError as e:
+        print(f"redis not reachable ({e}), local bucket only")
+        limiter = LocalLimiter(lambda batch: [1_000_000] * len(batch), 0.25)
+
+    results["local bucket"] = timeit.timeit(
+        lambda: limiter.acquire(next_key(), 1_000_000, 60), number=args.runs
+    )
+    sync = timeit.timeit(limiter.sync_once, number=10) / 10
+
+    for name, seconds in results.items():
+        print(f"{name:<14} {seconds / args.runs * 1e6:>8.2f} us/request")
+    print(
+        f"one sync of {args.users} buckets {sync * 1e3:.2f} ms "
+        "(every 0.25 s, off the request path)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Allocations + latency of one GET /tasks page: the old ORM path (full Task
+instances, astimezone().strftime() per row) vs the column projected path
+(tasks_utils.list_query / keyset_page / rows_to_dicts) both encoded by the orjson
+provider.
+
+Seeds a throw-away sqlite file, no postgres / redis needed:
+
+    python tests/load_tests/bench_task_list.py --rows 20000 --page 100
+"""
+
+import os
+import time
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from flask import Flask, current_app
+
+from task_manager_api import db
+from task_manager_api.json_provider import OrjsonProvider
+from task_manager_api.models import Task, User, Priority
+from task_manager_api.api.v1.tasks.tasks_utils import (
+    list_query,
+    rows_to_dicts,
+    keyset_page,
+)
+
+
+def orm_page(user_id, page_size):
+    # GET /tasks before the projection
+    tasks = (
+        Task.query.filter_by(user_id=user_id)
+        .order_by(Task.id.asc())
+        .limit(page_size + 1)
+        .all()[:page_size]
+    )
+    data = [
+        {
+            "id": t.id,
+            "title": t.title,
+            "description": t.description,
+            "completion": t.completion,
+            "created_at": t.created_at.astimezone(timezone.utc).strftime(
+                "%Y-%m-%dT%H:%M:%SZ"
+            ),
+            "priority": str(t.priority.value),
+            "due_date": t.due_date,
+        }
+        for t in tasks
+    ]
+    return current_app.json.response({"data": data}).get_data()
+
+
+def projected_page(user_id, page_size):
+    rows = keyset_page(list_query(user_id), "id", False, None, page_size)
+    data = rows_to_dicts(rows[:page_size])
+    return current_app.json.response({"data": data}).get_data()
+
+
+def seed(rows):
+    db.session.add(User(id=1, username="bench", email="bench@x.com", password_hash="x"))
+    now = datetime.now(timezone.utc)
+    priorities = list(Priority)
+    db.session.execute(
+        Task.__table__.insert(),
+        [
+            {
+                "title": f"task {i}",
+                "description": "benchmark row " * 8,
+                "completion": i % 3 == 0,
+                "priority": priorities[i % 3],
+                "due_date": now + timedelta(days=i % 30) if i % 2 else None,
+                "created_at": now - timedelta(minutes=i),
+                "updated_at": now,
+                "user_id": 1,
+            }
+            for i in range(rows)
+        ],
+    )
+    db.session.commit()
+
+
+def measure(fn, page_size, runs):
+    # each run in a fresh session, like one request
+    timings = []
+    for _ in range(runs):
+        db.session.remove()
+        started = time.perf_counter()
+        fn(1, page_size)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    db.session.remove()
+    tracemalloc.start()
+    fn(1, page_size)
+    snapshot = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sum(stat.count for stat in snapshot.statistics("filename"))
+    return statistics.median(timings), peak, blocks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--page", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_task_list.db")
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{path}"
+    app.json = OrjsonProvider(app)
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        seed(args.rows)
+        assert orm_page(1, 1) == projected_page(1, 1), (
+            "paths must render the same JSON"
+        )
+
+        print(f"page of {args.page} tasks, {args.runs} runs")
+        print(
+            f"{'path':<12} {'median ms':>10} {'peak KiB':>10} "
+            f"{'retained blocks':>16}"
+        )
+        for name, fn in (("orm", orm_page), ("projected", projected_page)):
+            median_ms, peak, blocks = measure(fn, args.page, args.runs)
+            print(f"{name:<12} {median_ms:>10.3f} {peak / 1024:>10.1f} {blocks:>16}")
+
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
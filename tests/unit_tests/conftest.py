@@ -0,0 +1,58 @@
+import pytest
+import redis
+import fakeredis
+from flask import Flask
+from task_manager_api import db
+from task_manager_api import models  # noqa: F401 (tables for create_all)
+from task_manager_api.config import Config
+from task_manager_api.extensions import redis_client
+
+
+@pytest.fixture
+def app():
+    # bare app (no create_app: no batcher threads, no blueprints) on sqlite
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config["TESTING"] = True
+    app.config["SECRET_KEY"] = "test-secret"
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    # get_redis() / get_script() and everything built on the pool talk to fakeredis
+    server = fakeredis.FakeServer()
+    pool = redis.ConnectionPool(
+        connection_class=fakeredis.FakeRedisConnection, server=server
+    )
+    monkeypatch.setattr(redis_client, "pool", pool)
+    monkeypatch.setattr(redis_client, "client", None)
+    monkeypatch.setattr(redis_client, "scripts", {})
+    return redis_client.get_redis()
+
+
+@pytest.fixture
+def client(app, fake_redis):
+    # the tasks blueprint on the bare app, see auth_headers for the token
+    from task_manager_api.json_provider import OrjsonProvider
+    from task_manager_api.api.v1.tasks.routes import tasks
+
+    app.json = OrjsonProvider(app)
+    app.register_blueprint(tasks)
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers(app):
+    from task_manager_api.utils import generate_token
+
+    def headers(user_id=1):
+        return {"Authorization": f"Bearer {generate_token(user_id)}"}
+
+    return headers
@@ -0,0 +1,78 @@
+import time
+import threading
+from batch_process.buffer import TaskBuffer
+
+
+def test_put_rejects_when_full():
+    buffer = TaskBuffer(capacity=2)
+    assert buffer.put({"title": "a"})
+    assert buffer.put({"title": "b"})
+    assert not buffer.put({"title": "c"})
+    assert len(buffer) == 2
+    assert buffer.rejected == 1
+
+
+def test_drain_swaps_and_keeps_order():
+    buffer = TaskBuffer(capacity=10)
+    for i in range(5):
+        buffer.put(i)
+
+    assert buffer.drain() == [0, 1, 2, 3, 4]
+    assert len(buffer) == 0
+    assert buffer.put(5)
+    assert buffer.drain() == [5]
+
+
+def test_concurrent_producers_lose_nothing():
+    buffer = TaskBuffer(capacity=10_000)
+    drained = []
+
+    def produce():
+        for i in range(1000):
+            buffer.put(i)
+
+    threads = [threading.Thread(target=produce) for _ in range(8)]
+    for t in threads:
+        t.start()
+    while any(t.is_alive() for t in threads):
+        drained.extend(buffer.drain())
+    for t in threads:
+        t.join()
+    drained.extend(buffer.drain())
+
+    assert len(drained) == 8000
+    assert buffer.accepted == 8000
+
+
+def test_wait_for_batch_wakes_when_flush_at_is_reached():
+    buffer = TaskBuffer(capacity=100, flush_at=3)
+    result = []
+    flusher = threading.Thread(target=lambda: result.extend(buffer.wait_for_batch(60)))
+    flusher.start()
+
+    for i in range(3):
+        buffer.put(i)
+    flusher.join(timeout=2)
+
+    assert not flusher.is_alive()
+    assert result == [0, 1, 2]
+
+
+def test_wait_for_batch_flushes_partial_batch_after_deadline():
+    buffer = TaskBuffer(capacity=100, flush_at=50)
+    buffer.put("only-one")
+
+    started = time.monotonic()
+    assert buffer.wait_for_batch(0.05) == ["only-one"]
+    assert time.monotonic() - started >= 0.05
+
+
+def test_put_many_is_all_or_nothing():
+    buffer = TaskBuffer(capacity=5)
+    assert buffer.put_many([1, 2, 3])
+    assert not buffer.put_many([4, 5, 6])
+    assert len(buffer) == 3
+    assert buffer.rejected == 3
+
+    assert buffer.put_many([4, 5])
+    assert buffer.drain() == [1, 2, 3, 4, 5]
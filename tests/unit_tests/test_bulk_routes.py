@@ -0,0 +1,71 @@
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+import pytest
+from task_manager_api import db
+from task_manager_api.models import Task
+
+
+@pytest.fixture
+def task_ids(app):
+    tasks = [Task(title=f"t{i}", description="d", user_id=1) for i in range(3)]
+    tasks.append(Task(title="other", description="d", user_id=2))
+    db.session.add_all(tasks)
+    db.session.commit()
+    return [task.id for task in tasks]
+
+
+def completed():
+    return db.session.execute(
+        select(Task.id).where(Task.completion.is_(True)).order_by(Task.id)
+    ).scalars().all()
+
+
+def test_patch_without_scope_needs_all(client, auth_headers, task_ids):
+    body = {"completion": True}
+    response = client.patch("/api/v1/tasks", json=body, headers=auth_headers())
+    assert response.status_code == 400
+    # a filter value the filters do not know does not count as a scope
+    response = client.patch(
+        "/api/v1/tasks?completion=maybe", json=body, headers=auth_headers()
+    )
+    assert response.status_code == 400
+    assert completed() == []
+
+    response = client.patch(
+        "/api/v1/tasks?all=true", json=body, headers=auth_headers()
+    )
+    assert response.status_code == 200
+    assert completed() == task_ids[:3]
+
+
+def test_patch_with_ids_updates_only_those(client, auth_headers, task_ids):
+    response = client.patch(
+        f"/api/v1/tasks?ids={task_ids[0]},{task_ids[3]}",
+        json={"completion": True},
+        headers=auth_headers(),
+    )
+    assert response.status_code == 200
+    # task_ids[3] belongs to user 2
+    assert response.json["ids"] == [task_ids[0]]
+
+
+@pytest.mark.parametrize("method", ["patch", "delete"])
+def test_bad_date_is_a_bad_request(client, auth_headers, task_ids, method):
+    response = getattr(client, method)(
+        "/api/v1/tasks?after=not-a-date",
+        json={"completion": True},
+        headers=auth_headers(),
+    )
+    assert response.status_code == 400
+    assert db.session.scalar(select(db.func.count(Task.id))) == 4
+
+
+def test_delete_failure_rolls_back(client, auth_headers, task_ids, monkeypatch):
+    def broken(*a, **kw):
+        raise OperationalError("DELETE", {}, Exception("db down"))
+
+    monkeypatch.setattr(db.session, "execute", broken)
+    response = client.delete("/api/v1/tasks", headers=auth_headers())
+    assert response.status_code == 500
+    monkeypatch.undo()
+    assert db.session.scalar(select(db.func.count(Task.id))) == 4
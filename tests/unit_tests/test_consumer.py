@@ -0,0 +1,119 @@
+import orjson
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from batch_process import (
+    consumer,
+    TASK_QUEUE,
+    TASK_STREAM,
+    STREAM_GROUP,
+    DEAD_LETTER_QUEUE,
+    TASK_REQUESTS_KEY,
+)
+from batch_process.consumer import ListSource, StreamSource, handle_batch
+from task_manager_api import db
+from task_manager_api.models import Task, Priority
+from task_manager_api.extensions.task_cache import VERSION_KEY
+
+
+def payload(title="task", user_id=1, **extra):
+    return orjson.dumps(
+        {"title": title, "description": "desc", "user_id": user_id, **extra}
+    )
+
+
+def fetch(fake_redis, *payloads):
+    if payloads:
+        fake_redis.lpush(TASK_QUEUE, *payloads)
+    source = ListSource(fake_redis)
+    return source, source.fetch(100, 0)
+
+
+def titles():
+    return db.session.execute(select(Task.title).order_by(Task.id)).scalars().all()
+
+
+def test_batch_is_inserted_in_one_go(app, fake_redis):
+    source, batch = fetch(
+        fake_redis,
+        payload("a", request_id="01REQA"),
+        payload("b", user_id=2, priority="high"),
+        payload("c"),
+    )
+    assert handle_batch(db, fake_redis, source, batch, 60) == 3
+    assert titles() == ["a", "b", "c"]
+    assert fake_redis.llen(TASK_QUEUE) == 0
+    # page caches of both users invalidated
+    assert fake_redis.get(VERSION_KEY.format(user_id=1)) == b"1"
+    assert fake_redis.get(VERSION_KEY.format(user_id=2)) == b"1"
+
+
+def test_invalid_payloads_go_to_the_dead_letter_queue(app, fake_redis):
+    source, batch = fetch(
+        fake_redis,
+        payload("ok"),
+        b"not json",
+        payload("x" * 61),
+        orjson.dumps({"title": "no user", "description": "d"}),
+    )
+    assert handle_batch(db, fake_redis, source, batch, 60) == 1
+    assert titles() == ["ok"]
+    assert fake_redis.llen(DEAD_LETTER_QUEUE) == 3
+
+
+def test_failed_insert_requeues_the_batch_in_order(app, fake_redis, monkeypatch):
+    def broken(*a):
+        raise OperationalError("INSERT", {}, Exception("db down"))
+
+    monkeypatch.setattr(consumer, "write_batch", broken)
+    source, batch = fetch(fake_redis, payload("a"), payload("b"), b"bad")
+    assert handle_batch(db, fake_redis, source, batch, 60) is None
+    assert titles() == []
+    # the valid ones are back, next to be popped, in their original order
+    monkeypatch.undo()
+    source, batch = fetch(fake_redis)
+    assert [orjson.loads(p)["title"] for _, p in batch] == ["a", "b"]
+    assert fake_redis.llen(DEAD_LETTER_QUEUE) == 1
+
+
+def test_duplicate_idempotency_key_is_skipped(app, fake_redis):
+    source, batch = fetch(
+        fake_redis,
+        payload("first", idempotency_key="k1"),
+        payload("retry", idempotency_key="k1"),
+        payload("other user", user_id=2, idempotency_key="k1"),
+    )
+    assert handle_batch(db, fake_redis, source, batch, 60) == 2
+    assert titles() == ["first", "other user"]
+
+
+def test_reclaimed_stream_entries_are_not_inserted_twice(app, fake_redis):
+    # consumer died after its commit but before XACK, the entries are
+    # reclaimed and handed to the next consumer
+    source = StreamSource(fake_redis, "dead", reclaim_idle=0)
+    fake_redis.xadd(TASK_STREAM, {"task": payload("a", request_id="01REQA")})
+    fake_redis.xadd(TASK_STREAM, {"task": payload("b", request_id="01REQB")})
+    batch = source.fetch(100, 0)
+    rows = [consumer.validate_task(p, Task, Priority) for _, p in batch]
+    consumer.write_batch(db, Task, rows)
+
+    source = StreamSource(fake_redis, "next", reclaim_idle=0)
+    batch = source.fetch(100, 0)
+    assert len(batch) == 2
+    assert handle_batch(db, fake_redis, source, batch, 60) == 0
+    assert titles() == ["a", "b"]
+    assert fake_redis.xpending(TASK_STREAM, STREAM_GROUP)["pending"] == 0
+
+
+def test_request_statuses_expire_per_field(app, fake_redis):
+    source, batch = fetch(
+        fake_redis,
+        payload("a", request_id="01REQA"),
+        payload("b", request_id="01REQB"),
+    )
+    handle_batch(db, fake_redis, source, batch, 60)
+
+    key = TASK_REQUESTS_KEY.format(user_id=1)
+    assert fake_redis.hgetall(key) == {b"01REQA": b"1", b"01REQB": b"2"}
+    assert all(0 < ttl <= 60 for ttl in fake_redis.httl(key, "01REQA", "01REQB"))
+    # no TTL on the hash itself, it can not be pushed back by newer tasks
+    assert fake_redis.ttl(key) == -1
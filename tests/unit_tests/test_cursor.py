@@ -0,0 +1,32 @@
+import pytest
+from flask import Flask
+from task_manager_api.utils import cursor_encoder, cursor_decoder
+
+
+@pytest.fixture
+def app_context():
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "test-secret"
+    with app.app_context():
+        yield
+
+
+def test_cursor_round_trip(app_context):
+    cursor = cursor_encoder("due_date", "desc", "2027-01-01T00:00:00+00:00", 42)
+    assert cursor_decoder(cursor) == (
+        "due_date",
+        "desc",
+        "2027-01-01T00:00:00+00:00",
+        42,
+    )
+
+
+def test_tampered_cursor_is_rejected(app_context):
+    cursor = cursor_encoder("id", "asc", 7, 7)
+    payload, signature = cursor.split(".")
+    forged = cursor_encoder("id", "asc", 1, 1).split(".")[0]
+
+    with pytest.raises(ValueError):
+        cursor_decoder(f"{forged}.{signature}")
+    with pytest.raises(ValueError):
+        cursor_decoder(payload)
@@ -0,0 +1,51 @@
+import csv
+import io
+import orjson
+import pytest
+from task_manager_api import db
+from task_manager_api.models import Task
+
+
+@pytest.fixture
+def tasks(app):
+    db.session.add_all(
+        [
+            Task(title="a", description="d", user_id=1, completion=True),
+            Task(title="b", description="multi\nline", user_id=1),
+            Task(title="c", description="d", user_id=1, completion=True),
+            Task(title="other", description="d", user_id=2, completion=True),
+        ]
+    )
+    db.session.commit()
+
+
+def test_ndjson_export_applies_the_filters(client, auth_headers, tasks):
+    response = client.get(
+        "/api/v1/tasks/export?completion=true", headers=auth_headers()
+    )
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert "tasks.ndjson" in response.headers["Content-Disposition"]
+    rows = [orjson.loads(line) for line in response.data.splitlines()]
+    assert [row["title"] for row in rows] == ["a", "c"]
+    assert rows[0]["priority"] == "medium"
+
+
+def test_csv_export(client, auth_headers, tasks):
+    response = client.get("/api/v1/tasks/export?format=csv", headers=auth_headers())
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    # header once, only the user's tasks, a newline in a cell stays one row
+    assert [row["title"] for row in rows] == ["a", "b", "c"]
+    assert rows[1]["description"] == "multi\nline"
+    assert rows[1]["completion"] == "False"
+
+
+def test_title_filter_and_unknown_format(client, auth_headers, tasks):
+    response = client.get("/api/v1/tasks/export?title=b", headers=auth_headers())
+    assert [orjson.loads(line)["title"] for line in response.data.splitlines()] == [
+        "b"
+    ]
+    response = client.get("/api/v1/tasks/export?format=xml", headers=auth_headers())
+    assert response.status_code == 400
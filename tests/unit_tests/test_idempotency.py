@@ -0,0 +1,63 @@
+import pytest
+from task_manager_api.extensions import idempotency
+from task_manager_api.extensions.idempotency import (
+    LocalKeyStore,
+    claim_idempotency_key,
+    release_idempotency_key,
+    dedupe_batch,
+)
+
+
+@pytest.fixture(autouse=True)
+def local_store(monkeypatch):
+    store = LocalKeyStore(capacity=2)
+    monkeypatch.setattr(idempotency, "local_store", store)
+    return store
+
+
+def redis_down(fake_redis):
+    fake_redis.connection_pool.connection_kwargs["server"].connected = False
+
+
+def test_retry_is_answered_with_the_first_request_id(app, fake_redis):
+    assert claim_idempotency_key(1, "k1", "01REQA") is None
+    assert claim_idempotency_key(1, "k1", "01REQB") == "01REQA"
+    # keys are per user
+    assert claim_idempotency_key(2, "k1", "01REQC") is None
+
+
+def test_released_key_lets_the_retry_through(app, fake_redis):
+    assert claim_idempotency_key(1, "k1", "01REQA") is None
+    release_idempotency_key(1, "k1")
+    assert claim_idempotency_key(1, "k1", "01REQB") is None
+
+
+def test_redis_down_falls_back_to_the_local_store(app, fake_redis, local_store):
+    redis_down(fake_redis)
+    assert claim_idempotency_key(1, "k1", "01REQA") is None
+    assert claim_idempotency_key(1, "k1", "01REQB") == "01REQA"
+
+    # LRU, the oldest key is forgotten once the store is full
+    claim_idempotency_key(1, "k2", "01REQC")
+    claim_idempotency_key(1, "k3", "01REQD")
+    assert claim_idempotency_key(1, "k1", "01REQE") is None
+
+
+def test_local_store_keys_expire(monkeypatch):
+    store = LocalKeyStore(capacity=10)
+    now = [100.0]
+    monkeypatch.setattr(idempotency.time, "monotonic", lambda: now[0])
+    assert store.claim("k", 60, "a") is None
+    now[0] += 61
+    assert store.claim("k", 60, "b") is None
+    assert store.claim("k", 60, "c") == "b"
+
+
+def test_dedupe_batch_keeps_the_first_task_per_key():
+    tasks = [
+        {"user_id": 1, "idempotency_key": "k", "title": "a"},
+        {"user_id": 1, "idempotency_key": "k", "title": "b"},
+        {"user_id": 2, "idempotency_key": "k", "title": "c"},
+        {"user_id": 1, "title": "d"},
+    ]
+    assert [t["title"] for t in dedupe_batch(tasks)] == ["a", "c", "d"]
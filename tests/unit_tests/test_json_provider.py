@@ -0,0 +1,38 @@
+import decimal
+from datetime import datetime, timezone
+from flask import Flask
+from task_manager_api.json_provider import OrjsonProvider
+from task_manager_api.models import Priority
+
+
+def make_app():
+    app = Flask(__name__)
+    app.json = OrjsonProvider(app)
+    return app
+
+
+def test_native_types():
+    app = make_app()
+    body = app.json.dumps(
+        {
+            "priority": Priority.HIGH,
+            "due_date": datetime(2025, 1, 1, 10, 0, tzinfo=timezone.utc),
+            "naive": datetime(2025, 1, 1, 10, 0),
+            "amount": decimal.Decimal("1.50"),
+        }
+    )
+    assert body == (
+        '{"priority":"high","due_date":"2025-01-01T10:00:00Z",'
+        '"naive":"2025-01-01T10:00:00Z","amount":"1.50"}'
+    )
+
+
+def test_jsonify_response():
+    app = make_app()
+    with app.app_context():
+        from flask import jsonify
+
+        response = jsonify({"status": "healthy"})
+    assert response.mimetype == "application/json"
+    assert response.get_data() == b'{"status":"healthy"}\n'
+    assert app.json.loads(response.get_data()) == {"status": "healthy"}
@@ -0,0 +1,60 @@
+from datetime import datetime
+import pytest
+from task_manager_api import db
+from task_manager_api.models import Task
+from task_manager_api.api.v1.tasks.tasks_utils import list_query, keyset_page
+
+DUE = [
+    datetime(2027, 1, 2),
+    None,
+    datetime(2027, 1, 1),
+    None,
+    datetime(2027, 1, 2),  # same due_date as the first, id breaks the tie
+    None,
+]
+
+
+@pytest.fixture
+def ids(app):
+    tasks = [
+        Task(title=f"t{i}", description="d", user_id=1, due_date=due)
+        for i, due in enumerate(DUE)
+    ]
+    # someone else's tasks never show up
+    tasks.append(Task(title="other", description="d", user_id=2))
+    db.session.add_all(tasks)
+    db.session.commit()
+    return [task.id for task in tasks[: len(DUE)]]
+
+
+def walk(descending, size):
+    # every page through the cursor of the last row, like GET /tasks does
+    seen, after = [], None
+    while True:
+        rows = keyset_page(list_query(1), "due_date", descending, after, size)
+        page = rows[:size]
+        seen += [row.id for row in page]
+        if len(rows) <= size:
+            return seen
+        after = (page[-1].due_date, page[-1].id)
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 4, 10])
+def test_ascending_pages_cross_into_the_nulls(ids, size):
+    # dated rows by (due_date, id), then the NULLs by id
+    assert walk(False, size) == [ids[2], ids[0], ids[4], ids[1], ids[3], ids[5]]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 4, 10])
+def test_descending_pages_cross_out_of_the_nulls(ids, size):
+    # NULLs first by id desc, then dated rows by (due_date, id) desc
+    assert walk(True, size) == [ids[5], ids[3], ids[1], ids[4], ids[0], ids[2]]
+
+
+def test_cursor_inside_the_nulls(ids):
+    # ascending past the last dated row, only NULLs are left
+    rows = keyset_page(list_query(1), "due_date", False, (None, ids[1]), 10)
+    assert [row.id for row in rows] == [ids[3], ids[5]]
+    # descending from a NULL row, the rest of the NULLs then every dated row
+    rows = keyset_page(list_query(1), "due_date", True, (None, ids[3]), 10)
+    assert [row.id for row in rows] == [ids[1], ids[4], ids[0], ids[2]]
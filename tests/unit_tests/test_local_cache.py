@@ -0,0 +1,27 @@
+import time
+from task_manager_api.extensions.local_cache import LocalCache
+
+
+def test_local_cache_expires_entries():
+    cache = LocalCache(capacity=10)
+    cache.set("task:1:1", b"{}", ttl=0.05)
+    assert cache.get("task:1:1") == b"{}"
+
+    time.sleep(0.06)
+    assert cache.get("task:1:1") is None
+    assert len(cache) == 0
+
+
+def test_local_cache_evicts_least_recently_used():
+    cache = LocalCache(capacity=2)
+    cache.set("a", b"1", ttl=60)
+    cache.set("b", b"2", ttl=60)
+    cache.get("a")  # b is now the oldest
+    cache.set("c", b"3", ttl=60)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
+    assert cache.get("c") == b"3"
+
+    cache.delete("a", "c", "missing")
+    assert len(cache) == 0
@@ -0,0 +1,102 @@
+import pytest
+from redis.exceptions import ConnectionError
+from middleware.local_limiter import LocalLimiter, RateLimiterUnavailable
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis:
+    # remaining budget per key, what the sync script would answer
+    def __init__(self, remaining=None):
+        self.remaining = remaining or {}
+        self.down = False
+        self.batches = []
+
+    def sync(self, batch):
+        if self.down:
+            raise ConnectionError("redis down")
+        self.batches.append(batch)
+        out = []
+        for key, limit, _, hits in batch:
+            self.remaining[key] = max(0, self.remaining.get(key, limit) - hits)
+            out.append(self.remaining[key])
+        return out
+
+
+def test_decides_locally_between_syncs():
+    redis, clock = FakeRedis(), Clock()
+    limiter = LocalLimiter(redis.sync, 0.25, clock=clock)
+
+    decisions = [limiter.acquire("k", 5, 60)[0] for _ in range(6)]
+    assert decisions == [True] * 5 + [False]
+    # only the first sight went to redis
+    assert redis.batches == [[("k", 5, 60, 0)]]
+
+    limiter.sync_once()
+    assert redis.batches[-1] == [("k", 5, 60, 5)]
+    assert redis.remaining["k"] == 0
+
+
+def test_sync_brings_other_workers_hits_and_refills():
+    redis, clock = FakeRedis(), Clock()
+    limiter = LocalLimiter(redis.sync, 0.25, clock=clock)
+    assert limiter.acquire("k", 10, 60)[:2] == (True, 9)
+
+    redis.remaining["k"] = 2  # the other workers used the rest
+    limiter.sync_once()
+    assert limiter.acquire("k", 10, 60)[0]
+    allowed, remaining, retry_after, _ = limiter.acquire("k", 10, 60)
+    assert not allowed and remaining == 0 and retry_after == 6000
+
+    clock.now += 6  # one emission interval
+    assert limiter.acquire("k", 10, 60)[0]
+
+
+def test_fail_open_keeps_deciding_locally():
+    redis, clock = FakeRedis(), Clock()
+    limiter = LocalLimiter(redis.sync, 0.25, clock=clock)
+    limiter.acquire("k", 3, 60)
+
+    redis.down = True
+    limiter.sync_once()
+    assert not limiter.healthy
+    assert [limiter.acquire("k", 3, 60)[0] for _ in range(3)] == [True, True, False]
+    # a new key starts from a full bucket, without waiting on redis
+    assert limiter.acquire("new", 3, 60)[0]
+
+    redis.down = False
+    limiter.sync_once()
+    assert limiter.healthy
+    # the hits made during the outage were not lost
+    assert redis.remaining["k"] == 0
+
+
+def test_fail_closed_rejects_until_redis_is_back():
+    redis, clock = FakeRedis(), Clock()
+    limiter = LocalLimiter(redis.sync, 0.25, fail_closed=True, clock=clock)
+    redis.down = True
+    with pytest.raises(RateLimiterUnavailable):
+        limiter.acquire("k", 3, 60)
+
+    # no bucket left, the sync loop still probes
+    limiter._buckets.clear()
+    redis.down = False
+    limiter.sync_once()
+    assert limiter.healthy
+    assert limiter.acquire("k", 3, 60)[0]
+
+
+def test_idle_buckets_are_dropped():
+    redis, clock = FakeRedis(), Clock()
+    limiter = LocalLimiter(redis.sync, 0.25, clock=clock)
+    limiter.acquire("k", 3, 60)
+    limiter.sync_once()
+    clock.now += 61
+    limiter.sync_once()
+    assert not limiter._buckets
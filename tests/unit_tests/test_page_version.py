@@ -0,0 +1,69 @@
+import pytest
+from task_manager_api import db
+from task_manager_api.models import Task
+from task_manager_api.extensions.task_cache import VERSION_KEY
+
+
+@pytest.fixture
+def task_ids(app):
+    tasks = [Task(title=f"t{i}", description="d", user_id=1) for i in range(3)]
+    db.session.add_all(tasks)
+    db.session.commit()
+    return [task.id for task in tasks]
+
+
+def version(fake_redis, user_id=1):
+    return int(fake_redis.get(VERSION_KEY.format(user_id=user_id)) or 0)
+
+
+def cached_page(client, auth_headers):
+    # a page is cached under the current version
+    response = client.get("/api/v1/tasks", headers=auth_headers())
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize(
+    "method, url, body",
+    [
+        ("put", "/api/v1/tasks/{first}", {"title": "changed"}),
+        ("delete", "/api/v1/tasks/{first}", None),
+        ("patch", "/api/v1/tasks?ids={first}", {"completion": True}),
+        ("delete", "/api/v1/tasks?ids={first}", None),
+    ],
+)
+def test_write_paths_bump_the_page_version(
+    client, auth_headers, fake_redis, task_ids, method, url, body
+):
+    cached_page(client, auth_headers)
+    before = version(fake_redis)
+
+    response = getattr(client, method)(
+        url.format(first=task_ids[0]), json=body, headers=auth_headers()
+    )
+    assert response.status_code == 200
+    assert version(fake_redis) == before + 1
+    # other users' pages are untouched
+    assert version(fake_redis, user_id=2) == 0
+
+
+def test_import_bumps_the_page_version(client, auth_headers, fake_redis, task_ids):
+    cached_page(client, auth_headers)
+    response = client.post(
+        "/api/v1/tasks/import",
+        data=b'{"title": "a", "description": "d"}\n',
+        content_type="application/x-ndjson",
+        headers=auth_headers(),
+    )
+    assert response.status_code == 201
+    assert version(fake_redis) == 1
+
+
+def test_failed_write_keeps_the_page_version(
+    client, auth_headers, fake_redis, task_ids
+):
+    cached_page(client, auth_headers)
+    response = client.put(
+        "/api/v1/tasks/999", json={"title": "x"}, headers=auth_headers()
+    )
+    assert response.status_code == 404
+    assert version(fake_redis) == 0
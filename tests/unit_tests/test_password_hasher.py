@@ -0,0 +1,86 @@
+import os
+import time
+import pytest
+from flask import Flask
+from task_manager_api.extensions.password_hasher import (
+    PasswordHasher,
+    HasherBusy,
+    hash_cost,
+)
+
+
+def make_hasher(workers=0, max_queue=2, rounds=4):
+    app = Flask(__name__)
+    app.config.update(
+        BCRYPT_LOG_ROUNDS=rounds,
+        PASSWORD_HASH_WORKERS=workers,
+        PASSWORD_HASH_MAX_QUEUE=max_queue,
+        PASSWORD_HASH_TIMEOUT=30,
+    )
+    return PasswordHasher(app)
+
+
+def test_hash_and_check_inline():
+    hasher = make_hasher()
+    pw_hash = hasher.generate_password_hash("draco1234")
+    assert hash_cost(pw_hash) == 4
+    assert hasher.check_password_hash(pw_hash, "draco1234")
+    assert not hasher.check_password_hash(pw_hash, "draco12345")
+
+
+def test_hash_on_process_pool():
+    hasher = make_hasher(workers=1)
+    try:
+        pw_hash = hasher.generate_password_hash("draco1234")
+        assert hasher.check_password_hash(pw_hash, "draco1234")
+    finally:
+        hasher.shutdown()
+
+
+def test_full_queue_is_refused():
+    hasher = make_hasher(max_queue=1)
+    hasher._slots.acquire()  # one hash already in flight
+    with pytest.raises(HasherBusy):
+        hasher.generate_password_hash("draco1234")
+    hasher._slots.release()
+    assert hasher.generate_password_hash("draco1234")
+
+
+def test_needs_rehash_on_cost_change():
+    old = make_hasher(rounds=4).generate_password_hash("draco1234")
+    assert not make_hasher(rounds=4).needs_rehash(old)
+    assert make_hasher(rounds=5).needs_rehash(old)
+    assert hash_cost("not a bcrypt hash") is None
+
+
+def test_timed_out_job_keeps_its_slot_until_it_finishes():
+    hasher = make_hasher(workers=1, max_queue=1)
+    hasher.timeout = 0.05
+    try:
+        with pytest.raises(HasherBusy):
+            hasher._run("hash", time.sleep, 0.5)
+        # still running in the pool, nothing else may queue behind it yet
+        with pytest.raises(HasherBusy):
+            hasher._run("hash", time.sleep, 0)
+
+        deadline = time.monotonic() + 30
+        while not hasher._slots.acquire(blocking=False):
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+        hasher._slots.release()
+    finally:
+        hasher.shutdown()
+
+
+def test_dead_pool_process_is_replaced():
+    hasher = make_hasher(workers=1)
+    try:
+        # an OOM kill of the pool process, as far as the executor can tell
+        with pytest.raises(HasherBusy):
+            hasher._run("hash", os._exit, 1)
+        pw_hash = hasher.generate_password_hash("draco1234")
+        assert hasher.check_password_hash(pw_hash, "draco1234")
+        assert hasher._slots.acquire(blocking=False)
+        hasher._slots.release()
+    finally:
+        hasher.shutdown()
@@ -0,0 +1,68 @@
+import pytest
+from redis.exceptions import ConnectionError
+from batch_process.publisher import CircuitBreaker, CircuitOpenError, RedisPublisher
+
+
+class FlakyRedis:
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+        self.pushed = []
+
+    def pipeline(self, transaction=True):
+        return FlakyPipeline(self)
+
+
+class FlakyPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def lpush(self, key, *values):
+        self.commands.append(values)
+
+    def execute(self):
+        self.redis.calls += 1
+        if self.redis.failures:
+            self.redis.failures -= 1
+            raise ConnectionError("redis down")
+        for values in self.commands:
+            self.redis.pushed.append(values)
+
+
+def test_publish_chunks_and_retries():
+    redis = FlakyRedis(failures=1)
+    publisher = RedisPublisher(
+        redis, "task_queue", CircuitBreaker(3, 10), chunk_size=2, base_delay=0
+    )
+    publisher.publish([b"1", b"2", b"3", b"4", b"5"])
+
+    assert redis.calls == 2
+    assert redis.pushed == [(b"1", b"2"), (b"3", b"4"), (b"5",)]
+
+
+def test_breaker_opens_and_skips_redis(monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    redis = FlakyRedis(failures=100)
+    publisher = RedisPublisher(redis, "task_queue", breaker, retries=0)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            publisher.publish([b"x"])
+    calls = redis.calls
+
+    with pytest.raises(CircuitOpenError):
+        publisher.publish([b"x"])
+    assert redis.calls == calls
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_breaker_half_open_probe_closes_on_success():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
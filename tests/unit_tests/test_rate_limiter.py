@@ -0,0 +1,89 @@
+import pytest
+from flask import Flask, jsonify
+from redis.exceptions import ConnectionError
+from middleware import rate_limiter
+from middleware.rate_limiter import rate_limit
+
+
+@pytest.fixture
+def app():
+    return Flask(__name__)
+
+
+@rate_limit("tasks", limit=5, window_size=60)
+def view(user_id):
+    return jsonify({"user_id": user_id})
+
+
+def test_allowed_request_carries_headers(app, monkeypatch):
+    seen = []
+    monkeypatch.setattr(
+        rate_limiter,
+        "check_rate_limit",
+        lambda key, limit, window: seen.append(key) or (True, 4, 0, 12_000),
+    )
+    with app.test_request_context():
+        response = view(7)
+    assert response.status_code == 200
+    assert response.json == {"user_id": 7}
+    assert seen == ["ratelimit:tasks:5:60:7"]
+    assert response.headers["X-RateLimit-Limit"] == "5"
+    assert response.headers["X-RateLimit-Remaining"] == "4"
+    assert response.headers["X-RateLimit-Reset"] == "12"
+
+
+def test_limited_request_gets_429_and_retry_after(app, monkeypatch):
+    monkeypatch.setattr(
+        rate_limiter, "check_rate_limit", lambda *a: (False, 0, 11_200, 60_000)
+    )
+    with app.test_request_context():
+        response = view(7)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "12"
+    assert response.headers["X-RateLimit-Remaining"] == "0"
+
+
+def test_fails_open_when_redis_is_down(app, monkeypatch):
+    def down(*a):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(rate_limiter, "check_rate_limit", down)
+    with app.test_request_context():
+        response = view(7)
+    assert response.status_code == 200
+
+
+def test_fail_closed_answers_503(app, monkeypatch):
+    def down(*a):
+        raise ConnectionError("redis down")
+
+    app.config["RATE_LIMIT_FAIL_MODE"] = "closed"
+    monkeypatch.setattr(rate_limiter, "check_rate_limit", down)
+    with app.test_request_context():
+        response, status, headers = view(7)
+    assert status == 503
+    assert headers["Retry-After"] == "1"
+
+
+@rate_limit("tasks", limit=100, window_size=60)
+def busy_view(user_id):
+    return jsonify({"user_id": user_id})
+
+
+def test_small_limits_skip_the_local_tier(app, monkeypatch):
+    local = rate_limiter.LocalLimiter(
+        lambda batch: [100] * len(batch), 60, min_limit=32
+    )
+    monkeypatch.setattr(rate_limiter, "local_limiter", local)
+    seen = []
+    monkeypatch.setattr(
+        rate_limiter,
+        "check_rate_limit",
+        lambda key, limit, window: seen.append(key) or (True, 4, 0, 12_000),
+    )
+    with app.test_request_context():
+        assert view(7).status_code == 200
+        assert busy_view(7).status_code == 200
+    # 5/min is decided by redis on every request, 100/min by the worker
+    assert seen == ["ratelimit:tasks:5:60:7"]
+    assert list(local._buckets) == ["ratelimit:tasks:100:60:7"]
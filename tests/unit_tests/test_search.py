@@ -0,0 +1,81 @@
+import pytest
+from task_manager_api import db
+from task_manager_api.models import Task
+
+TASKS = [
+    ("plan the sprint", "planning planning planning"),
+    ("buy milk", "on the way home"),
+    ("sprint review", "plan for the demo"),
+    ("release plan", "write the plan and the planning doc"),
+    ("call mum", "nothing to plan here"),
+    ("planet fitness", "gym"),
+]
+
+
+@pytest.fixture
+def task_ids(app):
+    tasks = [
+        Task(title=title, description=description, user_id=1)
+        for title, description in TASKS
+    ]
+    tasks.append(Task(title="plan of user 2", description="d", user_id=2))
+    db.session.add_all(tasks)
+    db.session.commit()
+    return [task.id for task in tasks]
+
+
+def search(client, auth_headers, **params):
+    return client.get("/api/v1/tasks", query_string=params, headers=auth_headers())
+
+
+def test_search_matches_word_prefixes_of_title_and_description(
+    client, auth_headers, task_ids
+):
+    response = search(client, auth_headers, q="plan", limit=100)
+    assert response.status_code == 200
+    found = {task["id"] for task in response.json["data"]}
+    # planet matches the prefix too, milk does not, user 2 never shows up
+    assert found == {task_ids[i] for i in (0, 2, 3, 4, 5)}
+
+
+def test_results_come_best_match_first(client, auth_headers, task_ids):
+    response = search(client, auth_headers, q="plan", limit=100)
+    ranks = [task["rank"] for task in response.json["data"]]
+    assert ranks == sorted(ranks, reverse=True)
+    assert all(isinstance(rank, float) for rank in ranks)
+
+    ascending = search(client, auth_headers, q="plan", limit=100, direction="asc")
+    assert [task["id"] for task in ascending.json["data"]] == [
+        task["id"] for task in reversed(response.json["data"])
+    ]
+
+
+def test_no_match_is_not_found(client, auth_headers, task_ids):
+    assert search(client, auth_headers, q="zebra").status_code == 404
+
+
+@pytest.mark.parametrize("direction", ["desc", "asc"])
+def test_rank_cursor_pages_through_every_match_once(
+    client, auth_headers, task_ids, direction
+):
+    everything = search(client, auth_headers, q="plan", limit=100, direction=direction)
+    expected = [task["id"] for task in everything.json["data"]]
+
+    seen, cursor = [], None
+    while True:
+        params = {"q": "plan", "limit": 2, "direction": direction}
+        if cursor:
+            params["cursor"] = cursor
+        page = search(client, auth_headers, **params).json
+        seen += [task["id"] for task in page["data"]]
+        cursor = page["pagination"]["next_cursor"]
+        if not page["pagination"]["has_more"]:
+            break
+    assert seen == expected
+
+
+def test_rank_cursor_is_refused_for_another_sort(client, auth_headers, task_ids):
+    page = search(client, auth_headers, q="plan", limit=1).json
+    cursor = page["pagination"]["next_cursor"]
+    response = search(client, auth_headers, q="plan", sort="id", cursor=cursor)
+    assert response.status_code == 400
@@ -0,0 +1,117 @@
+import os
+import fcntl
+import pytest
+from redis.exceptions import ConnectionError
+from batch_process import spool as spool_module
+from batch_process.spool import Spool, replay_all, replay_file
+from batch_process.publisher import CircuitBreaker, RedisPublisher
+
+
+class FakeRedis:
+    def __init__(self, fail_after=None):
+        self.queue = []
+        self.fail_after = fail_after
+
+    def pipeline(self, transaction=False):
+        return FakePipeline(self)
+
+
+def publisher_for(redis):
+    return RedisPublisher(redis, "task_queue", CircuitBreaker(1, 0))
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def lpush(self, key, *values):
+        self.commands.append(values)
+
+    def execute(self):
+        for values in self.commands:
+            failing = self.redis.fail_after is not None
+            if failing and len(self.redis.queue) >= self.redis.fail_after:
+                raise ConnectionError("redis down")
+            self.redis.queue.extend(values)
+
+
+def test_append_rotates_and_replays_everything(tmp_path):
+    spool = Spool(str(tmp_path), segment_bytes=64)
+    for i in range(10):
+        spool.append([f'{{"title": "t{i}"}}'.encode()])
+    spool.seal()
+
+    assert len(spool.sealed_segments()) > 1
+    redis = FakeRedis()
+    assert replay_all(publisher_for(redis), spool) == 10
+    assert redis.queue[0] == b'{"title": "t0"}'
+    assert os.listdir(tmp_path) == []
+    assert spool.settle()
+
+
+def test_failed_replay_keeps_the_rest(tmp_path, monkeypatch):
+    monkeypatch.setattr("batch_process.spool.REPLAY_CHUNK", 2)
+    spool = Spool(str(tmp_path), segment_bytes=1 << 20)
+    spool.append([f"{i}".encode() for i in range(6)])
+    spool.seal()
+
+    redis = FakeRedis(fail_after=2)
+    with pytest.raises(ConnectionError):
+        replay_all(publisher_for(redis), spool)
+
+    redis.fail_after = None
+    assert replay_all(publisher_for(redis), spool) == 4
+    assert redis.queue == [b"0", b"1", b"2", b"3", b"4", b"5"]
+
+
+def test_recover_seals_orphaned_active_segment(tmp_path):
+    orphan = tmp_path / "1-1-000001.open"
+    orphan.write_bytes(b"a\nb\n")
+
+    spool = Spool(str(tmp_path), segment_bytes=1 << 20)
+    spool.recover()
+
+    assert spool.pending.is_set()
+    assert replay_all(publisher_for(FakeRedis()), spool) == 2
+
+
+def test_replay_file_resumes_after_failure(tmp_path, monkeypatch):
+    monkeypatch.setattr("batch_process.spool.REPLAY_CHUNK", 2)
+    path = tmp_path / "emergency_fallback.jsonl"
+    path.write_bytes(b"0\n1\n2\n3\n4\n")
+
+    redis = FakeRedis(fail_after=2)
+    with pytest.raises(ConnectionError):
+        replay_file(publisher_for(redis), str(path))
+
+    redis.fail_after = None
+    assert replay_file(publisher_for(redis), str(path)) == 3
+    assert redis.queue == [b"0", b"1", b"2", b"3", b"4"]
+    # done, a second run pushes nothing
+    assert replay_file(publisher_for(redis), str(path)) == 0
+
+
+def test_recover_during_replay_does_not_hand_the_segment_back(tmp_path, monkeypatch):
+    spool = Spool(str(tmp_path), segment_bytes=1 << 20)
+    spool.append([b"a", b"b"])
+    spool.seal()
+
+    flock = fcntl.flock
+    booted = []
+
+    def flock_after_a_worker_boots(fd, operation):
+        # a booting worker runs recover() right before the replayer's flock
+        if not booted:
+            booted.append(True)
+            Spool(str(tmp_path), segment_bytes=1 << 20).recover()
+        return flock(fd, operation)
+
+    monkeypatch.setattr(spool_module.fcntl, "flock", flock_after_a_worker_boots)
+    redis = FakeRedis()
+    assert replay_all(publisher_for(redis), spool) == 2
+    monkeypatch.undo()
+
+    assert os.listdir(tmp_path) == []
+    assert replay_all(publisher_for(redis), spool) == 0
+    assert redis.queue == [b"a", b"b"]
@@ -0,0 +1,76 @@
+import pytest
+import batch_process
+from batch_process.buffer import TaskBuffer
+from task_manager_api.extensions.task_counter import COUNTER_KEY
+
+
+@pytest.fixture
+def bucket(monkeypatch):
+    bucket = TaskBuffer(capacity=10)
+    monkeypatch.setattr(batch_process, "bucket_", bucket)
+    return bucket
+
+
+def test_each_item_is_accepted_or_rejected(client, auth_headers, bucket):
+    response = client.post(
+        "/api/v1/tasks:batch",
+        json=[
+            {"title": "a", "description": "d"},
+            {"title": "no description"},
+            {"title": "b", "description": "d", "priority": "high"},
+        ],
+        headers=auth_headers(),
+    )
+    assert response.status_code == 202
+    assert (response.json["accepted"], response.json["rejected"]) == (2, 1)
+    results = response.json["results"]
+    assert [result["status"] for result in results] == [
+        "accepted",
+        "rejected",
+        "accepted",
+    ]
+    assert "description" in results[1]["errors"]
+    assert results[0]["status_url"].endswith(results[0]["request_id"])
+
+    queued = bucket.drain()
+    assert [task["title"] for task in queued] == ["a", "b"]
+    assert {task["user_id"] for task in queued} == {1}
+
+
+def test_ndjson_body(client, auth_headers, bucket):
+    response = client.post(
+        "/api/v1/tasks:batch",
+        data='{"title": "a", "description": "d"}\nnot json\n',
+        content_type="application/x-ndjson",
+        headers=auth_headers(),
+    )
+    assert response.status_code == 202
+    assert [result["status"] for result in response.json["results"]] == [
+        "accepted",
+        "rejected",
+    ]
+
+
+def test_over_quota_batch_is_refused_whole(app, client, auth_headers, bucket):
+    app.config["TASK_QUOTA"] = 2
+    response = client.post(
+        "/api/v1/tasks:batch",
+        json=[{"title": f"t{i}", "description": "d"} for i in range(3)],
+        headers=auth_headers(),
+    )
+    assert response.status_code == 403
+    assert len(bucket) == 0
+
+
+def test_full_bucket_is_503_and_gives_the_quota_back(
+    client, auth_headers, bucket, fake_redis
+):
+    bucket.put_many([{"title": f"t{i}"} for i in range(9)])
+    response = client.post(
+        "/api/v1/tasks:batch",
+        json=[{"title": f"t{i}", "description": "d"} for i in range(2)],
+        headers=auth_headers(),
+    )
+    assert response.status_code == 503
+    assert len(bucket) == 9
+    assert fake_redis.get(COUNTER_KEY.format(user_id=1)) == b"0"
@@ -0,0 +1,108 @@
+import orjson
+import pytest
+from batch_process import TASK_QUEUE
+from batch_process.consumer import ListSource, handle_batch
+from task_manager_api import db
+from task_manager_api.models import Task
+from task_manager_api.extensions.task_counter import (
+    COUNTER_KEY,
+    IN_FLIGHT_KEY,
+    reserve_task_slots,
+    release_task_slots,
+)
+
+
+@pytest.fixture(autouse=True)
+def in_flight_tracking(app):
+    app.config["TASK_IN_FLIGHT_TRACKING"] = True
+
+
+def counts(fake_redis, user_id=1):
+    return (
+        int(fake_redis.get(COUNTER_KEY.format(user_id=user_id)) or 0),
+        int(fake_redis.get(IN_FLIGHT_KEY.format(user_id=user_id)) or 0),
+    )
+
+
+def add_tasks(user_id, count):
+    for i in range(count):
+        db.session.add(Task(title=f"t{i}", description="d", user_id=user_id))
+    db.session.commit()
+
+
+def consume(fake_redis, *tasks):
+    payloads = [
+        orjson.dumps({"description": "d", "user_id": 1, **task}) for task in tasks
+    ]
+    fake_redis.lpush(TASK_QUEUE, *payloads)
+    source = ListSource(fake_redis)
+    return handle_batch(db, fake_redis, source, source.fetch(100, 0), 60)
+
+
+def test_reserve_seeds_from_postgres_and_enforces_the_quota(app, fake_redis):
+    app.config["TASK_QUOTA"] = 5
+    add_tasks(1, 3)
+
+    assert reserve_task_slots(1, 2)
+    assert counts(fake_redis) == (5, 0)
+    assert not reserve_task_slots(1)
+    # other users have their own counter
+    assert reserve_task_slots(2, 5)
+
+
+def test_release_gives_slots_back(app, fake_redis):
+    app.config["TASK_QUOTA"] = 5
+    assert reserve_task_slots(1, 5, queued=True)
+    release_task_slots(1, 2, queued=True)
+    assert counts(fake_redis) == (3, 3)
+    # never below zero
+    release_task_slots(1, 10)
+    assert counts(fake_redis) == (0, 3)
+
+
+def test_reseed_counts_tasks_still_in_flight(app, fake_redis):
+    add_tasks(1, 2)
+    assert reserve_task_slots(1, 3, queued=True)
+    assert counts(fake_redis) == (5, 3)
+
+    # counter expired while 3 tasks are still queued
+    fake_redis.delete(COUNTER_KEY.format(user_id=1))
+    assert reserve_task_slots(1)
+    assert counts(fake_redis) == (6, 3)
+
+
+def test_consumer_settles_stored_skipped_and_dead_lettered_tasks(app, fake_redis):
+    assert reserve_task_slots(1, 4, queued=True)
+    inserted = consume(
+        fake_redis,
+        {"title": "a", "idempotency_key": "k", "request_id": "01REQA"},
+        {"title": "b", "idempotency_key": "k", "request_id": "01REQB"},
+        {"title": "c", "request_id": "01REQC"},
+        {"title": "x" * 61, "request_id": "01REQD"},
+    )
+    assert inserted == 2
+    # nothing in flight, only the two stored tasks still counted
+    assert counts(fake_redis) == (2, 0)
+
+
+def test_redelivered_task_keeps_its_slot(app, fake_redis):
+    assert reserve_task_slots(1, 1, queued=True)
+    consume(fake_redis, {"title": "a", "request_id": "01REQA"})
+    assert counts(fake_redis) == (1, 0)
+
+    # same entry again (consumer died before XACK), skipped by the unique
+    # request_id, still stored once so still counted once
+    fake_redis.incr(IN_FLIGHT_KEY.format(user_id=1))
+    assert consume(fake_redis, {"title": "a", "request_id": "01REQA"}) == 0
+    assert counts(fake_redis) == (1, 0)
+
+
+def test_without_in_flight_tracking_a_reseed_is_the_db_count(app, fake_redis):
+    # go-batcher: nothing settles the in flight key, it must not be counted
+    app.config["TASK_IN_FLIGHT_TRACKING"] = False
+    app.config["TASK_QUOTA"] = 10
+    fake_redis.set(IN_FLIGHT_KEY.format(user_id=1), 6)
+    add_tasks(1, 6)
+
+    assert reserve_task_slots(1, 4, queued=True)
+    assert counts(fake_redis) == (10, 6)
@@ -0,0 +1,55 @@
+import pytest
+from task_manager_api.extensions import task_cache
+from task_manager_api.extensions.local_cache import LocalCache
+from task_manager_api.extensions.task_cache import (
+    get_cached_task,
+    cache_task,
+    invalidate_tasks,
+)
+
+
+@pytest.fixture(autouse=True)
+def local_items(monkeypatch):
+    items = LocalCache(capacity=16)
+    monkeypatch.setattr(task_cache, "local_items", items)
+    return items
+
+
+def test_miss_then_hit(app, fake_redis, local_items):
+    generation, body = get_cached_task(1, 7)
+    assert body is None
+    cache_task(1, 7, generation, b'{"id": 7}')
+
+    assert get_cached_task(1, 7) == (None, b'{"id": 7}')
+    # served by redis once the worker's copy is gone
+    local_items.delete("task:1:7")
+    assert get_cached_task(1, 7) == (None, b'{"id": 7}')
+
+
+def test_slow_miss_does_not_store_a_pre_update_body(app, fake_redis, local_items):
+    generation, _ = get_cached_task(1, 7)
+    # a PUT commits and invalidates while the GET is still reading postgres
+    invalidate_tasks(1, [7])
+    cache_task(1, 7, generation, b'{"title": "old"}')
+
+    generation, body = get_cached_task(1, 7)
+    assert body is None
+    assert len(local_items) == 0
+    # the next GET reads the new row and may cache it
+    cache_task(1, 7, generation, b'{"title": "new"}')
+    assert get_cached_task(1, 7) == (None, b'{"title": "new"}')
+
+
+def test_invalidate_drops_the_cached_body(app, fake_redis):
+    generation, _ = get_cached_task(1, 7)
+    cache_task(1, 7, generation, b'{"id": 7}')
+    invalidate_tasks(1, [7])
+    assert get_cached_task(1, 7)[1] is None
+
+
+def test_redis_error_is_not_cached(app, fake_redis, local_items):
+    fake_redis.connection_pool.connection_kwargs["server"].connected = False
+    generation, body = get_cached_task(1, 7)
+    assert (generation, body) == (None, None)
+    cache_task(1, 7, generation, b'{"id": 7}')
+    assert len(local_items) == 0
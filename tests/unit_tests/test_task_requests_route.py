@@ -0,0 +1,55 @@
+import time
+from batch_process.consumer import record_task_requests
+from task_manager_api.utils import generate_request_id
+
+
+def request_id_at(monkeypatch, seconds_from_now):
+    now = time.time()
+    with monkeypatch.context() as patch:
+        patch.setattr(time, "time", lambda: now + seconds_from_now)
+        return generate_request_id()
+
+
+def status(client, auth_headers, request_id, user_id=1):
+    return client.get(
+        f"/api/v1/tasks/requests/{request_id}", headers=auth_headers(user_id)
+    )
+
+
+def test_pending_until_the_consumer_records_it(client, auth_headers, fake_redis):
+    request_id = generate_request_id()
+    response = status(client, auth_headers, request_id)
+    assert response.status_code == 200
+    assert response.json == {
+        "request_id": request_id,
+        "status": "pending",
+        "task_id": None,
+    }
+
+    record_task_requests(fake_redis, [(42, 1, request_id)], 60)
+    response = status(client, auth_headers, request_id)
+    assert response.json["status"] == "completed"
+    assert response.json["task_id"] == 42
+
+
+def test_other_users_requests_are_not_visible(client, auth_headers, fake_redis):
+    request_id = generate_request_id()
+    record_task_requests(fake_redis, [(42, 1, request_id)], 60)
+    response = status(client, auth_headers, request_id, user_id=2)
+    assert response.json["status"] == "pending"
+
+
+def test_expired_future_and_malformed_ids(app, client, auth_headers, monkeypatch):
+    ttl = app.config["TASK_REQUEST_TTL"]
+    response = status(client, auth_headers, request_id_at(monkeypatch, -ttl - 5))
+    assert response.status_code == 404
+
+    response = status(client, auth_headers, request_id_at(monkeypatch, 3600))
+    assert response.status_code == 404
+    assert "future" in response.get_data(as_text=True)
+
+    # a little clock skew between workers is fine
+    response = status(client, auth_headers, request_id_at(monkeypatch, 5))
+    assert response.json["status"] == "pending"
+
+    assert status(client, auth_headers, "not-a-request-id").status_code == 400
@@ -0,0 +1,107 @@
+import io
+from datetime import datetime, timezone
+import orjson
+from sqlalchemy import select
+from task_manager_api import db
+from task_manager_api.models import Task, Priority
+from task_manager_api.extensions.task_counter import COUNTER_KEY
+from task_manager_api.api.v1.tasks.tasks_import import ChunkReader, copy_lines
+
+
+def test_copy_lines_escapes_text_format():
+    row = {
+        "title": "tab\there",
+        "description": "line\nbreak \\ slash",
+        "completion": True,
+        "priority": Priority.HIGH,
+        "due_date": None,
+        "created_at": datetime(2025, 1, 1, tzinfo=timezone.utc),
+        "updated_at": datetime(2025, 1, 1, tzinfo=timezone.utc),
+        "user_id": 7,
+    }
+    assert copy_lines([row]) == (
+        b"tab\\there\tline\\nbreak \\\\ slash\tt\thigh\t\\N\t"
+        b"2025-01-01T00:00:00+00:00\t2025-01-01T00:00:00+00:00\t7\n"
+    )
+
+
+def test_chunk_reader_reads_across_chunks():
+    reader = io.BufferedReader(ChunkReader([b"abc", b"", b"defg"]), buffer_size=2)
+    assert reader.read(5) == b"abcde"
+    assert reader.read() == b"fg"
+
+
+def import_body(*lines):
+    return "\n".join(
+        line if isinstance(line, str) else orjson.dumps(line).decode()
+        for line in lines
+    )
+
+
+def stored_titles():
+    return db.session.execute(select(Task.title).order_by(Task.id)).scalars().all()
+
+
+def test_import_reports_bad_rows_by_line(client, auth_headers):
+    response = client.post(
+        "/api/v1/tasks/import",
+        data=import_body(
+            {"title": "ok", "description": "d"},
+            {"title": "no description"},
+            {"title": "x" * 70, "description": "d"},
+            "not json",
+        ),
+        content_type="application/x-ndjson",
+        headers=auth_headers(),
+    )
+    assert response.status_code == 201
+    assert response.json["imported"] == 1
+    assert response.json["rejected"] == 3
+    assert [error["line"] for error in response.json["errors"]] == [2, 3, 4]
+    assert "title" in response.json["errors"][1]["errors"]
+    assert stored_titles() == ["ok"]
+
+
+def test_csv_import(client, auth_headers):
+    response = client.post(
+        "/api/v1/tasks/import",
+        data="title,description,priority\na,d,high\nb,d,urgent\n",
+        content_type="text/csv",
+        headers=auth_headers(),
+    )
+    assert response.status_code == 201
+    assert response.json["errors"][0]["line"] == 3
+    assert stored_titles() == ["a"]
+
+
+def test_import_over_quota_keeps_nothing(app, client, auth_headers, fake_redis):
+    app.config["TASK_QUOTA"] = 3
+    db.session.add(Task(title="old", description="d", user_id=1))
+    db.session.commit()
+
+    response = client.post(
+        "/api/v1/tasks/import",
+        data=import_body(*({"title": f"t{i}", "description": "d"} for i in range(3))),
+        content_type="application/x-ndjson",
+        headers=auth_headers(),
+    )
+    assert response.status_code == 403
+    assert stored_titles() == ["old"]
+    # the reserved slots went back, the counter still says one task
+    assert fake_redis.get(COUNTER_KEY.format(user_id=1)) == b"1"
+
+
+def test_import_over_the_size_cap_is_413(app, client, auth_headers):
+    app.config["TASK_IMPORT_MAX_BYTES"] = 64
+    body = import_body(*({"title": f"t{i}", "description": "d"} for i in range(20)))
+    # chunked, no Content-Length: the cap is only hit while COPY reads the stream
+    response = client.post(
+        "/api/v1/tasks/import",
+        input_stream=io.BytesIO(body.encode()),
+        content_type="application/x-ndjson",
+        headers={**auth_headers(), "Transfer-Encoding": "chunked"},
+        # what gunicorn sets for a chunked request body
+        environ_overrides={"wsgi.input_terminated": True},
+    )
+    assert response.status_code == 413
+    assert stored_titles() == []
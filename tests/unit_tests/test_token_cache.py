@@ -0,0 +1,46 @@
+import datetime
+import jwt
+import pytest
+from flask import Flask, g
+from task_manager_api import utils
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "test-secret"
+    return app
+
+
+def test_token_is_decoded_once(app, monkeypatch):
+    calls = []
+    decode = jwt.decode
+    monkeypatch.setattr(
+        utils.jwt, "decode", lambda *a, **kw: calls.append(1) or decode(*a, **kw)
+    )
+    with app.app_context():
+        token = utils.generate_token(7)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    for _ in range(3):
+        with app.test_request_context(headers=headers):
+            assert utils.authenticate_request() == ("ok", 7)
+            assert utils.authenticate_request() == ("ok", 7)
+            assert g.auth == ("ok", 7)
+    assert len(calls) == 1
+
+
+def test_expired_and_forged_tokens_are_not_cached(app):
+    with app.app_context():
+        past = datetime.datetime.now(datetime.UTC) - datetime.timedelta(seconds=5)
+        expired = jwt.encode(
+            {"user_id": 1, "exp": past},
+            "test-secret",
+            algorithm="HS256",
+        )
+        forged = jwt.encode({"user_id": 1}, "other-secret", algorithm="HS256")
+
+        assert utils.decode_access_token(expired) == ("token expired", None)
+        assert utils.decode_access_token(forged) == ("token invalid", None)
+        assert utils.token_cache.get(utils._token_key(expired)) is None
+        assert utils.token_cache.get(utils._token_key(forged)) is None
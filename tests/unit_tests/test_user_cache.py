@@ -0,0 +1,235 @@
+import pytest
+from redis.exceptions import RedisError
+from task_manager_api import db
+from task_manager_api.models import User
+from task_manager_api.extensions import user_cache
+from task_manager_api.extensions.user_cache import (
+    bloom_params,
+    bloom_offsets,
+    find_user,
+    user_registered,
+    invalidate_user,
+    rebuild_bloom,
+)
+
+
+def test_bloom_params():
+    bits, hashes = bloom_params(1_000_000, 0.01)
+    # ~9.6 bits per entry and 7 hashes for 1%
+    assert 9_500_000 < bits < 9_700_000
+    assert hashes == 7
+
+
+def test_offsets_are_stable_and_in_range():
+    bits, hashes = bloom_params(1000, 0.01)
+    offsets = bloom_offsets("email:alice@x.com", bits, hashes)
+    assert offsets == bloom_offsets("email:alice@x.com", bits, hashes)
+    assert len(offsets) == hashes
+    assert all(0 <= offset < bits for offset in offsets)
+    assert offsets != bloom_offsets("username:alice@x.com", bits, hashes)
+
+
+def test_no_false_negatives_and_bounded_false_positives():
+    # the redis bitmap, simulated
+    capacity = 5000
+    bits, hashes = bloom_params(capacity, 0.01)
+    bitmap = bytearray(bits)
+    members = [f"email:user{i}@x.com" for i in range(capacity)]
+    for entry in members:
+        for offset in bloom_offsets(entry, bits, hashes):
+            bitmap[offset] = 1
+
+    def maybe(entry):
+        return all(bitmap[offset] for offset in bloom_offsets(entry, bits, hashes))
+
+    assert all(maybe(entry) for entry in members)
+    false_positives = sum(maybe(f"email:ghost{i}@x.com") for i in range(20_000))
+    assert false_positives / 20_000 < 0.02
+
+
+@pytest.fixture
+def small_bloom(app):
+    app.config["USER_BLOOM_CAPACITY"] = 1000
+    bloom_key, _, _ = user_cache._bloom(app.config)
+    return bloom_key
+
+
+def add_user(name):
+    user = User(username=name, email=f"{name}@x.com", password_hash="x")
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def failing_script(monkeypatch, source):
+    # get_script, but running `source` raises like an unreachable redis
+    real = user_cache.get_script
+
+    def get_script(script):
+        if script != source:
+            return real(script)
+
+        def fail(**kwargs):
+            raise RedisError("connection reset")
+
+        return fail
+
+    monkeypatch.setattr(user_cache, "get_script", get_script)
+
+
+def test_lookup_is_cached(app, fake_redis, small_bloom):
+    add_user("alice")
+    assert find_user("email", "alice@x.com").username == "alice"
+    db.session.execute(db.delete(User))
+    db.session.commit()
+    assert find_user("email", "alice@x.com").username == "alice"
+    invalidate_user("alice@x.com", "alice")
+    assert find_user("email", "alice@x.com") is None
+
+
+def test_slow_miss_does_not_store_a_pre_invalidation_record(
+    app, fake_redis, small_bloom, monkeypatch
+):
+    add_user("alice")
+    real_from_db = user_cache._from_db
+
+    def from_db(field, value):
+        # a password reset commits and invalidates while the lookup reads postgres
+        user = real_from_db(field, value)
+        invalidate_user("alice@x.com", "alice")
+        return user
+
+    monkeypatch.setattr(user_cache, "_from_db", from_db)
+    assert find_user("email", "alice@x.com").password_hash == "x"
+    monkeypatch.setattr(user_cache, "_from_db", real_from_db)
+
+    db.session.execute(db.update(User).values(password_hash="y"))
+    db.session.commit()
+    assert find_user("email", "alice@x.com").password_hash == "y"
+
+
+def test_bloom_negative_skips_the_db(app, fake_redis, small_bloom, monkeypatch):
+    add_user("alice")
+    rebuild_bloom(app)
+    assert fake_redis.exists(small_bloom)
+    assert find_user("username", "alice").username == "alice"
+
+    monkeypatch.setattr(user_cache, "_from_db", None)
+    assert find_user("username", "mallory") is None
+
+
+def test_failed_bloom_update_marks_the_filter_incomplete(
+    app, fake_redis, small_bloom, monkeypatch
+):
+    rebuild_bloom(app)
+    rebuilds = []
+    add_user("bob")
+    with monkeypatch.context() as patch:
+        patch.setattr(user_cache.threading, "Thread", _recording_thread(rebuilds))
+        patch.setattr(user_cache.time, "sleep", lambda seconds: None)
+        failing_script(patch, user_cache.bloom_add_script)
+        user_registered("bob@x.com", "bob")
+
+    # not in the filter, found anyway while it is marked incomplete
+    assert fake_redis.exists(f"{small_bloom}:incomplete")
+    assert find_user("email", "bob@x.com").username == "bob"
+    # the rebuild it started swaps a filter with bob in and clears the mark
+    assert rebuilds == [rebuild_bloom]
+    rebuild_bloom(app)
+    assert not fake_redis.exists(f"{small_bloom}:incomplete")
+    invalidate_user("bob@x.com", "bob")
+    assert find_user("email", "bob@x.com").username == "bob"
+
+
+def _recording_thread(started):
+    class Thread:
+        def __init__(self, target, args, daemon):
+            self.target = target
+
+        def start(self):
+            started.append(self.target)
+
+    return Thread
+
+
+def test_rebuild_aborts_when_the_build_filter_expires(
+    app, fake_redis, small_bloom, monkeypatch
+):
+    add_user("alice")
+    add_user("bob")
+    monkeypatch.setattr(user_cache, "BLOOM_BUILD_CHUNK", 1)
+    real = user_cache.get_script
+    batches = []
+
+    def get_script(script):
+        if script != user_cache.bloom_batch_script:
+            return real(script)
+
+        def batch(keys, args):
+            if batches:
+                fake_redis.delete(keys[0])
+            result = real(script)(keys=keys, args=args)
+            batches.append(result)
+            return result
+
+        return batch
+
+    monkeypatch.setattr(user_cache, "get_script", get_script)
+    rebuild_bloom(app)
+
+    assert batches == [1, 0]
+    # no partial filter swapped in or left behind, the lock is free again
+    assert not fake_redis.exists(small_bloom)
+    assert not fake_redis.exists(f"{small_bloom}:building")
+    assert not fake_redis.exists(f"{small_bloom}:lock")
+
+
+def test_rebuild_refreshes_the_build_ttl(app, fake_redis, small_bloom, monkeypatch):
+    add_user("alice")
+    real = user_cache.get_script
+    ttls = []
+
+    def get_script(script):
+        if script != user_cache.bloom_batch_script:
+            return real(script)
+
+        def batch(keys, args):
+            fake_redis.expire(keys[0], 5)
+            fake_redis.expire(keys[1], 5)
+            result = real(script)(keys=keys, args=args)
+            ttls.extend(fake_redis.ttl(key) for key in keys)
+            return result
+
+        return batch
+
+    monkeypatch.setattr(user_cache, "get_script", get_script)
+    rebuild_bloom(app)
+    assert all(ttl > 5 for ttl in ttls) and len(ttls) == 2
+    assert fake_redis.exists(small_bloom)
+
+
+def test_mark_set_during_the_scan_triggers_another_pass(
+    app, fake_redis, small_bloom, monkeypatch
+):
+    add_user("alice")
+    real = user_cache.get_script
+    passes = []
+
+    def get_script(script):
+        if script != user_cache.bloom_batch_script:
+            return real(script)
+
+        def batch(keys, args):
+            if not passes:
+                # a signup failed to reach the filters while this pass scanned
+                fake_redis.set(f"{small_bloom}:incomplete", "mark")
+            passes.append(keys[0])
+            return real(script)(keys=keys, args=args)
+
+        return batch
+
+    monkeypatch.setattr(user_cache, "get_script", get_script)
+    rebuild_bloom(app)
+    assert len(passes) == 2
+    assert fake_redis.exists(small_bloom)
+    assert not fake_redis.exists(f"{small_bloom}:incomplete")